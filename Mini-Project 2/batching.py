@@ -0,0 +1,92 @@
+import grpc
+import threading
+import time
+
+
+class Batcher:
+    class Outbox:
+        def __init__(self):
+            self.items = []
+            self.first_added = None
+            self.dropped = False
+            self.condition = threading.Condition()
+
+    def __init__(self, send, max_size=256, max_delay=0, retry_delay=1):
+        self.send = send
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.retry_delay = retry_delay
+        self.outboxes = {}
+        self.lock = threading.Lock()
+
+    def add(self, target, items):
+        outbox = self.outbox(target)
+
+        with outbox.condition:
+            if len(outbox.items) == 0:
+                outbox.first_added = time.monotonic()
+                outbox.condition.notify()
+            outbox.items += items
+            if len(outbox.items) >= self.max_size:
+                outbox.condition.notify()
+
+    def outbox(self, target):
+        with self.lock:
+            outbox = self.outboxes.get(target)
+            if outbox is None:
+                outbox = self.Outbox()
+                self.outboxes[target] = outbox
+                # one sender per target keeps the updates to it in order
+                threading.Thread(target=self.run, args=[target, outbox], daemon=True).start()
+
+            return outbox
+
+    def keep(self, targets):
+        # the updates for every other target are thrown away: it left the chains, so the processes that took over from
+        # it get what it missed from their predecessors, and its sender stops retrying
+        with self.lock:
+            dropped = [target for target in self.outboxes if target not in targets]
+            outboxes = [self.outboxes.pop(target) for target in dropped]
+
+        for outbox in outboxes:
+            with outbox.condition:
+                outbox.dropped = True
+                outbox.items.clear()
+                outbox.condition.notify()
+
+    def pending(self):
+        with self.lock:
+            return sum(len(outbox.items) for outbox in self.outboxes.values())
+
+    def run(self, target, outbox):
+        while True:
+            with outbox.condition:
+                while len(outbox.items) == 0 and not outbox.dropped:
+                    outbox.condition.wait()
+                if outbox.dropped:
+                    return
+
+                # updates that arrived while the previous batch was in flight are sent together, optionally
+                # lingering up to max_delay for more of them unless the batch is already full
+                deadline = outbox.first_added + self.max_delay
+                while len(outbox.items) < self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    outbox.condition.wait(remaining)
+
+                batch = outbox.items[:self.max_size]
+                del outbox.items[:self.max_size]
+
+            try:
+                self.send(target, batch)
+            except grpc.RpcError as error:
+                # the batch goes out again ahead of everything added since, as skipping it would leave a gap in the
+                # writes that later cumulative acks would pass over. The target may have applied some of it already,
+                # writes it has seen and acks it is past are dropped there
+                print(f'Failed to send {len(batch)} updates to {target}, retrying: {error.code()}')
+                with outbox.condition:
+                    if outbox.dropped:
+                        return
+                    outbox.items[:0] = batch
+                time.sleep(self.retry_delay)
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import shop_pb2
+import shop_pb2_grpc
+
+import grpc
+
+from concurrent import futures
+from model.entities import *
+from node import AsyncNode, Node, server_workers
+
+PROCESSES_PER_NODE = 3
+WRITES = 5000
+CLIENT_CALLS = 500
+DELAY = 1
+READS = 50
+
+
+def start_cluster(asynchronous):
+    nodes, servers = [], []
+
+    for node_id, address in config.IDS_TO_IPS.items():
+        if asynchronous:
+            node = AsyncNode(node_id)
+            node.start(address)
+        else:
+            server = grpc.server(futures.ThreadPoolExecutor(max_workers=server_workers()))
+            node = Node(node_id)
+            shop_pb2_grpc.add_DistributedBookstoreServicer_to_server(node, server)
+            server.add_insecure_port(address)
+            server.start()
+            servers.append(server)
+
+        node.init_processes(PROCESSES_PER_NODE)
+        nodes.append(node)
+
+    nodes[0].create_chain()
+    return nodes, servers
+
+
+def stop_cluster(nodes, servers):
+    # delayed acks still on their way would otherwise reach the next cluster on the same ports
+    while any(sum(node.queue_depth()) > 0 for node in nodes):
+        time.sleep(0.1)
+
+    for node in nodes:
+        node.close()
+    for node in nodes:
+        if isinstance(node, AsyncNode):
+            node.stop()
+    for server in servers:
+        server.stop(0)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def write(writer, head, name, slots):
+    async with slots:
+        await writer.Write(shop_pb2.WriteRequest(process_id=head, name=name, price=1.0))
+
+
+async def in_flight(nodes):
+    # every hop holds writes back for DELAY seconds, so they pile up in the chain while reads go on
+    head, tail = nodes[0].head(0), nodes[0].tail(0)
+    head_address = config.IDS_TO_IPS[node_of(head)]
+    tail_address = config.IDS_TO_IPS[node_of(tail)]
+
+    async with grpc.aio.insecure_channel(head_address) as head_channel, \
+            grpc.aio.insecure_channel(tail_address) as tail_channel:
+        writer = shop_pb2_grpc.DistributedBookstoreStub(head_channel)
+        reader = shop_pb2_grpc.DistributedBookstoreStub(tail_channel)
+        # a single channel cancels calls beyond a couple of thousand at once, so the client keeps fewer going
+        slots = asyncio.Semaphore(CLIENT_CALLS)
+
+        start = time.perf_counter()
+        names = ['flight ' + str(i) for i in range(WRITES)]
+        writes = asyncio.gather(*[write(writer, head, name, slots) for name in names])
+
+        latencies, peak = [], 0
+        while not writes.done() or len(latencies) < READS:
+            read_start = time.perf_counter()
+            await reader.Read(shop_pb2.ReadRequest(name='flight 0'))
+            latencies.append((time.perf_counter() - read_start) * 1000)
+            peak = max(peak, sum(sum(node.queue_depth()) for node in nodes))
+            await asyncio.sleep(0.01)
+
+        await writes
+        accepted = time.perf_counter() - start
+        threads = threading.active_count()
+
+    owner = next(node.ids_to_processes[head] for node in nodes if head in node.ids_to_processes)
+    for name in names:
+        while not owner.store.get(name).clean:
+            await asyncio.sleep(0.01)
+
+    return accepted, time.perf_counter() - start, peak, latencies, threads
+
+
+def main():
+    print(f'{WRITES} writes to the head, {CLIENT_CALLS} at a time, with every hop delayed by {DELAY} s '
+          f'and reads from the tail meanwhile')
+
+    for asynchronous in [False, True]:
+        nodes, servers = start_cluster(asynchronous)
+        hops = len(nodes[0].list_chain()[0])
+        nodes[0].set_timeout(DELAY)
+
+        accepted, clean, peak, latencies, threads = asyncio.run(in_flight(nodes))
+        label = 'grpc.aio' if asynchronous else 'threads'
+        print(f'{label:>9}: accepted after {accepted:5.2f} s, clean at the head after {clean:5.2f} s ({hops} hops), '
+              f'up to {peak} updates queued, read p50 {percentile(latencies, 0.5):6.2f} ms '
+              f'p99 {percentile(latencies, 0.99):7.2f} ms, {threads} threads')
+
+        nodes[0].set_timeout(0)
+        stop_cluster(nodes, servers)
+
+
+if __name__ == '__main__':
+    main()
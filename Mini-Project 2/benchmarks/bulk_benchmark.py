@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bulk import export_books, import_books, read_books
+from client import Client
+from concurrent import futures
+from harness import Cluster, discover
+from model.entities import *
+
+
+def catalog(path, books):
+    with open(path, 'w') as file:
+        if path.endswith('.csv'):
+            file.write('name,price\n')
+            for i in range(books):
+                file.write(f'"title {i}, vol. {i % 7}",{i % 1000 / 10}\n')
+        else:
+            for i in range(books):
+                file.write(json.dumps({'name': f'title {i}', 'price': i % 1000 / 10}) + '\n')
+
+
+def one_by_one(client, path, books):
+    # the same books as single writes, all of them in flight, to compare the segments with
+    start = time.perf_counter()
+    pending = []
+    for i, book in enumerate(read_books(path)):
+        if i == books:
+            break
+        pending.append(client.write(book))
+    futures.wait(pending)
+
+    return books / (time.perf_counter() - start)
+
+
+def run(args, path):
+    cluster = Cluster(args)
+    node = cluster.start()
+    chains = discover(node)
+    client = Client(node)
+    exported = path + '.out' + os.path.splitext(path)[1]
+
+    try:
+        single = one_by_one(client, path, args.single)
+        count, seconds = import_books(client, path, args.segment_size, args.in_flight)
+        start = time.perf_counter()
+        exported_count = export_books(node, exported)
+        export_seconds = time.perf_counter() - start
+    finally:
+        client.close()
+        cluster.stop(node)
+        if os.path.exists(exported):
+            os.remove(exported)
+
+    result = {'format': os.path.splitext(path)[1][1:], 'books': count, 'import_s': round(seconds, 3),
+              'import_books_per_s': round(count / seconds, 1), 'single_writes_per_s': round(single, 1),
+              'exported': exported_count, 'export_s': round(export_seconds, 3),
+              'export_books_per_s': round(exported_count / export_seconds, 1)}
+    print(f'{len(chains)} chains of {len(chains[0])}, {result["format"]}: imported {count} books in {seconds:.2f} s '
+          f'({result["import_books_per_s"]:.0f}/s, single writes {single:.0f}/s), exported {exported_count} in '
+          f'{export_seconds:.2f} s ({result["export_books_per_s"]:.0f}/s)')
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Imports a generated catalog in segments and exports it again.')
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--chain-length', type=int, default=3)
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--mode', default='in-process', choices=['in-process', 'subprocess'])
+    parser.add_argument('--server', default='sync', choices=['sync', 'aio'])
+    parser.add_argument('--store', default='compact', choices=['plain', 'compact'])
+    parser.add_argument('--base-port', type=int, default=22000)
+    parser.add_argument('--books', type=int, default=200000)
+    parser.add_argument('--single', type=int, default=20000, help='books written one by one first, for comparison')
+    parser.add_argument('--segment-size', type=int, default=5000)
+    parser.add_argument('--in-flight', type=int, default=8)
+    parser.add_argument('--formats', nargs='+', default=['csv', 'jsonl'], choices=['csv', 'jsonl'])
+    parser.add_argument('--json', help='file to write the results to')
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as directory:
+        for extension in args.formats:
+            path = os.path.join(directory, 'catalog.' + extension)
+            catalog(path, args.books)
+            runs.append(run(args, path))
+
+    results = {'config': {key: value for key, value in vars(args).items() if key != 'json'},
+               'host': {'cpus': os.cpu_count()}, 'runs': runs}
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import shop_pb2_grpc
+
+import grpc
+
+from channels import ChannelPool
+from concurrent import futures
+from contextlib import contextmanager
+from model.entities import *
+from node import Node, server_workers
+
+PROCESSES_PER_NODE = 3
+WRITES = 200
+BURST = 5000
+
+
+class OneShotChannelPool(ChannelPool):
+    # the behaviour before the pool existed: a new channel for every single call
+    @contextmanager
+    def connect(self, address):
+        with grpc.insecure_channel(address) as channel:
+            yield shop_pb2_grpc.DistributedBookstoreStub(channel)
+
+
+def start_cluster(processes_per_node):
+    nodes, servers = [], []
+
+    for node_id, address in config.IDS_TO_IPS.items():
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=server_workers()))
+        node = Node(node_id)
+        shop_pb2_grpc.add_DistributedBookstoreServicer_to_server(node, server)
+        server.add_insecure_port(address)
+        server.start()
+        node.init_processes(processes_per_node)
+        nodes.append(node)
+        servers.append(server)
+
+    nodes[0].create_chain()
+    return nodes, servers
+
+
+def wait_clean(entry_owner, name, price):
+    while True:
+        entry = entry_owner.store.get(name)
+        if entry is not None and entry.clean and entry.book.price == price:
+            return
+        time.sleep(0.0001)
+
+
+def measure(nodes, label, writes):
+    client = nodes[0]
+    head = next(node.ids_to_processes[client.head(0)] for node in nodes if client.head(0) in node.ids_to_processes)
+    latencies = []
+
+    for i in range(writes):
+        book = Book(label + ' ' + str(i), float(i))
+        start = time.perf_counter()
+        client.write(book)
+        wait_clean(head, book.name, book.price)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return latencies
+
+
+def measure_burst(nodes, label, writes):
+    client = nodes[0]
+    head = next(node.ids_to_processes[client.head(0)] for node in nodes if client.head(0) in node.ids_to_processes)
+    books = [Book(label + ' ' + str(i), float(i)) for i in range(writes)]
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    for book in books:
+        client.write(book)
+    for book in books:
+        wait_clean(head, book.name, book.price)
+
+    return writes / (time.perf_counter() - start), time.process_time() - cpu_start
+
+
+def report(label, latencies):
+    latencies.sort()
+    print(f'{label:>10}: mean {statistics.mean(latencies):7.2f} ms, p50 {latencies[len(latencies) // 2]:7.2f} ms, '
+          f'p99 {latencies[int(len(latencies) * 0.99)]:7.2f} ms')
+
+
+def main():
+    nodes, servers = start_cluster(PROCESSES_PER_NODE)
+    hops = len(nodes[0].list_chain()[0])
+    print(f'write to clean at the head over a chain of {hops} processes, {WRITES} writes')
+
+    for node in nodes:
+        node.streaming = False
+        node.channels = OneShotChannelPool()
+    report('one-shot', measure(nodes, 'one-shot', WRITES))
+
+    for node in nodes:
+        node.channels = ChannelPool()
+    report('pooled', measure(nodes, 'pooled', WRITES))
+
+    for node in nodes:
+        node.streaming = True
+    report('streaming', measure(nodes, 'streaming', WRITES))
+
+    print(f'burst of {BURST} writes until all are clean at the head')
+    for streaming in [False, True]:
+        for node in nodes:
+            node.streaming = streaming
+        label = 'streaming' if streaming else 'unary'
+        throughput, cpu = measure_burst(nodes, label + ' burst', BURST)
+        print(f'{label:>10}: {throughput:9.0f} writes/s, {cpu / (BURST * hops) * 1e6:6.1f} us cpu per update and hop')
+
+    for node in nodes:
+        node.close()
+    for server in servers:
+        server.stop(0)
+
+
+if __name__ == '__main__':
+    main()
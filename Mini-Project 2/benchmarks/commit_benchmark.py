@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from client import Client
+from harness import Cluster, discover, summary
+from model.entities import *
+
+
+def producer(client, worker, writes, window, latencies):
+    # keeps up to window writes in flight, waiting for the oldest one whenever the window is full
+    in_flight = []
+
+    for i in range(writes):
+        if len(in_flight) == window:
+            wait(in_flight.pop(0), latencies)
+        in_flight.append((time.perf_counter(), client.write(Book(f'producer {worker} book {i}', float(i)))))
+
+    for write in in_flight:
+        wait(write, latencies)
+
+
+def wait(write, latencies):
+    start, future = write
+    future.result()
+    latencies.append((time.perf_counter() - start) * 1000)
+
+
+def run(args, window):
+    cluster = Cluster(args)
+    node = cluster.start()
+    chains = discover(node)
+    client = Client(node)
+
+    try:
+        latencies = [[] for _ in range(args.producers)]
+        shares = [args.writes // args.producers + (1 if i < args.writes % args.producers else 0)
+                  for i in range(args.producers)]
+        threads = [threading.Thread(target=producer, args=[client, worker, share, window, values])
+                   for worker, (share, values) in enumerate(zip(shares, latencies))]
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        client.close()
+        cluster.stop(node)
+
+    result = {'window': window, 'seconds': round(elapsed, 3), 'writes_per_s': round(args.writes / elapsed, 1),
+              'write_to_commit': summary([value for values in latencies for value in values])}
+    print(f'{len(chains)} chains of {len(chains[0])}, {window:>5} writes in flight per producer: '
+          f'{result["writes_per_s"]:9.1f} writes/s committed, p50 {result["write_to_commit"]["p50_ms"]} ms, '
+          f'p99 {result["write_to_commit"]["p99_ms"]} ms')
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures committed write throughput with more and more writes in '
+                                                 'flight on the commit streams.')
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--chain-length', type=int, default=3)
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--mode', default='in-process', choices=['in-process', 'subprocess'])
+    parser.add_argument('--server', default='sync', choices=['sync', 'aio'])
+    parser.add_argument('--store', default='plain', choices=['plain', 'compact'])
+    parser.add_argument('--base-port', type=int, default=21900)
+    parser.add_argument('--producers', type=int, default=4)
+    parser.add_argument('--writes', type=int, default=20000)
+    parser.add_argument('--windows', type=int, nargs='+', default=[1, 16, 256, 4096])
+    parser.add_argument('--json', help='file to write the results to')
+    args = parser.parse_args()
+
+    results = {'config': {key: value for key, value in vars(args).items() if key != 'json'},
+               'host': {'cpus': os.cpu_count()},
+               'runs': [run(args, window) for window in args.windows]}
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
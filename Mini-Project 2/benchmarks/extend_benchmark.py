@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import Cluster, discover, preload, write_clean
+from model.entities import node_of
+
+
+def writer(client, worker, records, stop):
+    i = 0
+
+    while not stop.is_set():
+        start = time.monotonic()
+        write_clean(client, f'writer {worker} book {i % 100}')
+        records.append((start, time.monotonic()))
+        i += 1
+
+
+def committed(process):
+    with process.lock:
+        snapshot = process.store.snapshot()
+
+    with snapshot:
+        items, _ = snapshot.page(0, snapshot.length)
+
+    return [(name, book.price) for name, book, _ in items if book is not None]
+
+
+def run(args):
+    cluster = Cluster(args)
+    client = cluster.start()
+    chain = discover(client)[0]
+    preload(client, args.books)
+    after = chain[-1] if args.position == 'tail' else chain[len(chain) // 2]
+    print(f'{args.nodes} nodes, chain of {len(chain)} processes, {args.server} server, {args.books} books, '
+          f'attaching a process after the {args.position} {after}')
+
+    records = []
+    stop = threading.Event()
+    threads = [threading.Thread(target=writer, args=[client, worker, records, stop]) for worker in range(args.writers)]
+
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(args.before)
+
+        # the new process goes on the node after the one of the process it follows
+        node = cluster.nodes[node_of(after) % len(cluster.nodes)]
+        node.init_processes(1)
+        process_id = list(node.ids_to_processes)[-1]
+
+        started = time.monotonic()
+        books, failures = client.extend_chain(process_id, after)
+        finished = time.monotonic()
+        discover(client)
+        time.sleep(args.after)
+
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        # once everything is clean the new process has to hold exactly what the process before it holds
+        while any(sum(n.queue_depth()) > 0 for n in cluster.nodes):
+            time.sleep(0.05)
+        new, previous = node.ids_to_processes[process_id], cluster_process(cluster, after)
+        identical = committed(new) == committed(previous)
+    finally:
+        cluster.stop(client)
+
+    before = [end - start for start, end in records if end < started]
+    during = [end - start for start, end in records if start <= finished and end >= started]
+    results = {
+        'config': {key: value for key, value in vars(args).items() if key != 'json'},
+        'process': process_id,
+        'after': after,
+        'books_transferred': books,
+        'attach_s': round(finished - started, 3),
+        'failures': {node: str(code) for node, code in failures.items()},
+        'write_to_clean_ms_before': round(statistics.median(before) * 1000, 3),
+        'write_to_clean_ms_during_max': round(max(during) * 1000, 3) if len(during) > 0 else None,
+        'writes_during': len(during),
+        'identical': identical,
+    }
+
+    print(f'{process_id} attached in {results["attach_s"]} s with {books} books, its store matches {after}: '
+          f'{identical}')
+    print(f'write-to-clean median {results["write_to_clean_ms_before"]} ms before, '
+          f'{results["writes_during"]} writes during the attach took up to {results["write_to_clean_ms_during_max"]} ms')
+
+    return results
+
+
+def cluster_process(cluster, process_id):
+    return cluster.nodes[node_of(process_id) - 1].ids_to_processes[process_id]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Attaches a process to a chain under load and measures the copy.')
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--chain-length', type=int, default=3)
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--position', default='tail', choices=['tail', 'middle'])
+    parser.add_argument('--server', default='sync', choices=['sync', 'aio'])
+    parser.add_argument('--store', default='plain', choices=['plain', 'compact'])
+    parser.add_argument('--base-port', type=int, default=21500)
+    parser.add_argument('--books', type=int, default=20000)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--before', type=float, default=1)
+    parser.add_argument('--after', type=float, default=1)
+    parser.add_argument('--json', help='file to write the results to')
+    args = parser.parse_args()
+    args.mode = 'in-process'
+
+    results = run(args)
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import shop_pb2
+
+import grpc
+
+from harness import Cluster, discover, prices
+from model.entities import *
+
+# a write that is not clean after this long is given up on and written again, which only happens when it was lost
+RETRY_AFTER = 2
+
+
+def rediscover(client):
+    # the chain may be in the middle of its repair, so there is no head to find for a moment
+    try:
+        discover(client)
+        client.drop_links()
+    except (StopIteration, IndexError, ValueError):
+        time.sleep(0.01)
+
+
+def write_until_clean(client, name):
+    # returns how often the write had to be repeated
+    price = float(next(prices))
+    retries = 0
+    deadline = time.monotonic() + RETRY_AFTER
+    client.write(Book(name, price))
+
+    while True:
+        try:
+            book = client.read(name)
+            if book is not None and book.price == price:
+                return retries
+        except grpc.RpcError:
+            rediscover(client)
+
+        if time.monotonic() > deadline:
+            rediscover(client)
+            client.write(Book(name, price))
+            retries += 1
+            deadline = time.monotonic() + RETRY_AFTER
+
+        time.sleep(0.0005)
+
+
+def writer(client, worker, records, stop):
+    i = 0
+
+    while not stop.is_set():
+        start = time.monotonic()
+        retries = write_until_clean(client, f'writer {worker} book {i % 100}')
+        records.append((start, time.monotonic(), retries))
+        i += 1
+
+
+def wait_repaired(client, victim):
+    # the chain is repaired once no process that answers has a neighbour on the failed node anymore
+    while True:
+        responses, _ = client.fan_out(lambda stub, node: stub.ListChain(shop_pb2.ListChainRequest(), timeout=1))
+        neighbours = [neighbour for response in responses.values() for node in response.chain_nodes
+                      for neighbour in [node.successor_id, node.predecessor_id] if len(neighbour) > 0]
+        if len(neighbours) > 0 and all(node_of(neighbour) != victim for neighbour in neighbours):
+            return time.monotonic()
+        time.sleep(0.005)
+
+
+def run(args):
+    cluster = Cluster(args)
+    client = cluster.start()
+    chain = discover(client)[0]
+    victim_process = {'head': chain[0], 'middle': chain[len(chain) // 2], 'tail': chain[-1]}[args.victim]
+    victim = node_of(victim_process)
+    print(f'{args.nodes} nodes, chain of {len(chain)} processes, {args.server} server, killing node {victim} '
+          f'with the {args.victim} {victim_process}')
+
+    records = []
+    stop = threading.Event()
+    threads = [threading.Thread(target=writer, args=[client, worker, records, stop]) for worker in range(args.writers)]
+
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(args.before)
+
+        killed = time.monotonic()
+        cluster.children[victim - 1].kill()
+        repaired = wait_repaired(client, victim)
+        time.sleep(args.after)
+
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        cluster.stop(client)
+
+    before = [end - start for start, end, _ in records if end < killed]
+    # writes that were on their way when the node died or were started before the chain was whole again
+    stalled = [(start, end, retries) for start, end, retries in records if start <= repaired and end >= killed]
+    recovered = min(end for start, end, _ in records if start >= killed)
+    after = [end - start for start, end, _ in records if start > recovered]
+
+    results = {
+        'config': {key: value for key, value in vars(args).items() if key != 'json'},
+        'chain_length': len(chain),
+        'victim': victim_process,
+        'repaired_after_s': round(repaired - killed, 3),
+        'time_to_recover_s': round(recovered - killed, 3),
+        'stalled_writes': len(stalled),
+        'stalled_max_s': round(max(end - start for start, end, _ in stalled), 3) if len(stalled) > 0 else 0,
+        'repeated_writes': sum(retries for _, _, retries in records),
+        'write_to_clean_ms_before': round(statistics.median(before) * 1000, 3),
+        'write_to_clean_ms_after': round(statistics.median(after) * 1000, 3) if len(after) > 0 else None,
+        'writes': len(records),
+    }
+
+    print(f'chain repaired {results["repaired_after_s"]} s after the kill, first write after it clean after '
+          f'{results["time_to_recover_s"]} s')
+    print(f'{results["stalled_writes"]} writes stalled by the failure for up to {results["stalled_max_s"]} s, '
+          f'{results["repeated_writes"]} had to be written again')
+    print(f'write-to-clean median {results["write_to_clean_ms_before"]} ms before, '
+          f'{results["write_to_clean_ms_after"]} ms after')
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kills a node under load and measures how long the chain takes to '
+                                                 'recover.')
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--chain-length', type=int, default=3)
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--victim', default='middle', choices=['head', 'middle', 'tail'])
+    parser.add_argument('--server', default='sync', choices=['sync', 'aio'])
+    parser.add_argument('--store', default='plain', choices=['plain', 'compact'])
+    parser.add_argument('--base-port', type=int, default=21400)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--before', type=float, default=2)
+    parser.add_argument('--after', type=float, default=3)
+    parser.add_argument('--json', help='file to write the results to')
+    args = parser.parse_args()
+    args.mode = 'subprocess'
+
+    results = run(args)
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+# the modules of the project are one folder up, wherever the benchmark is run from
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import shop_pb2
+import shop_pb2_grpc
+
+import grpc
+
+from client import Client
+from concurrent import futures
+from model.entities import *
+from node import AsyncNode, Node, build_chain, server_workers
+
+# writes get unique prices, so a read returning the price shows that the write is clean
+prices = itertools.count(1)
+
+
+def addresses(nodes, base_port):
+    return {node_id: 'localhost:' + str(base_port + node_id - 1) for node_id in range(1, nodes + 1)}
+
+
+def processes_per_node(nodes, chain_length):
+    # spreads the processes of the chain over the nodes as evenly as possible
+    return [chain_length // nodes + (1 if i < chain_length % nodes else 0) for i in range(nodes)]
+
+
+def start_node(node_id, processes, server, store):
+    if server == 'aio':
+        node = AsyncNode(node_id, compact=store == 'compact')
+        node.start(config.IDS_TO_IPS[node_id])
+        stop = node.stop
+    else:
+        grpc_server = grpc.server(futures.ThreadPoolExecutor(max_workers=server_workers()))
+        node = Node(node_id, compact=store == 'compact')
+        shop_pb2_grpc.add_DistributedBookstoreServicer_to_server(node, grpc_server)
+        grpc_server.add_insecure_port(config.IDS_TO_IPS[node_id])
+        grpc_server.start()
+        stop = lambda: grpc_server.stop(0)
+
+    node.init_processes(processes)
+    return node, stop
+
+
+class Cluster:
+    # N nodes on localhost, either as servers in this process or as one subprocess each
+    def __init__(self, args):
+        self.args = args
+        self.nodes = []
+        self.stops = []
+        self.children = []
+        config.IDS_TO_IPS = addresses(args.nodes, args.base_port)
+
+    def start(self):
+        # every shard gets a chain of chain_length processes
+        counts = processes_per_node(self.args.nodes, self.args.chain_length * self.args.shards)
+
+        if self.args.mode == 'in-process':
+            for node_id, count in zip(config.IDS_TO_IPS, counts):
+                node, stop = start_node(node_id, count, self.args.server, self.args.store)
+                self.nodes.append(node)
+                self.stops.append(stop)
+        else:
+            for node_id, count in zip(config.IDS_TO_IPS, counts):
+                self.children.append(subprocess.Popen([
+                    sys.executable, __file__, 'serve', '--id', str(node_id), '--processes', str(count),
+                    '--nodes', str(self.args.nodes), '--base-port', str(self.args.base_port),
+                    '--server', self.args.server, '--store', self.args.store]))
+            for address in config.IDS_TO_IPS.values():
+                with grpc.insecure_channel(address) as channel:
+                    grpc.channel_ready_future(channel).result(timeout=30)
+
+        # the client is a node without processes, so in both modes its reads and listings go to the tail
+        client = Node(0)
+        client.create_chain(self.args.shards)
+        return client
+
+    def stop(self, client):
+        client.close()
+
+        if self.args.mode == 'in-process':
+            # delayed acks still on their way would otherwise reach the next cluster on the same ports
+            while any(sum(node.queue_depth()) > 0 for node in self.nodes):
+                time.sleep(0.1)
+            for node in self.nodes:
+                node.close()
+            for stop in self.stops:
+                stop()
+        else:
+            for child in self.children:
+                child.terminate()
+            for child in self.children:
+                child.wait()
+
+
+def discover(client):
+    # a client outside the chains is not linked by create_chain, so it looks the heads and tails up itself
+    responses, _ = client.fan_out(lambda stub, node: stub.ListChain(shop_pb2.ListChainRequest(),
+                                                                   timeout=config.RPC_TIMEOUT))
+    chain_nodes = [node for response in responses.values() for node in response.chain_nodes]
+    chains = []
+
+    for shard in range(max(node.shard for node in chain_nodes) + 1):
+        # a removed head has no predecessor either, but nothing follows it anymore
+        shard_nodes = [node for node in chain_nodes if node.shard == shard]
+        chains.append(max((build_chain(shard_nodes, node.process_id) for node in shard_nodes
+                           if len(node.predecessor_id) == 0), key=len))
+
+    client.chains = chains
+    return chains
+
+
+def wait_clean(client, name, price):
+    while True:
+        try:
+            book = client.read(name)
+            if book is not None and book.price == price:
+                return
+        except grpc.RpcError as error:
+            # the tail moved on since the client looked it up
+            if error.code() != grpc.StatusCode.FAILED_PRECONDITION:
+                raise
+            discover(client)
+        time.sleep(0.0005)
+
+
+def write_clean(client, name):
+    price = float(next(prices))
+    client.write(Book(name, price))
+    wait_clean(client, name, price)
+
+
+def preload(client, books):
+    price = float(next(prices))
+    last = {}
+    for i in range(books):
+        name = 'book ' + str(i)
+        client.write(Book(name, price))
+        last[client.shard(name)] = name
+    # writes are ordered by the head of their shard, so once the last one of every shard is clean all of them are
+    for name in last.values():
+        wait_clean(client, name, price)
+
+
+def run_phase(name, clients, operations, operation):
+    # every client thread runs its share of operations one after another and records how long each took
+    latencies = {}
+    lock = threading.Lock()
+
+    def work(worker, count):
+        local = {}
+        for _ in range(count):
+            kind, func = operation(worker)
+            start = time.perf_counter()
+            func()
+            local.setdefault(kind, []).append((time.perf_counter() - start) * 1000)
+        with lock:
+            for kind, values in local.items():
+                latencies.setdefault(kind, []).extend(values)
+
+    shares = [operations // clients + (1 if i < operations % clients else 0) for i in range(clients)]
+    threads = [threading.Thread(target=work, args=[worker, share]) for worker, share in enumerate(shares)]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    result = {'operations': operations, 'seconds': round(elapsed, 4), 'throughput': round(operations / elapsed, 1)}
+    for kind, values in latencies.items():
+        result[kind] = summary(values)
+
+    print(f'{name:>12}: {result["throughput"]:9.1f} ops/s' +
+          ''.join(f', {kind} p50 {stats["p50_ms"]:.2f} ms p99 {stats["p99_ms"]:.2f} ms'
+                  for kind, stats in result.items() if isinstance(stats, dict)))
+    return result
+
+
+def summary(values):
+    values = sorted(values)
+    return {'count': len(values), 'mean_ms': round(statistics.mean(values), 3),
+            'p50_ms': round(values[len(values) // 2], 3),
+            'p99_ms': round(values[min(int(len(values) * 0.99), len(values) - 1)], 3)}
+
+
+def benchmark(args):
+    # the chains are laid out by the client, the nodes do not need to know
+    config.PLACEMENT = args.placement
+    cluster = Cluster(args)
+    client = cluster.start()
+    chains = discover(client)
+    print(f'{args.nodes} nodes, {len(chains)} chains of {len(chains[0])} processes, {args.server} server, '
+          f'{args.store} store, {args.mode}, {args.clients} clients')
+
+    committer = Client(client)
+
+    try:
+        preload(client, args.books)
+        names = ['book ' + str(i) for i in range(args.books)]
+
+        def write(worker):
+            # every client writes its own books, otherwise a later write of another client could hide ours
+            name = random.choice(names[worker::args.clients])
+            return 'write_to_clean', lambda: write_clean(client, name)
+
+        def commit(worker):
+            # the same writes, but the head tells when they are clean instead of the client reading until they are
+            name = random.choice(names[worker::args.clients])
+            return 'write_to_commit', lambda: committer.write(Book(name, float(next(prices)))).result()
+
+        def read(worker):
+            name = random.choice(names)
+            return 'read', lambda: client.read(name)
+
+        def mixed(worker):
+            return read(worker) if random.random() < args.read_fraction else write(worker)
+
+        def list_books(worker):
+            return 'list_books', client.list_books
+
+        phases = {
+            'write': run_phase('write', args.clients, args.operations, write),
+            'commit': run_phase('commit', args.clients, args.operations, commit),
+            'read': run_phase('read', args.clients, args.operations, read),
+            'mixed': run_phase('mixed', args.clients, args.operations, mixed),
+            'list_books': run_phase('list_books', 1, args.listings, list_books),
+        }
+    finally:
+        committer.close()
+        cluster.stop(client)
+
+    return {
+        'config': {key: value for key, value in vars(args).items() if key not in ['command', 'json', 'id', 'processes']},
+        'chain_length': len(chains[0]),
+        'chains': len(chains),
+        'host': {'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'phases': phases,
+    }
+
+
+def serve(args):
+    config.IDS_TO_IPS = addresses(args.nodes, args.base_port)
+    # the server has to stay referenced, the parent terminates us when the run is over
+    node, stop = start_node(args.id, args.processes, args.server, args.store)
+    threading.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Boots a chain on localhost and measures it.')
+    parser.add_argument('command', nargs='?', default='run', choices=['run', 'serve'])
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--chain-length', type=int, default=9)
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--placement', default=config.PLACEMENT, choices=['grouped', 'spread'])
+    parser.add_argument('--mode', default='in-process', choices=['in-process', 'subprocess'])
+    parser.add_argument('--server', default='sync', choices=['sync', 'aio'])
+    parser.add_argument('--store', default='plain', choices=['plain', 'compact'])
+    parser.add_argument('--base-port', type=int, default=21000)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--operations', type=int, default=2000)
+    parser.add_argument('--read-fraction', type=float, default=0.9)
+    parser.add_argument('--books', type=int, default=1000)
+    parser.add_argument('--listings', type=int, default=20)
+    parser.add_argument('--json', help='file to write the results to')
+    # used by the subprocesses
+    parser.add_argument('--id', type=int)
+    parser.add_argument('--processes', type=int)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args)
+        return
+
+    results = benchmark(args)
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shop_pb2
+
+from benchmarks.chain_benchmark import start_cluster
+from node import build_chain
+
+SIZES = [1000, 5000, 20000, 100000]
+# the old scan is quadratic, so it is only measured on the smaller chains
+SCAN_LIMIT = 5000
+PROCESSES_PER_NODE = 300
+
+
+def synthetic_chain(size):
+    ids = ['Node' + str(i % 3 + 1) + '-ps' + str(i) for i in range(size)]
+    chain_nodes = [shop_pb2.ChainNode(process_id=ids[i], successor_id=ids[i + 1] if i < size - 1 else '',
+                                      predecessor_id=ids[i - 1] if i > 0 else '') for i in range(size)]
+    random.shuffle(chain_nodes)
+    return chain_nodes, ids[0]
+
+
+def scan_chain(chain_nodes):
+    # how List-chain used to rebuild the chain, with a scan for every step
+    current = next((node for node in chain_nodes if node.predecessor_id == ''), None)
+    result = []
+
+    while current is not None:
+        result.append(current.process_id)
+        current = next((node for node in chain_nodes if node.process_id == current.successor_id), None)
+
+    return result
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    print(f'{"processes":>10} {"scan ms":>10} {"lookup ms":>10}')
+
+    for size in SIZES:
+        chain_nodes, head = synthetic_chain(size)
+        chain, lookup = timed(build_chain, chain_nodes, head)
+        assert len(chain) == size
+
+        if size <= SCAN_LIMIT:
+            _, scan = timed(scan_chain, chain_nodes)
+            print(f'{size:>10} {scan:>10.1f} {lookup:>10.1f}')
+        else:
+            print(f'{size:>10} {"-":>10} {lookup:>10.1f}')
+
+    nodes, servers = start_cluster(PROCESSES_PER_NODE)
+    _, create = timed(nodes[0].create_chain)
+    (chain, _), listing = timed(nodes[0].list_chain)
+    print(f'Create-chain {create:.1f} ms and List-chain {listing:.1f} ms over {len(chain)} processes on '
+          f'{len(nodes)} nodes')
+
+    for node in nodes:
+        node.close()
+    for server in servers:
+        server.stop(0)
+
+
+if __name__ == '__main__':
+    main()
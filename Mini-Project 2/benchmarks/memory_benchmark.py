@@ -0,0 +1,59 @@
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.entities import *
+
+BOOKS = 1000000
+BATCH = 256
+PROCESSES = [1, 2, 4]
+STORES = {'Store': Store, 'CompactStore': CompactStore}
+
+
+def rss():
+    # peak resident memory of this process in bytes, linux reports it in kilobytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def fill(store_class, processes):
+    baseline = rss()
+    start = time.perf_counter()
+    stores = []
+
+    for _ in range(processes):
+        store = store_class()
+        # every process gets its own copy of the names, the way they arrive from the network
+        for i in range(BOOKS):
+            store.add(Book('Book ' + str(i), float(i % 100), i + 1))
+            # acknowledged in batches as they come back from the tail, so only a few writes are dirty at a time
+            if (i + 1) % BATCH == 0:
+                store.clean_up_to(i + 1)
+        store.clean_up_to(BOOKS)
+        stores.append(store)
+
+    print(rss() - baseline, time.perf_counter() - start)
+
+
+def main():
+    print(f'{"store":>12} {"processes":>9} {"MiB":>8} {"bytes/book":>10} {"fill s":>7}')
+
+    # each measurement runs in a fresh interpreter, so memory freed by one does not hide the cost of the next
+    for name in STORES:
+        for processes in PROCESSES:
+            output = subprocess.run([sys.executable, __file__, name, str(processes)],
+                                    capture_output=True, text=True, check=True).stdout.split()
+            used, elapsed = int(output[0]), float(output[1])
+
+            print(f'{name:>12} {processes:>9} {used / 2 ** 20:>8.1f} {used / (BOOKS * processes):>10.1f} '
+                  f'{elapsed:>7.1f}')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        fill(STORES[sys.argv[1]], int(sys.argv[2]))
+    else:
+        main()
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import Cluster, discover, preload, summary
+from model.entities import *
+
+
+def page_reads(reader, names, rounds, multi):
+    # the read cache would answer the dirty books after the first round, it is emptied so every page asks again
+    latencies = []
+
+    for _ in range(rounds):
+        reader.read_cache.clear()
+        start = time.perf_counter()
+        if multi:
+            books = reader.multi_read(names)
+        else:
+            books = [reader.read(name) for name in names]
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert all(book is not None for book in books)
+
+    return summary(latencies)
+
+
+def dirty(reader, name):
+    process = reader.replica(reader.shard(name))
+    with process.lock:
+        return not process.store.get(name).clean
+
+
+def measure(results, label, reader, names, rounds):
+    single = page_reads(reader, names, rounds, False)
+    multi = page_reads(reader, names, rounds, True)
+    results[label] = {'single': single, 'multi': multi}
+    print(f'{label:>22}: {len(names)} single reads p50 {single["p50_ms"]:.2f} ms, one multi read p50 '
+          f'{multi["p50_ms"]:.2f} ms')
+
+
+def run(args):
+    cluster = Cluster(args)
+    client = cluster.start()
+    chains = discover(client)
+    # the head's node holds the books dirty while the writes wait to be passed on
+    reader = cluster.nodes[0]
+    results = {}
+
+    try:
+        preload(client, args.books)
+        names = ['book ' + str(i) for i in range(0, args.books, args.books // args.page)][:args.page]
+
+        measure(results, 'client, tail', client, names, args.rounds)
+        measure(results, 'replica, clean', reader, names, args.rounds)
+
+        # long enough for the measurement, the run waits for the held back writes before it ends
+        client.set_timeout(args.delay)
+        for name in names:
+            client.write(Book(name, 1.0))
+        # only the books whose replica on the reader is a head turn dirty there, the others are held back before
+        heads = [name for name in names if reader.replica(reader.shard(name)).predecessor is None]
+        while not all(dirty(reader, name) for name in heads):
+            time.sleep(0.01)
+        measure(results, f'replica, {len(heads)} dirty', reader, names, args.rounds)
+        client.set_timeout(0)
+    finally:
+        cluster.stop(client)
+
+    return {'config': {key: value for key, value in vars(args).items() if key != 'json'},
+            'chains': len(chains), 'chain_length': len(chains[0]), 'pages': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reads pages of books one by one and with one multi read.')
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--chain-length', type=int, default=3)
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--mode', default='in-process', choices=['in-process'])
+    parser.add_argument('--server', default='sync', choices=['sync', 'aio'])
+    parser.add_argument('--store', default='plain', choices=['plain', 'compact'])
+    parser.add_argument('--base-port', type=int, default=22100)
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--page', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=100)
+    parser.add_argument('--delay', type=int, default=10, help='seconds the writes of the dirty pages are held back')
+    parser.add_argument('--json', help='file to write the results to')
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
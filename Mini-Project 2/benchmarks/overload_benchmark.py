@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+import shop_pb2
+import shop_pb2_grpc
+
+import grpc
+
+from harness import Cluster, discover, summary
+from model.entities import node_of
+
+
+def writer(address, head, worker, records, stop):
+    # writes to the head as fast as it takes them, for as long as the run lasts
+    with grpc.insecure_channel(address) as channel:
+        stub = shop_pb2_grpc.DistributedBookstoreStub(channel)
+        i = 0
+
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                stub.Write(shop_pb2.WriteRequest(process_id=head, name=f'writer {worker} book {i % 1000}', price=1.0))
+                records.append(('accepted', time.perf_counter() - start))
+            except grpc.RpcError as error:
+                if error.code() != grpc.StatusCode.RESOURCE_EXHAUSTED:
+                    raise
+                records.append(('rejected', time.perf_counter() - start))
+            i += 1
+
+
+def run(args, max_in_flight):
+    config.MAX_IN_FLIGHT = max_in_flight
+    config.ADMISSION_TIMEOUT = args.admission_timeout
+    cluster = Cluster(args)
+    client = cluster.start()
+    chain = discover(client)[0]
+    head = cluster.nodes[node_of(chain[0]) - 1].ids_to_processes[chain[0]]
+    # every hop holds writes and acks back, so the chain is much slower than the writers
+    client.set_timeout(args.delay)
+
+    records = []
+    stop = threading.Event()
+    threads = [threading.Thread(target=writer, args=[config.IDS_TO_IPS[node_of(chain[0])], chain[0], worker, records,
+                                                     stop])
+               for worker in range(args.writers)]
+    peak = 0
+
+    try:
+        for thread in threads:
+            thread.start()
+
+        deadline = time.monotonic() + args.duration
+        while time.monotonic() < deadline:
+            peak = max(peak, head.store.last_seq - head.store.clean_seq)
+            time.sleep(0.05)
+
+        stop.set()
+        for thread in threads:
+            thread.join()
+        client.set_timeout(0)
+    finally:
+        cluster.stop(client)
+
+    accepted = [seconds * 1000 for kind, seconds in records if kind == 'accepted']
+    rejected = [seconds * 1000 for kind, seconds in records if kind == 'rejected']
+    result = {'max_in_flight': max_in_flight, 'accepted': len(accepted), 'rejected': len(rejected),
+              'peak_in_flight': peak,
+              'accepted_latency': summary(accepted) if len(accepted) > 0 else None,
+              'rejected_latency': summary(rejected) if len(rejected) > 0 else None}
+
+    latency = result['accepted_latency']
+    print(f'max in flight {max_in_flight}: {len(accepted)} writes accepted, p50 {latency["p50_ms"]} ms, '
+          f'p99 {latency["p99_ms"]} ms, {len(rejected)} rejected, up to {peak} in flight at the head')
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Overloads a slow chain with writes, with and without a limit on the '
+                                                 'writes in flight.')
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--chain-length', type=int, default=3)
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--server', default='sync', choices=['sync', 'aio'])
+    parser.add_argument('--store', default='plain', choices=['plain', 'compact'])
+    parser.add_argument('--base-port', type=int, default=21800)
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--delay', type=int, default=1, help='seconds every hop holds writes and acks back')
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--limits', type=int, nargs='+', default=[0, 1000], help='0 runs without a limit')
+    parser.add_argument('--admission-timeout', type=float, default=0.5)
+    parser.add_argument('--json', help='file to write the results to')
+    args = parser.parse_args()
+    args.mode = 'in-process'
+
+    results = {'config': {key: value for key, value in vars(args).items() if key != 'json'},
+               'runs': [run(args, limit if limit > 0 else None) for limit in args.limits]}
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import Cluster, discover, preload
+from model.entities import *
+
+SIZES = [10000, 100000, 300000]
+QUERIES = 1000
+
+
+def fill(store_class, size):
+    # like a tail, which keeps its indexes up to date as the books are committed
+    store = store_class()
+    store.index_books()
+    for i in range(size):
+        store.add(Book('Book ' + str(i), float(i % 1000) / 10, i + 1))
+    store.clean_up_to(size)
+    return store
+
+
+def per_query(func, queries):
+    start = time.perf_counter()
+    for query in queries:
+        func(*query)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def scan_prices(store, low, high, limit):
+    with store.snapshot() as snapshot:
+        items, _ = snapshot.page(0, snapshot.length)
+
+    return [book for _, book, _ in items if low <= book.price < high][:limit]
+
+
+def stores(args):
+    # a page of matches from the indexes against finding them by looking at every committed book
+    print(f'{"store":>12} {"size":>8} {"prefix us":>10} {"price us":>10} {"scan us":>10}')
+    results = []
+
+    for store_class in [Store, CompactStore]:
+        for size in SIZES:
+            store = fill(store_class, size)
+            prefixes = [('Book ' + str(random.randrange(size))[:3], None, args.limit) for _ in range(QUERIES)]
+            ranges = [(low, low + 1, None, args.limit) for low in (random.randrange(990) / 10 for _ in range(QUERIES))]
+
+            prefix = per_query(store.find_prefix, prefixes)
+            price = per_query(store.find_price, ranges)
+            scan = per_query(lambda low, high, after, limit: scan_prices(store, low, high, limit), ranges[:10])
+
+            results.append({'store': store_class.__name__, 'size': size, 'prefix_us': round(prefix, 2),
+                            'price_us': round(price, 2), 'scan_us': round(scan, 2)})
+            print(f'{store_class.__name__:>12} {size:>8} {prefix:>10.2f} {price:>10.2f} {scan:>10.1f}')
+
+    return results
+
+
+def cluster(args):
+    # the same price query as an RPC to the tails against listing every book and filtering on the client
+    cluster = Cluster(args)
+    client = cluster.start()
+    discover(client)
+
+    try:
+        preload(client, args.books)
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            client.find_by_price(10, 11, args.limit)
+        indexed = (time.perf_counter() - start) / args.rounds * 1000
+
+        start = time.perf_counter()
+        for _ in range(max(args.rounds // 10, 1)):
+            [book for book in client.iter_books() if 10 <= book.price < 11][:args.limit]
+        listed = (time.perf_counter() - start) / max(args.rounds // 10, 1) * 1000
+    finally:
+        cluster.stop(client)
+
+    print(f'{args.books} books: find_by_price {indexed:.2f} ms, listing and filtering {listed:.2f} ms')
+    return {'books': args.books, 'find_by_price_ms': round(indexed, 3), 'list_and_filter_ms': round(listed, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures prefix and price queries on the indexes of the stores.')
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--chain-length', type=int, default=3)
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--mode', default='in-process', choices=['in-process', 'subprocess'])
+    parser.add_argument('--server', default='sync', choices=['sync', 'aio'])
+    parser.add_argument('--store', default='compact', choices=['plain', 'compact'])
+    parser.add_argument('--base-port', type=int, default=22200)
+    parser.add_argument('--books', type=int, default=100000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=100)
+    parser.add_argument('--json', help='file to write the results to')
+    args = parser.parse_args()
+
+    results = {'config': {key: value for key, value in vars(args).items() if key != 'json'},
+               'stores': stores(args), 'cluster': cluster(args)}
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model import persistence
+from model.entities import *
+
+BOOKS = 1000000
+LOGGED_WRITES = 100000
+BATCH = 256
+# a node checkpoints a process once its log has this many records, see CHECKPOINT_RECORDS in node.py, so a restart
+# loads the snapshot and replays about as many writes
+LOG_AFTER_SNAPSHOT = 10000
+
+
+def fill(process, books):
+    for i in range(books):
+        book = Book('Book ' + str(i), float(i % 100), i + 1)
+        process.store.add(book)
+        process.log.write(book)
+
+    process.log.wait(process.log.clean(books))
+    process.store.clean_up_to(books)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def write_throughput(process, writes, logged):
+    # the tail's path: apply a batch, and with a log wait until it is on disk before acknowledging it
+    start = time.perf_counter()
+    seq = process.store.last_seq
+
+    for first in range(0, writes, BATCH):
+        for i in range(first, min(first + BATCH, writes)):
+            seq += 1
+            book = Book('Book ' + str(i), 1.0, seq)
+            process.store.add(book)
+            if logged:
+                process.log.write(book)
+        process.store.clean_up_to(seq)
+        if logged:
+            process.log.wait(process.log.clean(seq))
+
+    return writes / (time.perf_counter() - start)
+
+
+def main():
+    directory = tempfile.mkdtemp()
+
+    try:
+        process = Process(node=1, number=1)
+        process.directory = os.path.join(directory, process.id)
+        process.store, process.log = persistence.open_store(process.directory)
+
+        _, elapsed = timed(fill, process, BOOKS)
+        print(f'logged {BOOKS} writes in {elapsed:.2f} s')
+
+        (_, replay), elapsed = timed(persistence.open_store, process.directory)
+        replay.close()
+        print(f'recovery from the log alone: {elapsed:.2f} s')
+
+        _, elapsed = timed(persistence.checkpoint, process)
+        print(f'checkpoint: {elapsed:.2f} s, snapshot of '
+              f'{os.path.getsize(os.path.join(process.directory, "snapshot")) / 2 ** 20:.1f} MiB')
+
+        for store_class in [Store, CompactStore]:
+            (store, log), elapsed = timed(persistence.open_store, process.directory, store_class)
+            log.close()
+            print(f'recovery from the snapshot into {store_class.__name__}: {elapsed:.2f} s for {len(store)} books')
+            del store
+
+        write_throughput(process, LOG_AFTER_SNAPSHOT, True)
+        for store_class in [Store, CompactStore]:
+            (store, log), elapsed = timed(persistence.open_store, process.directory, store_class)
+            log.close()
+            print(f'recovery from the snapshot and {LOG_AFTER_SNAPSHOT} logged writes into {store_class.__name__}: '
+                  f'{elapsed:.2f} s')
+            del store
+
+        # the best of a few rounds, so a collection over the million books loaded above does not decide the result
+        memory = Process(node=1, number=2)
+        rates = {False: 0, True: 0}
+        for _ in range(3):
+            for logged, target in [(False, memory), (True, process)]:
+                gc.collect()
+                rates[logged] = max(rates[logged], write_throughput(target, LOGGED_WRITES, logged))
+
+        print(f'in memory: {rates[False]:9.0f} writes/s')
+        print(f'logged:    {rates[True]:9.0f} writes/s in batches of {BATCH} with one fsync per batch')
+        process.log.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import Cluster, discover, prices, wait_clean
+from model.entities import *
+
+
+def burst(client, worker, writes, last):
+    # writes go out without waiting for each other, the chains only have to keep up with them
+    price = float(next(prices))
+
+    for i in range(writes):
+        name = f'writer {worker} book {i}'
+        client.write(Book(name, price))
+        last[client.shard(name)] = (name, price)
+
+
+def run(args, shards):
+    args.shards = shards
+    cluster = Cluster(args)
+    client = cluster.start()
+    chains = discover(client)
+
+    try:
+        lasts = [{} for _ in range(args.clients)]
+        shares = [args.writes // args.clients + (1 if i < args.writes % args.clients else 0)
+                  for i in range(args.clients)]
+        threads = [threading.Thread(target=burst, args=[client, worker, share, last])
+                   for worker, (share, last) in enumerate(zip(shares, lasts))]
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        sent = time.perf_counter() - start
+
+        # every chain orders its writes, so once the last write of every writer in every shard is clean all are
+        for last in lasts:
+            for name, price in last.values():
+                wait_clean(client, name, price)
+        elapsed = time.perf_counter() - start
+    finally:
+        cluster.stop(client)
+
+    heads = sorted(set(node_of(chain[0]) for chain in chains))
+    result = {'shards': len(chains), 'chain_length': len(chains[0]), 'heads_on_nodes': heads,
+              'sent_s': round(sent, 3), 'clean_s': round(elapsed, 3),
+              'writes_per_s': round(args.writes / elapsed, 1)}
+    print(f'{len(chains)} chains of {len(chains[0])} processes, heads on nodes {heads}: {args.writes} writes clean '
+          f'after {elapsed:.3f} s, {result["writes_per_s"]:.1f} writes/s')
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures how write throughput grows with the number of chains.')
+    parser.add_argument('--nodes', type=int, default=4)
+    parser.add_argument('--chain-length', type=int, default=3)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--mode', default='subprocess', choices=['in-process', 'subprocess'])
+    parser.add_argument('--server', default='sync', choices=['sync', 'aio'])
+    parser.add_argument('--store', default='plain', choices=['plain', 'compact'])
+    parser.add_argument('--base-port', type=int, default=21600)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--writes', type=int, default=20000)
+    parser.add_argument('--json', help='file to write the results to')
+    args = parser.parse_args()
+
+    results = {'config': {key: value for key, value in vars(args).items() if key != 'json'},
+               'host': {'cpus': os.cpu_count()},
+               'runs': [run(args, shards) for shards in list(args.shards)]}
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.entities import *
+
+SIZES = [1000, 10000, 100000, 300000]
+OPERATIONS = 100000
+
+
+def fill(store_class, size):
+    store = store_class()
+    for i in range(size):
+        store.add(Book('Book ' + str(i), float(i % 100), i + 1))
+    store.clean_up_to(size)
+    return store
+
+
+def measure(func, items):
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def main():
+    print(f'{"store":>12} {"size":>8} {"add us/op":>10} {"clean us/op":>12} {"get us/op":>10}')
+
+    for store_class in [Store, CompactStore]:
+        for size in SIZES:
+            store = fill(store_class, size)
+            names = ['Book ' + str(random.randrange(size)) for _ in range(OPERATIONS)]
+            seqs = range(size + 1, size + OPERATIONS + 1)
+
+            add = measure(lambda write: store.add(Book(write[0], 1.0, write[1])), list(zip(names, seqs)))
+            # the tail acknowledges every write on its own
+            clean = measure(store.clean_up_to, seqs)
+            get = measure(store.get, names)
+
+            print(f'{store_class.__name__:>12} {size:>8} {add:>10.3f} {clean:>12.3f} {get:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import csv
+import json
+import os
+import time
+
+from concurrent import futures
+from model.entities import *
+
+# books read from a file and written to the heads as one segment per shard, and how many segments may wait for their
+# commit before reading goes on
+SEGMENT_SIZE = 5000
+SEGMENTS_IN_FLIGHT = 8
+
+
+def file_format(path):
+    # csv files hold "name,price" rows, with or without that header, jsonl files one {"name", "price"} object a line
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    elif extension in ('.jsonl', '.json'):
+        return 'jsonl'
+
+    raise ValueError(f'Cannot tell the format of {path}, it has to end in .csv or .jsonl')
+
+
+def read_books(path):
+    # reads the file lazily, so it can be much larger than memory
+    with open(path, newline='') as file:
+        if file_format(path) == 'csv':
+            for i, row in enumerate(csv.reader(file)):
+                if len(row) == 0:
+                    continue
+                if i == 0 and row[0] == 'name':
+                    continue
+                yield Book(row[0], float(row[1]))
+        else:
+            for line in file:
+                if len(line.strip()) > 0:
+                    entry = json.loads(line)
+                    yield Book(entry['name'], float(entry['price']))
+
+
+def import_books(client, path, segment_size=SEGMENT_SIZE, in_flight=SEGMENTS_IN_FLIGHT):
+    # streams the file to the heads in large segments, which the chains replicate whole, and returns how many books
+    # were written and their commit took. Only a few segments wait for their commit at a time, so a slow chain slows
+    # the reading down instead of the whole file ending up in memory
+    start = time.perf_counter()
+    pending = []
+    segment = []
+    count = 0
+
+    for book in read_books(path):
+        segment.append(book)
+        if len(segment) == segment_size:
+            pending += client.write_segments(segment)
+            count += len(segment)
+            segment = []
+
+            if len(pending) >= in_flight:
+                done, not_done = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                pending = list(not_done)
+
+    if len(segment) > 0:
+        pending += client.write_segments(segment)
+        count += len(segment)
+    for future in pending:
+        future.result()
+
+    return count, time.perf_counter() - start
+
+
+def export_books(node, path, page_size=None):
+    # writes the clean books of every shard to the file as they come from the tails, page by page, and returns how many
+    # there were
+    books = node.iter_books(page_size) if page_size is not None else node.iter_books()
+    count = 0
+
+    with open(path, 'w', newline='') as file:
+        if file_format(path) == 'csv':
+            writer = csv.writer(file)
+            writer.writerow(['name', 'price'])
+            for book in books:
+                writer.writerow([book.name, book.price])
+                count += 1
+        else:
+            for book in books:
+                file.write(json.dumps({'name': book.name, 'price': book.price}) + '\n')
+                count += 1
+
+    return count
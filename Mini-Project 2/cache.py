@@ -0,0 +1,94 @@
+import threading
+
+from collections import OrderedDict
+from concurrent import futures
+
+
+class ReadCache:
+    # a bounded LRU of answers from the tail, each kept together with a token of what we knew locally when it was
+    # loaded: a different token on lookup means something changed since, and the answer is loaded again
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        # loads in progress, callers missing the same key and token meanwhile wait for them instead of loading too
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, key, token):
+        # returns the cached value, or None when there is none for this token
+        with self.lock:
+            return self.find(key, token)
+
+    def find(self, key, token):
+        cached = self.entries.get(key)
+
+        if cached is None:
+            return None
+        elif cached[0] != token:
+            del self.entries[key]
+            self.invalidations += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return cached[1]
+
+    def put(self, key, token, value):
+        with self.lock:
+            self.add(key, token, value)
+
+    def add(self, key, token, value):
+        self.entries[key] = (token, value)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key, token, load):
+        with self.lock:
+            value = self.find(key, token)
+            if value is not None:
+                return value
+
+            flight = self.flights.get((key, token))
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                flight = self.flights[(key, token)] = futures.Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return flight.result()
+
+        try:
+            value = load(key)
+        except BaseException as error:
+            with self.lock:
+                del self.flights[(key, token)]
+            flight.set_exception(error)
+            raise
+
+        with self.lock:
+            del self.flights[(key, token)]
+            self.add(key, token, value)
+        flight.set_result(value)
+
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return self.hits, self.misses, self.coalesced, self.invalidations, self.evictions, len(self.entries)
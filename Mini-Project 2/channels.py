@@ -0,0 +1,43 @@
+import shop_pb2_grpc
+
+import grpc
+import threading
+
+from contextlib import contextmanager
+
+# a channel whose connection broke tries again after at most this long, instead of gRPC's default of up to two
+# minutes, so a peer that restarts is reachable again within a few heartbeats
+CHANNEL_OPTIONS = [('grpc.initial_reconnect_backoff_ms', 100), ('grpc.max_reconnect_backoff_ms', 1000)]
+
+
+class ChannelPool:
+    # one channel for every peer for as long as the node runs. A failed call is never a reason to close it: gRPC
+    # reconnects a broken connection by itself, while closing the channel would cancel every other call on it, the
+    # long-lived Replicate and Commit streams among them, and a call that only ran into its deadline says nothing
+    # about the connection at all
+    def __init__(self):
+        self.stubs = {}
+        self.channels = {}
+        self.lock = threading.Lock()
+
+    def stub(self, address):
+        with self.lock:
+            stub = self.stubs.get(address)
+            if stub is None:
+                self.channels[address] = grpc.insecure_channel(address, options=CHANNEL_OPTIONS)
+                stub = shop_pb2_grpc.DistributedBookstoreStub(self.channels[address])
+                self.stubs[address] = stub
+
+            return stub
+
+    @contextmanager
+    def connect(self, address):
+        # the channel stays open between calls, so every hop reuses the same HTTP/2 connection
+        yield self.stub(address)
+
+    def close(self):
+        with self.lock:
+            for channel in self.channels.values():
+                channel.close()
+            self.channels.clear()
+            self.stubs.clear()
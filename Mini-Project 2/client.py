@@ -0,0 +1,199 @@
+import shop_pb2
+
+import grpc
+import threading
+import time
+
+from collections import deque
+from concurrent import futures
+
+# a Commit stream holds a worker of the node's server for as long as it is open, so one that has nothing to do for
+# this long ends, and the next write opens another one
+IDLE_TIMEOUT = 5
+
+
+class CommitStream:
+    # one Commit stream to a node with heads on it: writes leave in batches in the order they were made, and the node
+    # answers every batch once the tail has acknowledged all of it. Writes come in segments of one or more books with
+    # one future for each segment, the segments of a batch go to the same head
+    def __init__(self, node, address, max_batch=256, retry_delay=1, idle_timeout=IDLE_TIMEOUT):
+        self.node = node
+        self.address = address
+        self.max_batch = max_batch
+        self.retry_delay = retry_delay
+        self.idle_timeout = idle_timeout
+        self.queued = deque()
+        self.condition = threading.Condition()
+        # the batches sent on the current stream that are not answered yet, by their number on the stream
+        self.sent = None
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, process_id, books):
+        # returns None once the stream is closed
+        future = futures.Future()
+
+        with self.condition:
+            if self.closed:
+                return None
+            self.queued.append((process_id, books, future, time.perf_counter()))
+            self.condition.notify()
+
+        return future
+
+    def pending(self):
+        with self.condition:
+            return len(self.queued) + sum(len(segments) for segments in (self.sent or {}).values())
+
+    def close(self):
+        # what is queued still goes out, the stream ends once all of it is answered
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+    def requests(self, sent):
+        batch = 0
+
+        while True:
+            with self.condition:
+                idle = time.monotonic() + self.idle_timeout
+                while len(self.queued) == 0 and not self.closed and self.sent is sent:
+                    remaining = idle - time.monotonic()
+                    if remaining > 0:
+                        self.condition.wait(remaining)
+                    elif len(sent) > 0:
+                        # batches still wait for their answers, the stream is not idle yet
+                        idle = time.monotonic() + self.idle_timeout
+                    else:
+                        self.closed = True
+                if len(self.queued) == 0 or self.sent is not sent:
+                    return
+
+                # a batch goes to one head, the writes for other heads follow in the next ones. Segments are never
+                # split, so one larger than max_batch is a batch of its own
+                process_id = self.queued[0][0]
+                segments = [self.queued.popleft()]
+                size = len(segments[0][1])
+                while (len(self.queued) > 0 and self.queued[0][0] == process_id and
+                       size + len(self.queued[0][1]) <= self.max_batch):
+                    segments.append(self.queued.popleft())
+                    size += len(segments[-1][1])
+                sent[batch] = segments
+
+            yield shop_pb2.WriteBatchRequest(process_id=process_id, books=[
+                shop_pb2.Book(name=book.name, price=book.price) for _, books, _, _ in segments for book in books])
+            batch += 1
+
+    def run(self):
+        while True:
+            sent = {}
+            with self.condition:
+                self.sent = sent
+
+            try:
+                with self.node.channels.connect(self.address) as stub:
+                    for response in stub.Commit(self.requests(sent)):
+                        with self.condition:
+                            segments = sent.pop(response.batch)
+                        self.resolve(segments, response.seq)
+                # the stream only ends once it was closed and everything on it is answered
+                return
+            except grpc.RpcError as error:
+                # the writes that were sent may or may not have made it into the chain, their callers have to decide
+                # whether to write them again. Without writes waiting the stream is given up, the next write opens
+                # another one, so a node that is gone is not tried forever
+                with self.condition:
+                    self.sent = None
+                    failed = [segment for segments in sent.values() for segment in segments]
+                    if len(self.queued) == 0:
+                        self.closed = True
+                    if self.closed:
+                        failed += self.queued
+                        self.queued.clear()
+                    self.condition.notify_all()
+
+                for _, _, future, _ in failed:
+                    future.set_exception(error)
+
+                if self.closed:
+                    return
+                print(f'Commit stream to {self.address} failed: {error.code()}')
+                time.sleep(self.retry_delay)
+
+    def resolve(self, segments, seq):
+        # the head stamps the writes of a batch one after another, so the last one's sequence number gives those of
+        # all of them. A segment resolves with the sequence number of its last write
+        now = time.perf_counter()
+        seqs = []
+        for _, books, _, _ in reversed(segments):
+            seqs.append(seq)
+            seq -= len(books)
+
+        for (_, _, future, started), last in zip(segments, reversed(seqs)):
+            self.node.metrics.observe('Commit', now - started)
+            future.set_result(last)
+
+
+class Client:
+    # writes that tell when they are done: write() returns a future that resolves with the write's sequence number in
+    # its shard once the write is clean at the tail. The writes for a node share one Commit stream, so a producer can
+    # keep many of them in flight and wait for all of them at the end
+    def __init__(self, node, max_batch=256):
+        self.node = node
+        self.max_batch = max_batch
+        self.streams = {}
+        self.lock = threading.Lock()
+
+    def write(self, book):
+        return self.write_segment(self.node.shard(book.name), [book])
+
+    def write_segment(self, shard, books):
+        # the books all belong to the shard and go to its head as one piece, the future resolves with the sequence
+        # number of the last of them
+        head = self.node.head(shard)
+
+        while True:
+            future = self.stream(self.node.routes.address(head)).write(head, books)
+            if future is not None:
+                return future
+
+    def write_segments(self, books):
+        # splits the books by shard, keeping their order within every shard, with one future for each shard
+        shards = {}
+        for book in books:
+            shards.setdefault(self.node.shard(book.name), []).append(book)
+
+        return [self.write_segment(shard, segment) for shard, segment in shards.items()]
+
+    def commit(self, books, timeout=None):
+        # writes all the books at once and returns their sequence numbers once every one of them is clean
+        pending = [self.write(book) for book in books]
+        done, not_done = futures.wait(pending, timeout)
+        if len(not_done) > 0:
+            raise TimeoutError(f'{len(not_done)} of {len(pending)} writes were not clean after {timeout} s')
+
+        return [future.result() for future in pending]
+
+    def stream(self, address):
+        with self.lock:
+            stream = self.streams.get(address)
+            if stream is None or stream.closed:
+                stream = CommitStream(self.node, address, self.max_batch)
+                self.streams[address] = stream
+
+            return stream
+
+    def pending(self):
+        return sum(stream.pending() for stream in list(self.streams.values()))
+
+    def drop_streams(self):
+        # the heads moved, the writes still waiting on the old streams are answered or failed there
+        with self.lock:
+            streams, self.streams = self.streams, {}
+
+        for stream in streams.values():
+            stream.close()
+
+    def close(self):
+        self.drop_streams()
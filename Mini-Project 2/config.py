@@ -2,3 +2,36 @@ NUM_NODES = 3
 IDS_TO_IPS = {1: 'localhost:20048',
               2: 'localhost:20049',
               3: 'localhost:20050'}
+
+# a file with a line "<node id> <host:port>" for every node of the cluster, which then replaces IDS_TO_IPS, see
+# load_members in routing.py
+MEMBERS_FILE = None
+
+# seconds to wait for each node when contacting all of them
+RPC_TIMEOUT = 5
+
+# directory where every process keeps its log and snapshots, None keeps the stores in memory only
+DATA_DIR = None
+
+# keep the books of every process in columns instead of one object per book, see CompactStore in model/entities.py.
+# With DATA_DIR set, a restarted process with a million books is back in about half a second this way, while one
+# object per book takes about two seconds, see benchmarks/recovery_benchmark.py
+COMPACT_STORES = True
+
+# how create_chain orders the processes it put into a chain: 'grouped' keeps the processes of a node next to each other,
+# so writes only cross over to another node once for every node of the chain and are handed over in memory otherwise,
+# 'spread' alternates the nodes. Both put the same processes, and so the same nodes, into every chain
+PLACEMENT = 'grouped'
+
+# writes a chain may have in flight, stamped by its head but not acknowledged by its tail yet, before the head holds new
+# ones back, and how many seconds a held back write waits for room before it is rejected with RESOURCE_EXHAUSTED.
+# Writes that come over a replication stream wait as long as it takes, which slows the stream down instead.
+# None lets writes pile up without a limit
+MAX_IN_FLIGHT = 10000
+ADMISSION_TIMEOUT = 1
+
+# serve on grpc.aio with one event loop per node instead of a pool of worker threads, see AsyncNode in node.py
+ASYNC_SERVER = False
+
+# node i serves its metrics for Prometheus on http://localhost:METRICS_PORT + i, None turns this off
+METRICS_PORT = None
@@ -0,0 +1,142 @@
+import bisect
+import threading
+import time
+
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# upper bounds of the latency buckets in seconds, a last bucket takes everything slower
+BOUNDS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+
+class Metrics:
+    # what a node measures about itself: how long the RPCs it serves take and how much it sends to every peer
+    def __init__(self):
+        self.histograms = {}
+        self.bytes_sent = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, rpc):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(rpc, time.perf_counter() - start)
+
+    def observe(self, rpc, seconds):
+        with self.lock:
+            histogram = self.histograms.get(rpc)
+            if histogram is None:
+                histogram = Histogram()
+                self.histograms[rpc] = histogram
+
+            histogram.observe(seconds)
+
+    def sent(self, peer, messages):
+        # counts the messages on their way to a peer and hands them on
+        size = sum(message.ByteSize() for message in messages)
+
+        with self.lock:
+            self.bytes_sent[peer] = self.bytes_sent.get(peer, 0) + size
+
+        return messages
+
+    def latencies(self):
+        # (rpc, bucket counts, count, sum) of every RPC served so far
+        with self.lock:
+            return [(rpc, list(histogram.counts), histogram.count, histogram.sum)
+                    for rpc, histogram in sorted(self.histograms.items())]
+
+    def peers(self):
+        with self.lock:
+            return sorted(self.bytes_sent.items())
+
+
+def quantile(counts, q):
+    # the upper bound of the bucket the quantile falls in, which is as precise as the buckets allow
+    rank = q * sum(counts)
+    seen = 0
+
+    for bound, count in zip(BOUNDS + [float('inf')], counts):
+        seen += count
+        if count > 0 and seen >= rank:
+            return bound
+
+    return 0
+
+
+def prometheus_text(stats):
+    # renders a StatsResponse in the Prometheus text format
+    node = f'node="{stats.node_id}"'
+    lines = ['# TYPE bookstore_rpc_latency_seconds histogram']
+
+    for histogram in stats.latencies:
+        labels = f'{node},rpc="{histogram.rpc}"'
+        seen = 0
+        for bound, count in zip(BOUNDS + ['+Inf'], histogram.counts):
+            seen += count
+            lines.append(f'bookstore_rpc_latency_seconds_bucket{{{labels},le="{bound}"}} {seen}')
+        lines.append(f'bookstore_rpc_latency_seconds_sum{{{labels}}} {histogram.sum}')
+        lines.append(f'bookstore_rpc_latency_seconds_count{{{labels}}} {histogram.count}')
+
+    for name, field, help_ in [('dirty', 'dirty', 'entries that are not clean yet'),
+                               ('oldest_dirty_age_seconds', 'oldest_dirty_age', 'how long the oldest dirty write waits'),
+                               ('last_seq', 'last_seq', 'highest sequence number written'),
+                               ('clean_seq', 'clean_seq', 'highest sequence number acknowledged')]:
+        lines.append(f'# HELP bookstore_process_{name} {help_}')
+        lines.append(f'# TYPE bookstore_process_{name} gauge')
+        for process in stats.processes:
+            lines.append(f'bookstore_process_{name}{{{node},process="{process.process_id}"}} '
+                         f'{getattr(process, field)}')
+
+    lines.append('# TYPE bookstore_queue_depth gauge')
+    for state in ['delayed', 'queued', 'sending']:
+        lines.append(f'bookstore_queue_depth{{{node},state="{state}"}} {getattr(stats, state)}')
+
+    lines.append('# TYPE bookstore_read_cache_total counter')
+    for event in ['hits', 'misses', 'coalesced', 'invalidations', 'evictions']:
+        lines.append(f'bookstore_read_cache_total{{{node},event="{event}"}} {getattr(stats.cache, event)}')
+    lines.append('# TYPE bookstore_read_cache_size gauge')
+    lines.append(f'bookstore_read_cache_size{{{node}}} {stats.cache.size}')
+
+    lines.append('# TYPE bookstore_rejected_writes_total counter')
+    lines.append(f'bookstore_rejected_writes_total{{{node}}} {stats.rejected}')
+
+    lines.append('# TYPE bookstore_sent_bytes_total counter')
+    for peer in stats.peers:
+        lines.append(f'bookstore_sent_bytes_total{{{node},peer="{peer.address}"}} {peer.bytes_sent}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def serve_prometheus(port, collect):
+    # a plain HTTP server thread answering every GET with the text collect() returns
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = collect().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
@@ -1,43 +1,552 @@
+import sys
+import threading
+import time
+
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from itertools import islice, takewhile
+
+# keys a chunk of a SortedIndex holds before it is split in two
+INDEX_CHUNK = 512
+
+
 class Book:
-    def __init__(self, name, price):
+    __slots__ = ['name', 'price', 'seq']
+
+    def __init__(self, name, price, seq=0):
         self.name = name
         self.price = price
+        self.seq = seq
 
     def __eq__(self, other):
         return (self.name, self.price) == (other.name, other.price)
 
 
+class SortedIndex:
+    # a sorted list of keys cut into chunks, so adding or removing a key only moves the keys of its chunk, and maxes
+    # holds the last key of every chunk to find a chunk with one bisect. The k keys from some key on take O(log n + k)
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self.chunks = [keys[i:i + INDEX_CHUNK] for i in range(0, len(keys), INDEX_CHUNK)]
+        self.maxes = [chunk[-1] for chunk in self.chunks]
+        self.length = len(keys)
+
+    def __len__(self):
+        return self.length
+
+    def add(self, key):
+        self.length += 1
+
+        if len(self.chunks) == 0:
+            self.chunks.append([key])
+            self.maxes.append(key)
+            return
+
+        i = min(bisect_left(self.maxes, key), len(self.chunks) - 1)
+        chunk = self.chunks[i]
+        insort(chunk, key)
+        self.maxes[i] = chunk[-1]
+
+        if len(chunk) > 2 * INDEX_CHUNK:
+            self.chunks[i:i + 1] = [chunk[:INDEX_CHUNK], chunk[INDEX_CHUNK:]]
+            self.maxes[i:i + 1] = [chunk[INDEX_CHUNK - 1], chunk[-1]]
+
+    def remove(self, key):
+        i = bisect_left(self.maxes, key)
+        if i == len(self.chunks):
+            return
+
+        chunk = self.chunks[i]
+        j = bisect_left(chunk, key)
+        if j == len(chunk) or chunk[j] != key:
+            return
+
+        del chunk[j]
+        self.length -= 1
+        if len(chunk) == 0:
+            del self.chunks[i]
+            del self.maxes[i]
+        else:
+            self.maxes[i] = chunk[-1]
+
+    def from_key(self, key, inclusive=True):
+        # the keys from key on in order, without it unless inclusive
+        find = bisect_left if inclusive else bisect_right
+        i = find(self.maxes, key)
+
+        if i < len(self.chunks):
+            yield from islice(self.chunks[i], find(self.chunks[i], key), None)
+        for chunk in islice(self.chunks, i + 1, None):
+            yield from chunk
+
+
+class BookIndexes:
+    # the committed books of a store sorted by name and by price, kept up to date by the store whenever a committed
+    # version changes. Queries take the store's lock like every other access
+    def __init__(self, books=()):
+        books = list(books)
+        self.names = SortedIndex(name for name, _ in books)
+        self.prices = SortedIndex((price, name) for name, price in books)
+
+    def update(self, name, old_price, new_price):
+        # old_price is None when the book had no committed version yet
+        if old_price is None:
+            self.names.add(name)
+        elif old_price == new_price:
+            return
+        else:
+            self.prices.remove((old_price, name))
+        self.prices.add((new_price, name))
+
+    def prefix(self, prefix, after=None, limit=None):
+        # names that start with prefix in order, only those after the given one if there is one. They all follow the
+        # prefix itself in the index
+        if after is not None and after >= prefix:
+            names = self.names.from_key(after, inclusive=False)
+        else:
+            names = self.names.from_key(prefix)
+
+        return list(islice(takewhile(lambda name: name.startswith(prefix), names), limit))
+
+    def price_range(self, min_price, max_price=None, after=None, limit=None):
+        # (price, name) of the books with min_price <= price < max_price in order, only those after the given key if
+        # there is one
+        if after is not None and after >= (min_price, ''):
+            keys = self.prices.from_key(after, inclusive=False)
+        else:
+            keys = self.prices.from_key((min_price, ''))
+
+        if max_price is not None:
+            keys = takewhile(lambda key: key[0] < max_price, keys)
+
+        return list(islice(keys, limit))
+
+
 class Store:
+    class Snapshot:
+        # a consistent view of the committed books: writers save the value they replace instead of being blocked
+        def __init__(self, store):
+            self.store = store
+            self.length = len(store)
+            self.preserved = {}
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            self.close()
+
+        def preserve(self, name, committed):
+            if name not in self.preserved:
+                self.preserved[name] = committed
+
+        def page(self, start, size):
+            # returns (name, committed book or None, currently clean) for up to size entries and the next position
+            end = min(start + size, self.length)
+            items = []
+
+            for i in range(start, end):
+                # the entry is read before the saved values, since writers save the old value before replacing it
+                name, committed, clean = self.store.state(i)
+                items.append((name, self.preserved.get(name, committed), clean))
+
+            return items, end
+
+        def close(self):
+            self.store.snapshots = tuple(snapshot for snapshot in self.store.snapshots if snapshot is not self)
+
     class Entry:
         def __init__(self, book, clean):
             self.book = book
             self.clean = clean
+            # the last clean version and the (seq, price) of the dirty versions written after it, oldest first
+            self.committed = book if clean else None
+            self.versions = []
 
     def __init__(self):
+        # data keeps insertion order for listing, index gives constant time lookups by name
         self.data = []
+        self.index = {}
+        # (seq, name, arrival time) of the dirty writes in sequence order, so a clean ack only has to look at the
+        # writes it covers and the oldest one tells how long acks take
+        self.pending = deque()
+        self.last_seq = 0
+        self.clean_seq = 0
+        self.snapshots = ()
+        # sorted indexes of the committed books for the queries, which only the tail answers, see index_books
+        self.indexes = None
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, name):
+        return self.index.get(name)
+
+    def state(self, position):
+        entry = self.data[position]
+
+        return entry.book.name, entry.committed, entry.clean
+
+    def add(self, book):
+        self.last_seq = max(self.last_seq, book.seq)
+        self.pending.append((book.seq, book.name, time.monotonic()))
+        # books in the store are replaced rather than changed, so snapshots and books being forwarded can share them
+        book = Book(book.name, book.price, book.seq)
+        entry = self.index.get(book.name)
+
+        if entry is not None:
+            entry.book = book
+            entry.clean = False
+            entry.versions.append((book.seq, book.price))
+            return
+
+        entry = self.Entry(book, False)
+        entry.versions.append((book.seq, book.price))
+        self.data.append(entry)
+        self.index[book.name] = entry
+
+    def clean_up_to(self, seq):
+        while len(self.pending) > 0 and self.pending[0][0] <= seq:
+            _, name, _ = self.pending.popleft()
+            entry = self.index[name]
+
+            while len(entry.versions) > 0 and entry.versions[0][0] <= seq:
+                version, price = entry.versions.pop(0)
+                self.commit(entry, entry.book if version == entry.book.seq else Book(name, price, version))
+
+            # a later write to the same book keeps it dirty until that write is acknowledged too
+            entry.clean = len(entry.versions) == 0
+
+        self.clean_seq = max(self.clean_seq, seq)
+
+    def commit(self, entry, book):
+        # committed books are never changed in place, open snapshots only need to keep the one being replaced
+        for snapshot in self.snapshots:
+            snapshot.preserve(entry.book.name, entry.committed)
+        if self.indexes is not None:
+            self.indexes.update(book.name, entry.committed.price if entry.committed is not None else None, book.price)
+        entry.committed = book
+
+    def dirty(self):
+        # (seq, name, price) of every write that is not clean yet, in sequence order
+        names = set(name for _, name, _ in self.pending)
+
+        return sorted((seq, name, price) for name in names for seq, price in self.index[name].versions)
+
+    def dirty_count(self):
+        return len(set(name for _, name, _ in self.pending))
+
+    def oldest_dirty(self):
+        return self.pending[0][2] if len(self.pending) > 0 else None
+
+    def restore(self, names, prices, seqs, committed, last_seq, clean_seq):
+        # rebuilds the store in its original order from the books committed at a snapshot, where books that were not
+        # committed yet are only placeholders that keep their position until their dirty writes are added again
+        self.data = list(map(self.Entry, map(Book, names, prices, seqs), map(bool, committed)))
+        self.index = dict(zip(names, self.data))
+        self.indexes = None
+
+        self.last_seq = last_seq
+        self.clean_seq = clean_seq
+
+    def snapshot(self):
+        snapshot = self.Snapshot(self)
+        self.snapshots += (snapshot,)
+
+        return snapshot
+
+    def version(self, name):
+        entry = self.index.get(name)
+
+        if entry is None or entry.committed is None:
+            return 0
+        return entry.committed.seq
+
+    def read(self, name, version):
+        # returns the book as it was at the given version, which the tail reports as the committed one
+        entry = self.index.get(name)
+
+        if entry is None or version == 0:
+            return None
+
+        for seq, price in entry.versions:
+            if seq == version:
+                return Book(name, price, seq)
+
+        return entry.committed
+
+    def index_books(self):
+        # the indexes cost as much memory as the rest of the store and slow down every commit, so only a process that
+        # becomes the tail builds them, and others drop them
+        self.indexes = BookIndexes((entry.committed.name, entry.committed.price)
+                                   for entry in self.data if entry.committed is not None)
+
+    def find_prefix(self, prefix, after=None, limit=None):
+        if self.indexes is None:
+            self.index_books()
+        return [self.index[name].committed for name in self.indexes.prefix(prefix, after, limit)]
+
+    def find_price(self, min_price, max_price=None, after=None, limit=None):
+        if self.indexes is None:
+            self.index_books()
+        return [Book(name, price) for price, name in self.indexes.price_range(min_price, max_price, after, limit)]
+
+
+class CompactStore:
+    # the same interface as Store, but books are kept in columns instead of as objects: a clean book costs its
+    # position in the index and a few array slots, names are interned so the processes of a node share them
+    Snapshot = Store.Snapshot
+
+    class Entry:
+        # a view of one position, made when an entry is asked for
+        __slots__ = ['store', 'position']
+
+        def __init__(self, store, position):
+            self.store = store
+            self.position = position
+
+        @property
+        def book(self):
+            return self.store.book(self.position)
+
+        @property
+        def clean(self):
+            return self.store.is_clean(self.position)
+
+        @property
+        def committed(self):
+            return self.store.committed(self.position)
+
+        @property
+        def versions(self):
+            return list(self.store.unclean.get(self.position, (None, []))[1])
+
+    def __init__(self):
+        self.names = []
+        self.index = {}
+        # price and seq of the latest write of every book
+        self.prices = array('d')
+        self.seqs = array('Q')
+        # one bit per book, the latest write of a book is also its committed version when the bit is set
+        self.clean = bytearray()
+        # for books that are not clean: [committed (seq, price) or None, (seq, price) of the dirty versions]
+        self.unclean = {}
+        self.pending = deque()
+        self.last_seq = 0
+        self.clean_seq = 0
+        self.snapshots = ()
+        # sorted indexes of the committed books for the queries, which only the tail answers, see index_books
+        self.indexes = None
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def data(self):
+        return [self.Entry(self, position) for position in range(len(self.names))]
+
+    def is_clean(self, position):
+        return self.clean[position >> 3] >> (position & 7) & 1 == 1
+
+    def set_clean(self, position, clean):
+        if clean:
+            self.clean[position >> 3] |= 1 << (position & 7)
+        else:
+            self.clean[position >> 3] &= ~(1 << (position & 7)) & 0xff
+
+    def book(self, position):
+        return Book(self.names[position], self.prices[position], self.seqs[position])
+
+    def committed(self, position):
+        state = self.unclean.get(position)
+
+        if state is None:
+            return self.book(position)
+        elif state[0] is None:
+            return None
+        return Book(self.names[position], state[0][1], state[0][0])
+
+    def get(self, name):
+        position = self.index.get(name)
+
+        return self.Entry(self, position) if position is not None else None
+
+    def state(self, position):
+        return self.names[position], self.committed(position), self.is_clean(position)
 
     def add(self, book):
-        for entry in self.data:
-            if entry.book.name == book.name:
-                entry.book.price = book.price
-                entry.clean = False
-                return
+        self.last_seq = max(self.last_seq, book.seq)
+        position = self.index.get(book.name)
+
+        if position is None:
+            name = sys.intern(book.name)
+            position = len(self.names)
+            self.names.append(name)
+            self.index[name] = position
+            self.prices.append(0)
+            self.seqs.append(0)
+            if position & 7 == 0:
+                self.clean.append(0)
+            self.unclean[position] = [None, []]
+        elif position not in self.unclean:
+            # the book written so far stays the committed one until the new write is acknowledged. Snapshots read the
+            # columns without the lock, so they keep it before the columns change under them
+            for snapshot in self.snapshots:
+                snapshot.preserve(self.names[position], self.book(position))
+            self.unclean[position] = [(self.seqs[position], self.prices[position]), []]
+            self.set_clean(position, False)
+
+        self.prices[position] = book.price
+        self.seqs[position] = book.seq
+        self.unclean[position][1].append((book.seq, book.price))
+        self.pending.append((book.seq, position, time.monotonic()))
+
+    def clean_up_to(self, seq):
+        while len(self.pending) > 0 and self.pending[0][0] <= seq:
+            _, position, _ = self.pending.popleft()
+            state = self.unclean.get(position)
+
+            if state is None:
+                continue
+
+            versions = state[1]
+            while len(versions) > 0 and versions[0][0] <= seq:
+                self.commit(position, versions.pop(0))
+
+            # the last dirty version is the latest write, so once it is committed the book is clean
+            if len(versions) == 0:
+                del self.unclean[position]
+                self.set_clean(position, True)
+
+        self.clean_seq = max(self.clean_seq, seq)
+
+    def commit(self, position, version):
+        for snapshot in self.snapshots:
+            snapshot.preserve(self.names[position], self.committed(position))
+        old = self.unclean[position][0]
+        if self.indexes is not None:
+            self.indexes.update(self.names[position], old[1] if old is not None else None, version[1])
+        self.unclean[position][0] = version
+
+    def dirty(self):
+        return sorted((seq, self.names[position], price)
+                      for position, (_, versions) in self.unclean.items() for seq, price in versions)
+
+    def dirty_count(self):
+        return len(self.unclean)
+
+    def oldest_dirty(self):
+        return self.pending[0][2] if len(self.pending) > 0 else None
+
+    def restore(self, names, prices, seqs, committed, last_seq, clean_seq):
+        # placeholders of books that were not committed at the snapshot wait for their dirty writes to be added again
+        # the names are not interned here: that takes as long as building the index, and a restarted process is meant to
+        # be back within a second. Processes restored on the same node keep a copy of the names each
+        self.names = names
+        self.index = dict(zip(self.names, range(len(self.names))))
+        self.prices = array('d', prices)
+        self.seqs = array('Q', seqs)
+        self.indexes = None
+        # the flags are packed into bits by reading them backwards as one binary number, bit i is book i
+        committed = bytes(committed)
+        bits = committed.translate(bytes.maketrans(b'\0\1', b'01'))[::-1] or b'0'
+        self.clean = bytearray(int(bits, 2).to_bytes((len(committed) + 7) // 8, 'little'))
+        self.unclean = {}
+
+        position = committed.find(0)
+        while position != -1:
+            self.unclean[position] = [None, []]
+            position = committed.find(0, position + 1)
+
+        self.last_seq = last_seq
+        self.clean_seq = clean_seq
+
+    def snapshot(self):
+        snapshot = self.Snapshot(self)
+        self.snapshots += (snapshot,)
+
+        return snapshot
+
+    def version(self, name):
+        position = self.index.get(name)
+
+        if position is None:
+            return 0
+
+        state = self.unclean.get(position)
+        if state is None:
+            return self.seqs[position]
+        return state[0][0] if state[0] is not None else 0
+
+    def read(self, name, version):
+        position = self.index.get(name)
+
+        if position is None or version == 0:
+            return None
+
+        state = self.unclean.get(position)
+        if state is not None:
+            for seq, price in state[1]:
+                if seq == version:
+                    return Book(name, price, seq)
+
+        return self.committed(position)
+
+    def index_books(self):
+        books = (self.committed(position) for position in range(len(self.names)))
+        self.indexes = BookIndexes((book.name, book.price) for book in books if book is not None)
+
+    def find_prefix(self, prefix, after=None, limit=None):
+        if self.indexes is None:
+            self.index_books()
+        return [self.committed(self.index[name]) for name in self.indexes.prefix(prefix, after, limit)]
+
+    def find_price(self, min_price, max_price=None, after=None, limit=None):
+        if self.indexes is None:
+            self.index_books()
+        return [Book(name, price) for price, name in self.indexes.price_range(min_price, max_price, after, limit)]
+
+
+def process_name(node, index):
+    return 'Node' + str(node) + '-ps' + str(index)
+
+
+def parse_process_id(process_id):
+    # the node and index of Node<node>-ps<index>, node ids can have any number of digits
+    node, index = process_id[4:].split('-ps')
+    return int(node), int(index)
 
-        self.data.append(self.Entry(book, False))
 
-    def make_clean(self, name):
-        for entry in self.data:
-            if entry.book.name == name:
-                entry.clean = True
-                break
+def node_of(process_id):
+    return parse_process_id(process_id)[0]
 
 
 class Process:
-    def __init__(self, node, number):
-        self.id = 'Node' + str(node) + '-ps' + str(number)
-        self.store = Store()
+    def __init__(self, node, number, store_class=Store):
+        self.id = process_name(node, number)
+        self.node = node
+        self.index = number
+        self.store_class = store_class
+        self.store = store_class()
         self.successor = None
         self.predecessor = None
+        # the chain the process is linked into, which holds the books of this shard only
+        self.shard = 0
+        # while a process is attached after this one, it gets a copy of every write, see Node.Transfer
+        self.follower = None
+        # a process being attached keeps the writes it gets without passing them on until it is linked, and holds them
+        # back in the backlog until its copy of the store has arrived
+        self.joining = False
+        self.backlog = None
+        self.lock = threading.Lock()
+        # a head waits here for acks while its chain has too many writes in flight, see Node.admit
+        self.room = threading.Condition(self.lock)
+        # a head's callbacks for writes a client waits on, as (seq, callback) in the order of seq, see Node.Commit
+        self.commits = deque()
+        # set when the store is kept on disk, see model/persistence.py
+        self.directory = None
+        self.log = None
 
     def clear_store(self):
-        self.store = Store()
+        self.store = self.store_class()
@@ -0,0 +1,283 @@
+import gc
+import heapq
+import itertools
+import mmap
+import os
+import struct
+import threading
+
+from array import array
+from model.entities import *
+
+WRITE = b'W'
+CLEAN = b'C'
+RECORD = struct.Struct('<cQdH')
+SNAPSHOT_HEADER = struct.Struct('<4sQQII')
+SNAPSHOT_MAGIC = b'BKS1'
+
+
+class WriteAheadLog:
+    # appends are buffered and one thread writes and fsyncs whatever piled up, so many writes share one fsync
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'ab')
+        self.buffer = bytearray()
+        self.appended = 0
+        self.flushed = 0
+        self.records = 0
+        # the records that go to the old log and where it goes when a rotation is waiting, see rotate()
+        self.rotating = None
+        # (position, order, callback) of calls waiting for their record to be on disk
+        self.callbacks = []
+        self.counter = itertools.count()
+        self.closed = False
+        self.condition = threading.Condition()
+        # held while taking records out of the buffer and writing them, so they reach the file in order
+        self.io = threading.Lock()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, book):
+        name = book.name.encode()
+        return self.append(RECORD.pack(WRITE, book.seq, book.price, len(name)) + name)
+
+    def clean(self, seq):
+        return self.append(RECORD.pack(CLEAN, seq, 0, 0))
+
+    def append(self, record):
+        # returns the position of the record, which wait() takes to block until it is on disk
+        with self.condition:
+            if len(self.buffer) == 0:
+                self.condition.notify_all()
+            self.buffer += record
+            self.appended += 1
+            self.records += 1
+
+            return self.appended
+
+    def wait(self, position):
+        with self.condition:
+            while self.flushed < position and not self.closed:
+                self.condition.wait()
+
+    def when_flushed(self, position, callback):
+        # like wait(), but calls back from the flushing thread instead of blocking the caller
+        with self.condition:
+            if self.flushed < position and not self.closed:
+                heapq.heappush(self.callbacks, (position, next(self.counter), callback))
+                return
+
+        callback()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while len(self.buffer) == 0 and self.rotating is None and not self.closed:
+                    self.condition.wait()
+
+                if len(self.buffer) == 0 and self.rotating is None:
+                    return
+
+            with self.io:
+                self.flush()
+
+    def flush(self):
+        with self.condition:
+            data, self.buffer = self.buffer, bytearray()
+            position = self.appended
+            rotating, self.rotating = self.rotating, None
+
+        if rotating is not None:
+            self.switch(*rotating)
+
+        if len(data) > 0:
+            self.file.write(data)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+        with self.condition:
+            self.flushed = max(self.flushed, position)
+            self.condition.notify_all()
+
+            done = []
+            while len(self.callbacks) > 0 and self.callbacks[0][0] <= self.flushed:
+                done.append(heapq.heappop(self.callbacks)[2])
+
+        for callback in done:
+            callback()
+
+    def rotate(self, old_path):
+        # called while the store is locked, so the records appended so far are exactly those before the rotation: they
+        # are moved to old_path with the log, the ones after go to an empty log. The flushing thread does the syncing
+        # and moving, without the lock, and wait() on the returned position returns once it is done
+        with self.condition:
+            self.rotating = (self.buffer, old_path)
+            self.buffer = bytearray()
+            self.appended += 1
+            self.records = 0
+            self.condition.notify_all()
+
+            return self.appended
+
+    def switch(self, data, old_path):
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+        if os.path.exists(old_path):
+            # a previous checkpoint did not finish, so its log is kept in front of this one
+            with open(old_path, 'ab') as old, open(self.path, 'rb') as current:
+                old.write(current.read())
+            os.remove(self.path)
+        else:
+            os.replace(self.path, old_path)
+
+        self.file = open(self.path, 'ab')
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.file.close()
+
+
+def read_log(path):
+    # yields (kind, seq, name, price) for every complete record, a record cut off by a crash ends the log
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        offset = 0
+
+        while offset + RECORD.size <= len(data):
+            kind, seq, price, length = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            if offset + length > len(data):
+                return
+
+            yield kind, seq, data[offset:offset + length].decode(), price
+            offset += length
+
+
+def write_snapshot(path, snapshot, dirty, last_seq, clean_seq):
+    # the books are stored column by column, so loading them is a few bulk reads instead of one per book
+    items, _ = snapshot.page(0, snapshot.length)
+    names = '\0'.join(name for name, _, _ in items).encode()
+    seqs = array('Q', (book.seq if book is not None else 0 for _, book, _ in items))
+    prices = array('d', (book.price if book is not None else 0 for _, book, _ in items))
+    committed = bytes(book is not None for _, book, _ in items)
+
+    dirty_names = '\0'.join(name for _, name, _ in dirty).encode()
+    dirty_seqs = array('Q', (seq for seq, _, _ in dirty))
+    dirty_prices = array('d', (price for _, _, price in dirty))
+
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, last_seq, clean_seq, len(items), len(dirty)))
+        for blob in [names, dirty_names]:
+            file.write(struct.pack('<Q', len(blob)))
+            file.write(blob)
+        for column in [seqs, prices, committed, dirty_seqs, dirty_prices]:
+            file.write(column if isinstance(column, bytes) else column.tobytes())
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temporary, path)
+
+
+def read_snapshot(path):
+    # returns the columns of the committed books in store order, the dirty writes and the seqs
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        magic, last_seq, clean_seq, count, dirty_count = SNAPSHOT_HEADER.unpack_from(data, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f'{path} is not a store snapshot')
+
+        offset = SNAPSHOT_HEADER.size
+        blobs = []
+        for _ in range(2):
+            (length,) = struct.unpack_from('<Q', data, offset)
+            blobs.append(data[offset + 8:offset + 8 + length].decode())
+            offset += 8 + length
+
+        columns = []
+        for kind, length in [('Q', count), ('d', count), (None, count), ('Q', dirty_count), ('d', dirty_count)]:
+            size = length if kind is None else length * 8
+            column = data[offset:offset + size]
+            columns.append(column if kind is None else array(kind, column))
+            offset += size
+
+    names = blobs[0].split('\0') if count > 0 else []
+    dirty_names = blobs[1].split('\0') if dirty_count > 0 else []
+    seqs, prices, committed, dirty_seqs, dirty_prices = columns
+
+    dirty = list(zip(dirty_seqs, dirty_names, dirty_prices))
+
+    return names, prices, seqs, committed, dirty, last_seq, clean_seq
+
+
+def open_store(directory, store_class=Store):
+    # loads the last snapshot of a process and replays its logs on top, then opens the log for new records
+    os.makedirs(directory, exist_ok=True)
+    store = store_class()
+
+    # loading creates millions of objects without any cycles, collecting meanwhile would only rescan them over and over
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        load(store, directory)
+    finally:
+        if collecting:
+            gc.enable()
+
+    return store, WriteAheadLog(os.path.join(directory, 'log'))
+
+
+def load(store, directory):
+    snapshot_path = os.path.join(directory, 'snapshot')
+
+    if os.path.exists(snapshot_path):
+        names, prices, seqs, committed, dirty, last_seq, clean_seq = read_snapshot(snapshot_path)
+        store.restore(names, prices, seqs, committed, last_seq, clean_seq)
+        for seq, name, price in dirty:
+            store.add(Book(name, price, seq))
+
+    # writes already in the snapshot can still be in a log a checkpoint did not get to remove
+    snapshot_seq = store.last_seq
+
+    for path in [os.path.join(directory, 'log.old'), os.path.join(directory, 'log')]:
+        for kind, seq, name, price in read_log(path):
+            if kind == WRITE and seq > snapshot_seq:
+                store.add(Book(name, price, seq))
+            elif kind == CLEAN:
+                store.clean_up_to(seq)
+
+
+def checkpoint(process):
+    # the log is switched under the lock, the old one is synced and the snapshot written without blocking any writes
+    old_path = os.path.join(process.directory, 'log.old')
+
+    with process.lock:
+        snapshot = process.store.snapshot()
+        dirty = process.store.dirty()
+        last_seq, clean_seq = process.store.last_seq, process.store.clean_seq
+        position = process.log.rotate(old_path)
+
+    process.log.wait(position)
+
+    with snapshot:
+        write_snapshot(os.path.join(process.directory, 'snapshot'), snapshot, dirty, last_seq, clean_seq)
+
+    os.remove(old_path)
+
+
+def wipe(process):
+    process.log.close()
+
+    for name in ['snapshot', 'log.old', 'log']:
+        path = os.path.join(process.directory, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    process.log = WriteAheadLog(os.path.join(process.directory, 'log'))
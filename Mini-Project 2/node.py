@@ -2,87 +2,313 @@ import config
 import shop_pb2
 import shop_pb2_grpc
 
+import asyncio
+import functools
 import grpc
+import heapq
+import itertools
+import json
+import os
+import queue
 import random
 import threading
+import time
+import zlib
 
+from batching import Batcher
+from bulk import export_books, import_books
+from cache import ReadCache
+from channels import CHANNEL_OPTIONS, ChannelPool
+from client import Client
 from concurrent import futures
+from metrics import Metrics, prometheus_text, quantile, serve_prometheus
+from model import persistence
 from model.entities import *
+from replication import (CLOSE, AsyncLocalLink, AsyncReplicationLink, AsyncUpstreamLink, Commits, OutOfOrder,
+                         ReplicationLink, UpstreamLink)
+from routing import RoutingTable, load_members
+from scheduler import Scheduler
+
+PAGE_SIZE = 1000
+# how often logs are checked, and how many records a log needs before it is compacted into a snapshot
+CHECKPOINT_INTERVAL = 10
+CHECKPOINT_RECORDS = 10000
+# how many answers of the tail about dirty books a node remembers
+READ_CACHE_SIZE = 10000
+# nodes with neighbouring processes check on each other this often, and a node that missed this many checks in a row
+# is spliced out of the chain
+HEARTBEAT_INTERVAL = 0.2
+HEARTBEAT_TIMEOUT = 1
+MISSED_HEARTBEATS = 3
+# the workers of a sync server for the short calls. Replicate and Commit streams hold a worker each for as long as they
+# are open and every peer can keep one of both open, so they get workers of their own, see server_workers
+SERVER_WORKERS = 10
+
+
+class Overloaded(Exception):
+    # a write the head of a chain could not make room for in time
+    pass
 
 
 class Node(shop_pb2_grpc.DistributedBookstoreServicer):
-    def __init__(self, id_):
+    def __init__(self, id_, streaming=True, data_dir=None, compact=False):
         self.id = id_
         self.ids_to_processes = {}
-        self.head = None
-        self.head_node_id = None
-        self.tail = None
-        self.tail_node_id = None
+        # the processes of every chain in order, one chain for each shard of the books, so that any node can route
+        # requests to them and repair them
+        self.chains = []
+        # how often the chain of every shard was changed, see Link
+        self.epochs = []
+        self.routes = RoutingTable()
         self.timeout = 0
+        self.scheduler = Scheduler()
+        self.channels = ChannelPool()
+        self.executor = futures.ThreadPoolExecutor(max_workers=len(config.IDS_TO_IPS))
+        self.write_batcher = Batcher(self.send_writes)
+        self.clean_batcher = Batcher(self.send_cleans)
+        # with streaming on, replication to each peer node goes over one persistent Replicate stream
+        self.streaming = streaming
+        self.link_class = ReplicationLink
+        # writes for our own processes are handed over by write_func here, an AsyncNode queues them on a local link
+        self.local_link_class = None
+        self.links = {}
+        self.upstreams = {}
+        self.links_lock = threading.Lock()
+        self.data_dir = data_dir
+        # compact stores keep books in columns, which takes a fraction of the memory for large catalogs
+        self.store_class = CompactStore if compact else Store
+        self.metrics = Metrics()
+        self.read_cache = ReadCache(READ_CACHE_SIZE)
+        self.max_in_flight = config.MAX_IN_FLIGHT
+        self.admission_timeout = config.ADMISSION_TIMEOUT
+        self.rejected = 0
+        self.closed = False
+
+        if self.data_dir is not None:
+            threading.Thread(target=self.checkpoint, daemon=True).start()
+
+        threading.Thread(target=self.monitor, daemon=True).start()
 
     def CreateChain(self, request, context):
-        return shop_pb2.CreateChainResponse(process_list=[p.id for p in self.ids_to_processes.values()])
+        # creating new chain removes all previously stored data
+        self.clear_store()
+
+        processes = list(self.ids_to_processes.values())
+
+        return shop_pb2.CreateChainResponse(process_list=[p.id for p in processes], processes=[
+            shop_pb2.ProcessId(node=p.node, index=p.index) for p in processes])
 
     def Link(self, request, context):
-        self.head = request.head
-        self.tail = request.tail
-        self.head_node_id = int(self.head[4])
-        self.tail_node_id = int(self.tail[4])
-        chain_nodes = request.chain_nodes
+        # every node gets the whole chain of a shard and takes over the links of its own processes in it. A link older
+        # than the chain we have comes from a repair that started from an outdated chain, and is ignored
+        if request.epoch < self.epoch(request.shard):
+            print(f'Ignored the chain of shard {request.shard} of epoch {request.epoch}, '
+                  f'ours is of epoch {self.epoch(request.shard)}')
+            return shop_pb2.LinkResponse()
+
+        shards = max(request.shards, 1)
+        chains = (self.chains + [[] for _ in range(shards)])[:shards]
+        old = chains[request.shard]
+        chains[request.shard] = build_chain(request.chain_nodes, request.head)
+        self.chains = chains
+        self.epochs = (self.epochs + [0] * shards)[:shards]
+        self.epochs[request.shard] = request.epoch
+        chain_nodes = {node.process_id: node for node in request.chain_nodes}
+
+        for node in request.chain_nodes:
+            if node.HasField('id'):
+                self.routes.add(node.process_id, node.id.node)
 
-        for node in chain_nodes:
+        for node in request.chain_nodes:
+            process = self.ids_to_processes.get(node.process_id)
+            if process is None:
+                continue
+
+            process.shard = request.shard
             successor = node.successor_id if len(node.successor_id) > 0 else None
             predecessor = node.predecessor_id if len(node.predecessor_id) > 0 else None
-            self.ids_to_processes[node.process_id].successor = successor
-            self.ids_to_processes[node.process_id].predecessor = predecessor
+            self.relink(process, successor, predecessor, chain_nodes)
+
+            if self.streaming and successor is not None and successor not in self.ids_to_processes:
+                self.link(self.routes.address(successor))
+
+        # our processes the chain went on without, like those of a node that was spliced out while it was still up
+        for process in list(self.ids_to_processes.values()):
+            if process.shard == request.shard and process.id in old and process.id not in chain_nodes:
+                self.unlink(process)
+
+        self.drop_links()
+        self.save_chain()
 
         return shop_pb2.LinkResponse()
 
     def ListChain(self, request, context):
         return shop_pb2.ListChainResponse(chain_nodes=[shop_pb2.ChainNode(process_id=p.id, successor_id=p.successor,
-                                                                          predecessor_id=p.predecessor)
+                                                                          predecessor_id=p.predecessor,
+                                                                          last_seq=p.store.last_seq,
+                                                                          clean_seq=p.store.clean_seq, shard=p.shard,
+                                                                          id=shop_pb2.ProcessId(node=p.node,
+                                                                                                index=p.index),
+                                                                          epoch=self.epoch(p.shard))
                                                        for p in self.ids_to_processes.values()])
 
     def ListBooks(self, request, context):
-        return shop_pb2.ListBooksResponse(books=[shop_pb2.Book(name=entry.book.name, price=entry.book.price) for entry
-                                                 in self.ids_to_processes[self.tail].store.data])
+        snapshot = self.tail_snapshot(request.shard, context)
+        if snapshot is None:
+            return shop_pb2.ListBooksResponse()
+
+        with self.metrics.timer('ListBooks'), snapshot:
+            return books_response(*snapshot.page(0, snapshot.length))
+
+    def ListBooksStream(self, request, context):
+        # pages are cut from one snapshot, so writes go on meanwhile and a page never shows half of them
+        snapshot = self.tail_snapshot(request.shard, context)
+        if snapshot is None:
+            return
+        context.add_callback(snapshot.close)
+        page_size = request.page_size if request.page_size > 0 else PAGE_SIZE
+        cursor = request.cursor
+
+        with self.metrics.timer('ListBooksStream'), snapshot:
+            while cursor < snapshot.length:
+                items, cursor = snapshot.page(cursor, page_size)
+                yield books_response(items, cursor)
+
+    def tail_process(self, shard, context):
+        # a node whose process stopped being the tail, because the chain changed, tells the caller to look again
+        tail = self.tail(shard) if shard < len(self.chains) and len(self.chains[shard]) > 0 else None
+        process = self.ids_to_processes.get(tail)
+
+        if process is None:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details(f'{tail} is the tail of shard {shard} and not a process of node {self.id}')
+
+        return process
+
+    def tail_snapshot(self, shard, context):
+        process = self.tail_process(shard, context)
+        if process is None:
+            return None
+
+        with process.lock:
+            return process.store.snapshot()
 
     def Read(self, request, context):
-        # this request is supposed to be responded by the tail
-        books = [entry.book for entry in self.ids_to_processes[self.tail].store.data]
-        found = next((book for book in books if book.name == request.name), None)
+        # this request is supposed to be responded by the tail of the chain the book belongs to
+        process = self.tail_process(self.shard(request.name), context)
+        if process is None:
+            return shop_pb2.ReadResponse()
 
-        if found is not None:
-            return shop_pb2.ReadResponse(book=shop_pb2.Book(name=found.name, price=found.price))
-        else:
-            return shop_pb2.ReadResponse(book=shop_pb2.Book(name='', price=0))
+        with self.metrics.timer('Read'):
+            found = process.store.get(request.name)
 
-    def Write(self, request, context):
-        process = self.ids_to_processes[request.process_id]
-        book = Book(request.name, request.price)
-        process.store.add(book)
+            if found is not None:
+                return shop_pb2.ReadResponse(book=shop_pb2.Book(name=found.book.name, price=found.book.price))
+            else:
+                return shop_pb2.ReadResponse(book=shop_pb2.Book(name='', price=0))
 
-        if process.successor is not None:
-            timer = threading.Timer(self.timeout, self.write_func, args=[process.successor, book])
-        else:
-            process.store.make_clean(book.name)
-            timer = threading.Timer(0, self.clean_func, args=[process.predecessor, book])
-        timer.start()
+    def MultiRead(self, request, context):
+        # a Read of many books of one shard at once, answered in the order of the names
+        process = self.tail_process(request.shard, context)
+        if process is None:
+            return shop_pb2.MultiReadResponse()
+
+        with self.metrics.timer('MultiRead'):
+            books = []
+            for name in request.names:
+                found = process.store.get(name)
+                books.append(shop_pb2.Book(name=found.book.name, price=found.book.price) if found is not None
+                             else shop_pb2.Book(name='', price=0))
+
+            return shop_pb2.MultiReadResponse(books=books)
+
+    def FindByPrefix(self, request, context):
+        # served by the tail from the indexes of its store, which only hold committed books. An answer is at most a page,
+        # so the store is never locked for long
+        process = self.tail_process(request.shard, context)
+        if process is None:
+            return shop_pb2.QueryResponse()
+
+        with self.metrics.timer('FindByPrefix'):
+            after = request.after if request.HasField('after') else None
+            with process.lock:
+                books = process.store.find_prefix(request.prefix, after, query_limit(request.limit))
+
+            return query_response(books)
+
+    def FindByPrice(self, request, context):
+        process = self.tail_process(request.shard, context)
+        if process is None:
+            return shop_pb2.QueryResponse()
+
+        with self.metrics.timer('FindByPrice'):
+            max_price = request.max_price if request.HasField('max_price') else None
+            after = (request.after.price, request.after.name) if request.HasField('after') else None
+            with process.lock:
+                books = process.store.find_price(request.min_price, max_price, after, query_limit(request.limit))
+
+            return query_response(books)
+
+    def Version(self, request, context):
+        # this request is supposed to be responded by the tail, whose versions are always the committed ones
+        process = self.tail_process(request.shard, context)
+        if process is None:
+            return shop_pb2.VersionResponse()
+
+        with self.metrics.timer('Version'):
+            return shop_pb2.VersionResponse(versions=[process.store.version(name) for name in request.names])
+
+    def Write(self, request, context):
+        with self.metrics.timer('Write'):
+            try:
+                self.apply_writes(self.ids_to_processes[request.process_id],
+                                  [Book(request.name, request.price, request.seq)], self.admission_timeout)
+            except Overloaded as error:
+                reject(context, error)
+            except OutOfOrder as error:
+                reject(context, error, grpc.StatusCode.FAILED_PRECONDITION)
 
         return shop_pb2.WriteResponse()
 
     def Clean(self, request, context):
-        process = self.ids_to_processes[request.process_id]
-        found = next((entry for entry in process.store.data if entry.book.name == request.book.name), None)
+        with self.metrics.timer('Clean'):
+            self.apply_cleans(self.ids_to_processes[request.process_id], request.seq)
 
-        if found is not None and found.book.price == request.book.price:
-            found.clean = True
+        return shop_pb2.CleanResponse()
 
-            if process.predecessor is not None:
-                timer = threading.Timer(self.timeout, self.clean_func, args=[process.predecessor, found.book])
-                timer.start()
+    def WriteBatch(self, request, context):
+        with self.metrics.timer('WriteBatch'):
+            try:
+                self.apply_writes(self.ids_to_processes[request.process_id],
+                                  [Book(book.name, book.price, book.seq) for book in request.books],
+                                  self.admission_timeout)
+            except Overloaded as error:
+                reject(context, error)
+            except OutOfOrder as error:
+                # the sender retries the batch after the ones before it, see Batcher
+                reject(context, error, grpc.StatusCode.FAILED_PRECONDITION)
 
-        return shop_pb2.CleanResponse()
+        return shop_pb2.WriteBatchResponse()
+
+    def CleanBatch(self, request, context):
+        with self.metrics.timer('CleanBatch'):
+            self.apply_cleans(self.ids_to_processes[request.process_id], request.seq)
+
+        return shop_pb2.CleanBatchResponse()
+
+    def Replicate(self, request_iterator, context):
+        source = int(dict(context.invocation_metadata())['node-id'])
+        upstream = UpstreamLink(self, source)
+        self.upstreams[source] = upstream
+
+        # the stream is closed without finishing the generator when the predecessor goes away
+        try:
+            yield from upstream.serve(request_iterator)
+        except OutOfOrder as error:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, str(error))
+        finally:
+            if self.upstreams.get(source) is upstream:
+                del self.upstreams[source]
 
     def SetTimeout(self, request, context):
         self.timeout = request.timeout
@@ -90,150 +316,1421 @@ class Node(shop_pb2_grpc.DistributedBookstoreServicer):
         return shop_pb2.SetTimeoutResponse()
 
     def RemoveHead(self, request, context):
-        self.head = request.new_head
-        new_head_node = int(self.head[4])
+        # the old head no longer receives writes, so it must not serve reads either
+        if request.epoch < self.epoch(request.shard):
+            return shop_pb2.RemoveHeadResponse()
+        self.epochs[request.shard] = request.epoch
+
+        chain = self.chains[request.shard]
+        if chain[0] in self.ids_to_processes:
+            self.ids_to_processes[chain[0]].successor = None
+
+        self.chains[request.shard] = chain[chain.index(request.new_head):]
 
-        if self.id == new_head_node:
-            self.ids_to_processes[self.head].predecessor = None
+        if request.new_head in self.ids_to_processes:
+            self.ids_to_processes[request.new_head].predecessor = None
+
+        self.save_chain()
 
         return shop_pb2.RemoveHeadResponse()
 
+    def Stats(self, request, context):
+        return self.stats()
+
+    def Heartbeat(self, request, context):
+        # a node that is behind on some chains, like one that was spliced out while it was still up, gets them back
+        epochs = list(request.epochs)
+        return shop_pb2.HeartbeatResponse(chains=[self.link_request(shard) for shard, epoch in enumerate(self.epochs)
+                                                  if epoch > (epochs[shard] if shard < len(epochs) else 0)])
+
+    def Attach(self, request, context):
+        try:
+            return self.attach(request)
+        except ValueError as error:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(error))
+
+    def attach(self, request):
+        # the new process starts from the store of the one it goes after, and is linked once it has caught up. Both are
+        # checked before the process gives up its store
+        process = self.ids_to_processes.get(request.process_id)
+        if process is None:
+            raise ValueError(f'{request.process_id} is not a process of node {self.id}')
+        shard = next((shard for shard, chain in enumerate(self.chains) if request.after in chain), None)
+        if shard is None:
+            raise ValueError(f'{request.after} is in no chain')
+
+        with process.lock:
+            process.clear_store()
+            if process.log is not None:
+                persistence.wipe(process)
+            process.predecessor = request.after
+            process.successor = None
+            process.shard = shard
+            process.joining = True
+            process.backlog = []
+
+        books = 0
+        with self.channels.connect(self.routes.address(request.after)) as stub:
+            for chunk in stub.Transfer(shop_pb2.TransferRequest(process_id=request.after, joiner=process.id,
+                                                                page_size=PAGE_SIZE)):
+                # one page at a time, so the copy never holds more than a page besides the store itself
+                with process.lock:
+                    for book in chunk.books:
+                        self.store_write(process, Book(book.name, book.price, book.seq))
+                    if not chunk.dirty:
+                        self.store_clean(process, chunk.clean_seq)
+                    process.store.last_seq = max(process.store.last_seq, chunk.last_seq)
+                books += len(chunk.books)
+
+        with process.lock:
+            # writes that came in meanwhile follow the copy, except those it already had
+            for book in process.backlog:
+                if book.seq > process.store.last_seq:
+                    self.store_write(process, book)
+            process.backlog = None
+
+        return shop_pb2.AttachResponse(books=books, last_seq=process.store.last_seq)
+
+    def Transfer(self, request, context):
+        snapshot, dirty, clean_seq, last_seq = self.start_transfer(request)
+        context.add_callback(snapshot.close)
+        page_size = request.page_size if request.page_size > 0 else PAGE_SIZE
+
+        with snapshot:
+            for chunk in transfer_chunks(snapshot, dirty, clean_seq, last_seq, page_size):
+                yield chunk
+
+    def start_transfer(self, request):
+        # from the snapshot on, every write is also sent to the joining process, so it gets everything after the
+        # snapshot and the writes that were not clean yet from the transfer
+        process = self.ids_to_processes[request.process_id]
+
+        with process.lock:
+            process.follower = request.joiner
+            return process.store.snapshot(), process.store.dirty(), process.store.clean_seq, process.store.last_seq
+
+    def Commit(self, request_iterator, context):
+        # the writes of a client, each batch answered once it is clean at the tail, which the head learns from the
+        # clean ack that reaches it
+        answers = queue.Queue()
+        commits = Commits(answers.put)
+        threading.Thread(target=self.receive_commits, args=[request_iterator, commits], daemon=True).start()
+
+        while True:
+            answer = answers.get()
+            if answer is CLOSE:
+                return
+            if isinstance(answer, Exception):
+                context.abort(grpc.StatusCode.FAILED_PRECONDITION, str(answer))
+            yield answer
+
+    def receive_commits(self, request_iterator, commits):
+        try:
+            for request in request_iterator:
+                process, books = self.commit_request(request)
+                # no timeout, a full chain stops the stream from being read until it has room again
+                with self.metrics.timer('Commit.WriteBatch'):
+                    self.apply_writes(process, books, on_commit=commits.wait())
+            commits.end()
+        except ValueError as error:
+            commits.end(error)
+        except grpc.RpcError:
+            # the stream was cancelled by the other side
+            commits.end()
+
+    def commit_request(self, request):
+        # writes sent to a process that is no longer a head would not be stamped, so the client has to look again
+        process = self.ids_to_processes.get(request.process_id)
+        if process is None or process.predecessor is not None or not self.in_chain(process):
+            raise ValueError(f'{request.process_id} is not the head of a chain on node {self.id}')
+
+        return process, [Book(book.name, book.price) for book in request.books]
+
+    def apply_writes(self, process, books, timeout=None, on_commit=None):
+        position = 0
+
+        with process.lock:
+            if not process.joining and not self.in_chain(process):
+                # the chain went on without the process, so what still reaches it is of no use to anyone
+                return
+
+            if process.predecessor is not None:
+                # writes resent after a repair or by a link that reconnected may have reached us before, writes arrive
+                # in order so those are the ones up to our last. Our ack for them may have been lost with the stream
+                # they first came on, so it goes out again
+                count = len(books)
+                books = [book for book in books if book.seq > process.store.last_seq]
+                if len(books) < count and process.store.clean_seq > 0:
+                    self.forward_cleans(process.predecessor, process.store.clean_seq)
+                if len(books) == 0:
+                    return
+
+                # a write that was lost on the way would leave a gap that the tail's cumulative ack passes over, so
+                # nothing after a missing write is applied until it has arrived
+                if process.backlog is None:
+                    expected = process.store.last_seq + 1
+                    for i, book in enumerate(books):
+                        if book.seq != expected + i:
+                            raise OutOfOrder(f'{process.id} got write {book.seq} while it misses '
+                                             f'{expected + i} to {book.seq - 1}')
+            else:
+                self.admit(process, len(books), timeout)
+
+            if process.backlog is not None:
+                process.backlog += books
+                return
+
+            for book in books:
+                # the head orders all writes of the chain by stamping them with increasing sequence numbers
+                if process.predecessor is None:
+                    book.seq = process.store.last_seq + 1
+                position = self.store_write(process, book)
+
+            if on_commit is not None:
+                process.commits.append((process.store.last_seq, on_commit))
+
+            if process.follower is not None:
+                self.forward_writes(process.follower, books)
+            if process.joining:
+                return
+
+            if process.successor is not None:
+                self.forward_writes(process.successor, books)
+                return
+
+            seq = process.store.last_seq
+            position = self.store_clean(process, seq)
+
+        if process.predecessor is not None:
+            self.acknowledge(process, seq, position)
+
+    def store_write(self, process, book):
+        process.store.add(book)
+
+        return process.log.write(book) if process.log is not None else 0
+
+    def store_clean(self, process, seq):
+        process.store.clean_up_to(seq)
+        if process.predecessor is None:
+            self.made_room(process)
+            self.committed(process)
+
+        return process.log.clean(seq) if process.log is not None else 0
+
+    def full(self, process, count):
+        # a single write, or batch, is always let into an empty chain, however large it is
+        in_flight = process.store.last_seq - process.store.clean_seq
+        return self.max_in_flight is not None and in_flight > 0 and in_flight + count > self.max_in_flight
+
+    def admit(self, process, count, timeout):
+        # called by a head with its lock held: while its chain has too many writes in flight, new ones wait for acks to
+        # make room, so slow successors slow the writers down instead of piling up writes on every process. Without a
+        # timeout they wait as long as it takes
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        while self.full(process, count):
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                raise self.overloaded(process, count)
+            process.room.wait(remaining)
+
+    def overloaded(self, process, count):
+        self.rejected += count
+        in_flight = process.store.last_seq - process.store.clean_seq
+
+        return Overloaded(f'{process.id} has {in_flight} writes in flight, at most {self.max_in_flight} are allowed')
+
+    def made_room(self, process):
+        process.room.notify_all()
+
+    def committed(self, process):
+        # called by a head with its lock held, for the writes clients wait on that the chain just acknowledged
+        while len(process.commits) > 0 and process.commits[0][0] <= process.store.clean_seq:
+            seq, on_commit = process.commits.popleft()
+            on_commit(seq)
+
+    def apply_cleans(self, process, seq):
+        # a clean ack covers every write up to seq, so older or repeated acks can be dropped
+        with process.lock:
+            if seq <= process.store.clean_seq:
+                return
+            self.store_clean(process, seq)
+
+        if process.predecessor is not None:
+            self.forward_cleans(process.predecessor, seq)
+
+    def forward_writes(self, process_id, books):
+        self.scheduler.schedule(self.timeout, self.write_func, args=[process_id, books], key=process_id)
+
+    def forward_cleans(self, process_id, seq):
+        self.scheduler.schedule(self.timeout, self.clean_func, args=[process_id, seq], key=process_id)
+
+    def acknowledge(self, process, seq, position):
+        # the tail only acknowledges writes that are on its disk, the log syncs them together with everything else
+        # that arrived meanwhile
+        if position > 0:
+            process.log.wait(position)
+        self.clean_func(process.predecessor, seq)
+
+    def relink(self, process, successor, predecessor, chain_nodes):
+        seq = 0
+        position = 0
+
+        with process.lock:
+            old_successor, old_predecessor = process.successor, process.predecessor
+            joined = process.joining
+            process.successor = successor
+            process.predecessor = predecessor
+            process.follower = None
+            process.joining = False
+
+            if old_successor not in (None, successor):
+                # the old successor gets its writes from someone else now, or from nobody
+                self.forget(old_successor)
+
+            # only the tail answers queries, so only the tail keeps the indexes for them
+            if successor is None and process.store.indexes is None:
+                process.store.index_books()
+            elif successor is not None:
+                process.store.indexes = None
+
+            if successor is not None and (joined or old_successor not in (None, successor)):
+                # the new successor took over from a failed one, or we were just attached in front of it, and it misses
+                # at most the writes we have not seen acked yet, of those only the ones after the last it has. They
+                # are sent while we are locked, so they stay ahead of every new write
+                known = chain_nodes[successor].last_seq
+                books = [Book(name, price, seq) for seq, name, price in process.store.dirty() if seq > known]
+                if len(books) > 0:
+                    self.forward_writes(successor, books)
+                    print(f'Resent {len(books)} writes from {process.id} to {successor}')
+            elif (successor is None and (joined or old_successor is not None) and
+                  process.store.last_seq > process.store.clean_seq):
+                # our successors failed, or we were attached as the tail after a process that kept acting as the
+                # tail meanwhile, so everything we have is committed now
+                seq = process.store.last_seq
+                position = self.store_clean(process, seq)
+
+        if seq > 0 and predecessor is not None:
+            self.acknowledge(process, seq, position)
+        elif predecessor is not None and old_predecessor not in (None, predecessor) and process.store.clean_seq > 0:
+            # acks on their way to the failed predecessor were lost with it
+            self.forward_cleans(predecessor, process.store.clean_seq)
+
+    def unlink(self, process):
+        # the process keeps its store, but neither takes writes nor serves reads anymore
+        with process.lock:
+            if process.successor is not None:
+                self.forget(process.successor)
+            process.successor = None
+            process.predecessor = None
+            process.follower = None
+            process.store.indexes = None
+
+        print(f'{process.id} is no longer in the chain of shard {process.shard}')
+
+    def forget(self, process_id):
+        for link in list(self.links.values()):
+            link.unacked.forget(process_id)
+
+    def in_chain(self, process):
+        return process.shard < len(self.chains) and process.id in self.chains[process.shard]
+
+    def epoch(self, shard):
+        return self.epochs[shard] if shard < len(self.epochs) else 0
+
+    def next_epoch(self, reported, shard=None):
+        # one more than any node reported for the shard, or for any shard, so that every node takes the new chain
+        epochs = [node.epoch for node in reported.values() if shard is None or node.shard == shard]
+        epochs += self.epochs if shard is None else [self.epoch(shard)]
+
+        return max(epochs, default=0) + 1
+
+    def link_request(self, shard):
+        # the chain of the shard as we have it, without the sequence numbers, which only make the catch-up shorter
+        chain = self.chains[shard]
+        chain_nodes = [shop_pb2.ChainNode(process_id=process_id,
+                                          successor_id=chain[i + 1] if i < len(chain) - 1 else '',
+                                          predecessor_id=chain[i - 1] if i > 0 else '', shard=shard,
+                                          id=shop_pb2.ProcessId(node=self.routes.node(process_id),
+                                                                index=parse_process_id(process_id)[1]))
+                       for i, process_id in enumerate(chain)]
+
+        return shop_pb2.LinkRequest(head=chain[0] if len(chain) > 0 else '', tail=chain[-1] if len(chain) > 0 else '',
+                                    chain_nodes=chain_nodes, shard=shard, shards=len(self.chains),
+                                    epoch=self.epochs[shard])
+
+    def update_chain(self, request):
+        self.Link(request, None)
+
+    def drop_links(self):
+        # streams to nodes that have no processes in the chains anymore are not needed, and the peer is likely gone
+        addresses = set(self.routes.address(process_id) for chain in self.chains for process_id in chain)
+        # the same goes for the batches waiting for processes outside the chains, except those being attached
+        targets = set(process_id for chain in self.chains for process_id in chain)
+        targets.update(process.follower for process in list(self.ids_to_processes.values()))
+        self.write_batcher.keep(targets)
+        self.clean_batcher.keep(targets)
+
+        with self.links_lock:
+            dropped = [address for address in self.links if address not in addresses]
+            for address in dropped:
+                self.links.pop(address).drop()
+
+    def neighbours(self):
+        nodes = set()
+
+        for process in list(self.ids_to_processes.values()):
+            for neighbour in [process.successor, process.predecessor]:
+                if neighbour is not None:
+                    nodes.add(self.routes.node(neighbour))
+
+        nodes.discard(self.id)
+        return nodes
+
+    def monitor(self):
+        # checks on the nodes of our neighbours, and repairs the chain when one of them stops answering
+        missed = {}
+
+        while not self.closed:
+            time.sleep(HEARTBEAT_INTERVAL)
+            neighbours = self.neighbours()
+
+            for node in neighbours:
+                try:
+                    with self.channels.connect(config.IDS_TO_IPS[node]) as stub:
+                        response = stub.Heartbeat(shop_pb2.HeartbeatRequest(epochs=self.epochs),
+                                                  timeout=HEARTBEAT_TIMEOUT)
+                    missed.pop(node, None)
+                except grpc.RpcError:
+                    missed[node] = missed.get(node, 0) + 1
+                    continue
+
+                # the chains changed without us, we take them over before deciding anything about them
+                for request in response.chains:
+                    print(f'The chain of shard {request.shard} changed to epoch {request.epoch} meanwhile')
+                    self.update_chain(request)
+
+            for node in [node for node, count in missed.items() if count >= MISSED_HEARTBEATS]:
+                del missed[node]
+                if node in neighbours and not self.closed:
+                    self.repair(node)
+
+    def repair(self, failed):
+        # splices the processes of the failed node, and of any other node that does not answer now, out of the
+        # chains. Neighbours that end up next to each other catch up with what they have themselves, see relink
+        reported, failures = self.reported_chain()
+        down = set(failures) | {config.IDS_TO_IPS[failed]}
+        removed = 0
+        link_failures = {}
+
+        for shard, old in enumerate(self.chains):
+            chain = [process_id for process_id in old
+                     if process_id in reported and self.routes.address(process_id) not in down]
+            if len(chain) == 0 or len(chain) == len(old):
+                continue
+
+            removed += len(old) - len(chain)
+            link_failures.update(self.link_chain(chain, reported, shard))
+
+        if removed == 0:
+            return
+
+        print(f'Node {failed} failed, removed {removed} processes from the chains')
+        report({node: code for node, code in link_failures.items() if node not in down})
+
+    def extend_chain(self, process_id, after=None, shard=0):
+        # attaches a process that is not in a chain yet after the given one, or as the new tail of the shard, while
+        # writes go on
+        chains, failures = self.list_chains()
+        if after is None:
+            after = chains[shard][-1]
+        else:
+            shard = next((i for i, chain in enumerate(chains) if after in chain), None)
+            if shard is None:
+                raise ValueError(f'{after} is in no chain')
+
+        with self.channels.connect(self.routes.address(process_id)) as stub:
+            response = stub.Attach(shop_pb2.AttachRequest(process_id=process_id, after=after))
+
+        # the chain is read again, the catch-up of the links that change goes from the numbers reported now
+        reported, list_failures = self.reported_chain()
+        chains, _ = self.list_chains()
+        chain = chains[shard]
+        chain.insert(chain.index(after) + 1, process_id)
+        failures.update(list_failures)
+        failures.update(self.link_chain(chain, reported, shard))
+
+        return response.books, failures
+
+    def reported_chain(self):
+        responses, failures = self.fan_out(lambda stub, node: stub.ListChain(shop_pb2.ListChainRequest(),
+                                                                             timeout=config.RPC_TIMEOUT))
+
+        return {node.process_id: node for response in responses.values() for node in response.chain_nodes}, failures
+
+    def link_chain(self, chain, reported, shard):
+        # links all nodes to the given order of the processes of a shard, passing on the sequence numbers they reported
+        chain_nodes = [shop_pb2.ChainNode(process_id=process_id,
+                                          successor_id=chain[i + 1] if i < len(chain) - 1 else '',
+                                          predecessor_id=chain[i - 1] if i > 0 else '',
+                                          last_seq=reported[process_id].last_seq,
+                                          clean_seq=reported[process_id].clean_seq, shard=shard,
+                                          id=reported[process_id].id)
+                       for i, process_id in enumerate(chain)]
+        epoch = self.next_epoch(reported, shard)
+        _, failures = self.fan_out(lambda stub, node: stub.Link(shop_pb2.LinkRequest(
+            head=chain[0], tail=chain[-1], chain_nodes=chain_nodes, shard=shard, shards=len(self.chains), epoch=epoch),
+            timeout=config.RPC_TIMEOUT))
+
+        return failures
+
     def init_processes(self, n):
-        for i in range(n):
-            process = Process(node=self.id, number=i + 1)
+        # processes added later, to extend a running chain, are numbered after the ones we have
+        first = len(self.ids_to_processes) + 1
+
+        for number in range(first, first + n):
+            process = Process(node=self.id, number=number, store_class=self.store_class)
+
+            if self.data_dir is not None:
+                # a restarted node picks up the data its processes had before
+                process.directory = os.path.join(self.data_dir, process.id)
+                process.store, process.log = persistence.open_store(process.directory, self.store_class)
+
             self.ids_to_processes[process.id] = process
 
-    def create_chain(self):
-        processes = []
-        processes_to_nodes = {}
+        self.load_chain()
 
-        # creating new chain removes all previously stored data
-        self.clear_store()
+    def chain_path(self):
+        return os.path.join(self.data_dir, 'Node' + str(self.id) + '-chain.json')
+
+    def save_chain(self):
+        if self.data_dir is None:
+            return
+
+        chain = {'chains': self.chains, 'epochs': self.epochs,
+                 'processes': {p.id: [p.successor, p.predecessor, p.shard] for p in self.ids_to_processes.values()}}
+        os.makedirs(self.data_dir, exist_ok=True)
+
+        with open(self.chain_path() + '.tmp', 'w') as file:
+            json.dump(chain, file)
+        os.replace(self.chain_path() + '.tmp', self.chain_path())
+
+    def load_chain(self):
+        if self.data_dir is None or not os.path.exists(self.chain_path()):
+            return
 
-        for node in config.IDS_TO_IPS.values():
-            with grpc.insecure_channel(node) as channel:
-                stub = shop_pb2_grpc.DistributedBookstoreStub(channel)
-                response = stub.CreateChain(shop_pb2.CreateChainRequest())
-                processes += response.process_list
+        with open(self.chain_path()) as file:
+            chain = json.load(file)
 
-                for process in response.process_list:
-                    processes_to_nodes[process] = node
+        # files written before there were shards have the one chain there was
+        self.chains = chain['chains'] if 'chains' in chain else [chain.get('chain', [])]
+        self.epochs = chain.get('epochs', [0] * len(self.chains))
+
+        for process_id, (successor, predecessor, *shard) in chain['processes'].items():
+            if process_id in self.ids_to_processes:
+                self.ids_to_processes[process_id].successor = successor
+                self.ids_to_processes[process_id].predecessor = predecessor
+                self.ids_to_processes[process_id].shard = shard[0] if len(shard) > 0 else 0
+
+    def checkpoint(self):
+        # runs on a thread of its own: writing the snapshot of a large store takes seconds, which on a forwarding worker
+        # would hold up every write that worker forwards
+        while not self.closed:
+            time.sleep(CHECKPOINT_INTERVAL)
+
+            for process in list(self.ids_to_processes.values()):
+                if process.log is not None and process.log.records >= CHECKPOINT_RECORDS:
+                    try:
+                        persistence.checkpoint(process)
+                    except OSError as error:
+                        print(f'Checkpoint of {process.id} failed: {error}')
+
+    def create_chain(self, shards=1):
+        # the books are split into shards by the hash of their names, and every shard gets a chain of its own
+        processes = []
+        ids = {}
+        # the new chains replace whatever chains the nodes had, so they get an epoch above all of them
+        reported, _ = self.reported_chain()
+        epoch = self.next_epoch(reported)
+
+        responses, failures = self.fan_out(lambda stub, node: stub.CreateChain(shop_pb2.CreateChainRequest(),
+                                                                               timeout=config.RPC_TIMEOUT))
+        for response in responses.values():
+            processes += response.process_list
+            ids.update(zip(response.process_list, response.processes))
+
+        if len(processes) == 0:
+            return failures
 
         random.shuffle(processes)
+        chains = place(processes, ids, min(shards, len(processes)), config.PLACEMENT)
 
-        nodes_to_chain_nodes = {}
-        for node in config.IDS_TO_IPS.values():
-            nodes_to_chain_nodes[node] = []
+        for shard, chain in enumerate(chains):
+            chain_nodes = []
+            for i in range(len(chain)):
+                successor = chain[i + 1] if i != len(chain) - 1 else ''
+                predecessor = chain[i - 1] if i != 0 else ''
+                chain_nodes.append(shop_pb2.ChainNode(process_id=chain[i], successor_id=successor,
+                                                      predecessor_id=predecessor, shard=shard, id=ids[chain[i]]))
 
-        for i in range(len(processes)):
-            if i != 0 and i != len(processes) - 1:
-                chain_node = shop_pb2.ChainNode(process_id=processes[i], successor_id=processes[i + 1], predecessor_id=processes[i - 1])
-            elif i == 0:
-                chain_node = shop_pb2.ChainNode(process_id=processes[i], successor_id=processes[i + 1], predecessor_id='')
-            else:
-                chain_node = shop_pb2.ChainNode(process_id=processes[i], successor_id='', predecessor_id=processes[i - 1])
-            nodes_to_chain_nodes[processes_to_nodes[processes[i]]].append(chain_node)
+            # every node is linked, also those without processes in the chain, so that all of them know every chain
+            _, link_failures = self.fan_out(lambda stub, node: stub.Link(shop_pb2.LinkRequest(
+                head=chain[0], tail=chain[-1], chain_nodes=chain_nodes, shard=shard, shards=len(chains), epoch=epoch),
+                timeout=config.RPC_TIMEOUT))
+            failures.update(link_failures)
+
+        return failures
+
+    def fan_out(self, call):
+        # contacts all nodes at once and collects the responses of those that answered, and the errors of the others
+        requests = {node: self.executor.submit(self.call_node, node, call) for node in config.IDS_TO_IPS.values()}
+        responses, failures = {}, {}
+
+        for node, request in requests.items():
+            try:
+                responses[node] = request.result()
+            except grpc.RpcError as error:
+                failures[node] = error.code()
 
-        for node in config.IDS_TO_IPS.values():
-            with grpc.insecure_channel(node) as channel:
-                stub = shop_pb2_grpc.DistributedBookstoreStub(channel)
-                stub.Link(shop_pb2.LinkRequest(head=processes[0], tail=processes[-1],
-                                               chain_nodes=nodes_to_chain_nodes[node]))
+        return responses, failures
+
+    def call_node(self, node, call):
+        with self.channels.connect(node) as stub:
+            return call(stub, node)
 
     def clear_store(self):
+        self.read_cache.clear()
+
         if len(self.ids_to_processes) != 0:
             for process in self.ids_to_processes.values():
-                process.clear_store()
+                with process.lock:
+                    process.clear_store()
+
+                    if process.log is not None:
+                        persistence.wipe(process)
+
+    def list_chains(self):
+        if len(self.chains) == 0:
+            return [], {}
+
+        responses, failures = self.fan_out(lambda stub, node: stub.ListChain(shop_pb2.ListChainRequest(),
+                                                                             timeout=config.RPC_TIMEOUT))
+        chain_nodes = [node for response in responses.values() for node in response.chain_nodes]
+
+        return [build_chain([node for node in chain_nodes if node.shard == shard], chain[0] if len(chain) > 0 else None)
+                for shard, chain in enumerate(self.chains)], failures
+
+    def list_chain(self, shard=0):
+        chains, failures = self.list_chains()
+
+        return chains[shard] if shard < len(chains) else [], failures
+
+    def head(self, shard):
+        return self.chains[shard][0]
+
+    def tail(self, shard):
+        return self.chains[shard][-1]
 
-    def list_chain(self):
-        if self.head is None:
-            return []
+    def shard(self, name):
+        return shard_of(name, len(self.chains))
 
-        chain_nodes = []
+    def replica(self, shard):
+        # any local process of the book's chain can serve reads, which spreads them over all nodes instead of the tail.
+        # A process the chain went on without gets no more writes, so it must not serve reads either
+        for process in self.ids_to_processes.values():
+            if process.shard == shard and not process.joining and self.in_chain(process):
+                return process
 
-        for node in config.IDS_TO_IPS.values():
-            with grpc.insecure_channel(node) as channel:
-                stub = shop_pb2_grpc.DistributedBookstoreStub(channel)
-                response = stub.ListChain(shop_pb2.ListChainRequest())
-                chain_nodes += response.chain_nodes
+        return None
 
-        head = next((node for node in chain_nodes if node.predecessor_id == ''), None)
-        current = head
-        result = []
+    def committed_versions(self, names, shard):
+        with self.channels.connect(self.routes.address(self.tail(shard))) as stub:
+            response = stub.Version(shop_pb2.VersionRequest(names=names, shard=shard))
 
-        while current is not None:
-            result.append(current.process_id)
-            current = next((node for node in chain_nodes if node.process_id == current.successor_id), None)
+        return response.versions
 
-        return result
+    def cached_versions(self, process, names):
+        # the tail's committed version of a book only changes with a clean ack that reaches us too and changes our own
+        # committed version, so that one tells whether a cached answer is still valid
+        with process.lock:
+            tokens = [process.store.version(name) for name in names]
+
+        versions = {}
+        for name, token in zip(names, tokens):
+            version = self.read_cache.lookup(name, token)
+            if version is not None:
+                versions[name] = version
+
+        missing = [(name, token) for name, token in zip(names, tokens) if name not in versions]
+        if len(missing) > 0:
+            for (name, token), version in zip(missing, self.committed_versions([name for name, _ in missing],
+                                                                               process.shard)):
+                self.read_cache.put(name, token, version)
+                versions[name] = version
+
+        return versions
 
     def list_books(self):
-        # we must not return dirty data, so we ask the tail to provide the clean data
-        with grpc.insecure_channel(config.IDS_TO_IPS[self.tail_node_id]) as channel:
-            stub = shop_pb2_grpc.DistributedBookstoreStub(channel)
-            response = stub.ListBooks(shop_pb2.ListBooksRequest())
+        return list(self.iter_books())
+
+    def iter_books(self, page_size=PAGE_SIZE):
+        # the listing of the whole store is the listings of all shards one after another
+        for shard in range(len(self.chains)):
+            yield from self.iter_shard(shard, page_size)
+
+    def iter_shard(self, shard, page_size=PAGE_SIZE, cursor=0):
+        process = self.replica(shard)
+
+        if process is None:
+            # without local processes we ask the tail to stream the clean data page by page
+            with self.channels.connect(self.routes.address(self.tail(shard))) as stub:
+                for response in stub.ListBooksStream(shop_pb2.ListBooksPageRequest(page_size=page_size, cursor=cursor,
+                                                                                   shard=shard)):
+                    for book in response.books:
+                        yield Book(book.name, book.price)
+            return
 
-        return [Book(book.name, book.price) for book in response.books]
+        with process.lock:
+            snapshot = process.store.snapshot()
+
+        with snapshot:
+            while cursor < snapshot.length:
+                items, cursor = snapshot.page(cursor, page_size)
+
+                # clean books are returned right away, dirty ones are resolved with one version query to the tail
+                dirty = [name for name, _, clean in items if not clean]
+                versions = self.cached_versions(process, dirty) if len(dirty) > 0 else {}
+
+                with process.lock:
+                    books = [committed if clean else process.store.read(name, versions[name])
+                             for name, committed, clean in items]
+
+                for book in books:
+                    if book is not None:
+                        yield Book(book.name, book.price)
 
     def read(self, name):
-        entries = list(self.ids_to_processes.values())[0].store.data
-        found = next((entry for entry in entries if entry.book.name == name), None)
+        shard = self.shard(name)
+        process = self.replica(shard)
 
-        if found is None:
-            return None
-        elif found.clean:
-            return found.book
-        else:
-            # we must not return dirty data, so we ask the tail to provide the clean data
-            with grpc.insecure_channel(config.IDS_TO_IPS[self.tail_node_id]) as channel:
-                stub = shop_pb2_grpc.DistributedBookstoreStub(channel)
+        if process is None:
+            # without local processes we ask the tail to provide the clean data
+            with self.channels.connect(self.routes.address(self.tail(shard))) as stub:
                 response = stub.Read(shop_pb2.ReadRequest(name=name))
 
-            return Book(response.book.name, response.book.price)
+            return Book(response.book.name, response.book.price) if len(response.book.name) > 0 else None
+
+        with process.lock:
+            found = process.store.get(name)
+
+            if found is None:
+                return None
+            elif found.clean:
+                return Book(found.committed.name, found.committed.price)
+
+            token = process.store.version(name)
+
+        # we must not return dirty data, so we ask the tail which version is committed and return that one, and
+        # readers of a hot book share the answer until a clean for it arrives
+        version = self.read_cache.get(name, token, lambda name: self.committed_versions([name], shard)[0])
+        with process.lock:
+            book = process.store.read(name, version)
+
+        return Book(book.name, book.price) if book is not None else None
+
+    def multi_read(self, names):
+        # reads many books in about one round trip: the shards are read at the same time, and in each the clean books
+        # come from a local replica and the dirty ones are resolved with a single question to the tail
+        shards = {}
+        for name in dict.fromkeys(names):
+            shards.setdefault(self.shard(name), []).append(name)
+
+        if len(shards) > 1:
+            results = list(self.executor.map(lambda item: self.read_shard(*item), shards.items()))
+        else:
+            results = [self.read_shard(shard, shard_names) for shard, shard_names in shards.items()]
+
+        books = {}
+        for result in results:
+            books.update(result)
+
+        return [books[name] for name in names]
+
+    def read_shard(self, shard, names):
+        process = self.replica(shard)
+
+        if process is None:
+            with self.channels.connect(self.routes.address(self.tail(shard))) as stub:
+                response = stub.MultiRead(shop_pb2.MultiReadRequest(names=names, shard=shard))
+
+            return {name: Book(book.name, book.price) if len(book.name) > 0 else None
+                    for name, book in zip(names, response.books)}
+
+        books = {}
+        dirty = []
+        with process.lock:
+            for name in names:
+                found = process.store.get(name)
+                if found is None:
+                    books[name] = None
+                elif found.clean:
+                    books[name] = Book(found.committed.name, found.committed.price)
+                else:
+                    dirty.append(name)
+
+        if len(dirty) > 0:
+            versions = self.cached_versions(process, dirty)
+            with process.lock:
+                for name in dirty:
+                    book = process.store.read(name, versions[name])
+                    books[name] = Book(book.name, book.price) if book is not None else None
+
+        return books
+
+    def find_by_prefix(self, prefix, limit=PAGE_SIZE):
+        def find(stub, shard, after, count):
+            return stub.FindByPrefix(shop_pb2.PrefixRequest(prefix=prefix, limit=count, shard=shard,
+                                                            after=after.name if after is not None else None))
+
+        return self.query(find, lambda book: book.name, limit)
+
+    def find_by_price(self, min_price, max_price=None, limit=PAGE_SIZE):
+        # books with min_price <= price < max_price, cheapest first
+        def find(stub, shard, after, count):
+            after = shop_pb2.Book(name=after.name, price=after.price) if after is not None else None
+            return stub.FindByPrice(shop_pb2.PriceRangeRequest(min_price=min_price, max_price=max_price, limit=count,
+                                                               shard=shard, after=after))
+
+        return self.query(find, lambda book: (book.price, book.name), limit)
+
+    def query(self, find, key, limit):
+        # the books of a shard are spread over the others by their hash, so every tail is asked for its first limit
+        # matches, a page at a time, and their sorted answers are merged
+        def query_shard(shard):
+            books = []
+            with self.channels.connect(self.routes.address(self.tail(shard))) as stub:
+                while len(books) < limit:
+                    count = min(limit - len(books), PAGE_SIZE)
+                    page = find(stub, shard, books[-1] if len(books) > 0 else None, count).books
+                    books += [Book(book.name, book.price) for book in page]
+                    if len(page) < count:
+                        break
+
+            return books
+
+        results = list(self.executor.map(query_shard, range(len(self.chains))))
+
+        return list(itertools.islice(heapq.merge(*results, key=key), limit))
 
     def write(self, book):
-        # start the chain of replication of the head
-        self.write_func(self.head, book)
+        # start the chain of replication of the head of the book's shard
+        self.write_func(self.head(self.shard(book.name)), [book])
+
+    def write_func(self, process_id, books):
+        process = self.ids_to_processes.get(process_id)
+        if process is not None:
+            # the process is one of ours, so the writes are handed over as they are instead of through gRPC
+            try:
+                self.apply_writes(process, books)
+            except OutOfOrder as error:
+                print(f'Local writes out of order: {error}')
+                self.resend_local(process)
+            return
 
-    def write_func(self, process_id, book):
-        node = int(process_id[4])
-        with grpc.insecure_channel(config.IDS_TO_IPS[node]) as channel:
-            stub = shop_pb2_grpc.DistributedBookstoreStub(channel)
-            stub.Write(shop_pb2.WriteRequest(process_id=process_id, name=book.name, price=book.price))
+        if self.streaming:
+            self.link(self.routes.address(process_id)).send(process_id, books)
+        else:
+            # updates for the same process are accumulated and forwarded as one batch
+            self.write_batcher.add(process_id, books)
 
-    def clean_func(self, process_id, book):
-        node = int(process_id[4])
-        with grpc.insecure_channel(config.IDS_TO_IPS[node]) as channel:
-            stub = shop_pb2_grpc.DistributedBookstoreStub(channel)
-            stub.Clean(shop_pb2.CleanRequest(process_id=process_id, book=shop_pb2.Book(name=book.name, price=book.price)))
+    def resend_local(self, process):
+        # writes handed over in memory have no stream that would send them again, so the process gets every write
+        # after its last one again from its predecessor, whose dirty writes hold all that it can miss
+        predecessor = self.ids_to_processes.get(process.predecessor)
+        if predecessor is None:
+            return
+
+        with predecessor.lock:
+            books = [Book(name, price, seq) for seq, name, price in predecessor.store.dirty()
+                     if seq > process.store.last_seq]
+            # sent while the predecessor is locked, so they stay ahead of its next writes
+            if len(books) > 0:
+                self.forward_writes(process.id, books)
+
+        print(f'Resent {len(books)} writes from {predecessor.id} to {process.id}')
+
+    def clean_func(self, process_id, seq):
+        process = self.ids_to_processes.get(process_id)
+        if process is not None:
+            self.apply_cleans(process, seq)
+            return
+
+        upstream = self.upstreams.get(self.routes.node(process_id))
+
+        # clean acks go back over the stream the predecessor's node opened to us, if there is one
+        if self.streaming and upstream is not None:
+            upstream.send(process_id, seq)
+        else:
+            self.clean_batcher.add(process_id, [seq])
+
+    def link(self, address):
+        with self.links_lock:
+            link = self.links.get(address)
+            if link is None:
+                local = address == config.IDS_TO_IPS.get(self.id) and self.local_link_class is not None
+                link = (self.local_link_class if local else self.link_class)(self, address)
+                self.links[address] = link
+
+            return link
+
+    def send_writes(self, process_id, books):
+        address = self.routes.address(process_id)
+        request = shop_pb2.WriteBatchRequest(process_id=process_id, books=[
+            shop_pb2.Book(name=book.name, price=book.price, seq=book.seq) for book in books])
+
+        self.metrics.sent(address, [request])
+        with self.channels.connect(address) as stub:
+            stub.WriteBatch(request)
+
+    def send_cleans(self, process_id, seqs):
+        # only the highest of the acks waiting for a process needs to be sent
+        address = self.routes.address(process_id)
+        request = shop_pb2.CleanBatchRequest(process_id=process_id, seq=max(seqs))
+
+        self.metrics.sent(address, [request])
+        with self.channels.connect(address) as stub:
+            stub.CleanBatch(request)
 
     def set_timeout(self, timeout):
-        for node in config.IDS_TO_IPS.values():
-            with grpc.insecure_channel(node) as channel:
-                stub = shop_pb2_grpc.DistributedBookstoreStub(channel)
-                stub.SetTimeout(shop_pb2.SetTimeoutRequest(timeout=timeout))
+        _, failures = self.fan_out(lambda stub, node: stub.SetTimeout(shop_pb2.SetTimeoutRequest(timeout=timeout),
+                                                                      timeout=config.RPC_TIMEOUT))
+
+        return failures
+
+    def queue_depth(self):
+        links = sum(link.pending() for link in list(self.links.values()))
+        batches = self.write_batcher.pending() + self.clean_batcher.pending()
+
+        return self.scheduler.delayed(), self.scheduler.queued(), links + batches
+
+    def stats(self):
+        delayed, queued, sending = self.queue_depth()
+        now = time.monotonic()
+        processes = []
+
+        for process in list(self.ids_to_processes.values()):
+            with process.lock:
+                oldest = process.store.oldest_dirty()
+                processes.append(shop_pb2.ProcessStats(
+                    process_id=process.id, dirty=process.store.dirty_count(),
+                    oldest_dirty_age=now - oldest if oldest is not None else 0,
+                    last_seq=process.store.last_seq, clean_seq=process.store.clean_seq, shard=process.shard))
+
+        hits, misses, coalesced, invalidations, evictions, size = self.read_cache.stats()
+
+        return shop_pb2.StatsResponse(
+            node_id=self.id, processes=processes, delayed=delayed, queued=queued, sending=sending,
+            cache=shop_pb2.CacheStats(hits=hits, misses=misses, coalesced=coalesced, invalidations=invalidations,
+                                      evictions=evictions, size=size),
+            latencies=[shop_pb2.Histogram(rpc=rpc, counts=counts, count=count, sum=total)
+                       for rpc, counts, count, total in self.metrics.latencies()],
+            peers=[shop_pb2.PeerStats(address=address, bytes_sent=size) for address, size in self.metrics.peers()],
+            rejected=self.rejected)
+
+    def cluster_stats(self):
+        return self.fan_out(lambda stub, node: stub.Stats(shop_pb2.StatsRequest(), timeout=config.RPC_TIMEOUT))
+
+    def prometheus(self):
+        return prometheus_text(self.stats())
 
     def data_status(self, i):
         return list(self.ids_to_processes.values())[i].store.data
 
-    def remove_head(self):
-        chain = self.list_chain()
+    def close(self):
+        self.closed = True
+
+        for link in self.links.values():
+            link.close()
+        self.channels.close()
+        self.executor.shutdown(wait=False)
+
+        for process in self.ids_to_processes.values():
+            if process.log is not None:
+                process.log.close()
+
+    def remove_head(self, shard=0):
+        reported, failures = self.reported_chain()
+        chain = build_chain([node for node in reported.values() if node.shard == shard], self.head(shard))
         new_head = chain[1]
+        epoch = self.next_epoch(reported, shard)
+
+        _, remove_failures = self.fan_out(lambda stub, node: stub.RemoveHead(
+            shop_pb2.RemoveHeadRequest(new_head=new_head, shard=shard, epoch=epoch), timeout=config.RPC_TIMEOUT))
+        failures.update(remove_failures)
+
+        return failures
+
+
+class AsyncNode(Node):
+    # serves the same RPCs on grpc.aio: the handlers run on one event loop and replication goes over
+    # AsyncReplicationLinks, so writes held up by a slow hop are suspended calls instead of busy worker threads
+    def __init__(self, id_, data_dir=None, compact=False):
+        super().__init__(id_, streaming=True, data_dir=data_dir, compact=compact)
+        self.link_class = AsyncReplicationLink
+        self.local_link_class = AsyncLocalLink
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.aio_channels = {}
+        # heads waiting for room, see admit_async
+        self.rooms = {}
+
+    def start(self, address):
+        # the loop gets its own thread, so the command line and the calls made from it can keep blocking
+        started = threading.Event()
+        self.thread = threading.Thread(target=asyncio.run, args=[self.run(address, started)], daemon=True)
+        self.thread.start()
+        started.wait()
+
+        if self.server is None:
+            raise RuntimeError(f'Could not start the server on {address}')
+
+    async def run(self, address, started):
+        try:
+            self.loop = asyncio.get_running_loop()
+            server = grpc.aio.server()
+            shop_pb2_grpc.add_DistributedBookstoreServicer_to_server(self, server)
+            server.add_insecure_port(address)
+            await server.start()
+            self.server = server
+        finally:
+            started.set()
+
+        await self.server.wait_for_termination()
+
+    def stop(self):
+        # the loop ends together with the server
+        asyncio.run_coroutine_threadsafe(self.server.stop(None), self.loop)
+        self.thread.join()
+
+    async def CreateChain(self, request, context):
+        return super().CreateChain(request, context)
+
+    async def Link(self, request, context):
+        return super().Link(request, context)
+
+    def update_chain(self, request):
+        # the links of the processes belong to the event loop, so the chain is taken over there
+        asyncio.run_coroutine_threadsafe(self.Link(request, None), self.loop).result()
+
+    async def ListChain(self, request, context):
+        return super().ListChain(request, context)
+
+    async def ListBooks(self, request, context):
+        return super().ListBooks(request, context)
+
+    async def ListBooksStream(self, request, context):
+        page_size = request.page_size if request.page_size > 0 else PAGE_SIZE
+        cursor = request.cursor
+        snapshot = self.tail_snapshot(request.shard, context)
+        if snapshot is None:
+            return
+
+        with self.metrics.timer('ListBooksStream'), snapshot:
+            while cursor < snapshot.length:
+                items, cursor = snapshot.page(cursor, page_size)
+                yield books_response(items, cursor)
+
+    async def Read(self, request, context):
+        return super().Read(request, context)
+
+    async def MultiRead(self, request, context):
+        return super().MultiRead(request, context)
+
+    async def FindByPrefix(self, request, context):
+        return super().FindByPrefix(request, context)
+
+    async def FindByPrice(self, request, context):
+        return super().FindByPrice(request, context)
+
+    async def Version(self, request, context):
+        return super().Version(request, context)
+
+    async def Write(self, request, context):
+        with self.metrics.timer('Write'):
+            try:
+                await self.apply_writes_async(self.ids_to_processes[request.process_id],
+                                              [Book(request.name, request.price, request.seq)], self.admission_timeout)
+            except Overloaded as error:
+                reject(context, error)
+            except OutOfOrder as error:
+                reject(context, error, grpc.StatusCode.FAILED_PRECONDITION)
+
+        return shop_pb2.WriteResponse()
+
+    async def Clean(self, request, context):
+        return super().Clean(request, context)
+
+    async def WriteBatch(self, request, context):
+        with self.metrics.timer('WriteBatch'):
+            try:
+                await self.apply_writes_async(self.ids_to_processes[request.process_id],
+                                              [Book(book.name, book.price, book.seq) for book in request.books],
+                                              self.admission_timeout)
+            except Overloaded as error:
+                reject(context, error)
+            except OutOfOrder as error:
+                reject(context, error, grpc.StatusCode.FAILED_PRECONDITION)
+
+        return shop_pb2.WriteBatchResponse()
+
+    async def CleanBatch(self, request, context):
+        return super().CleanBatch(request, context)
+
+    async def Replicate(self, request_iterator, context):
+        source = int(dict(context.invocation_metadata())['node-id'])
+        upstream = AsyncUpstreamLink(self, source)
+        self.upstreams[source] = upstream
+
+        try:
+            async for message in upstream.serve(request_iterator):
+                yield message
+        except OutOfOrder as error:
+            await context.abort(grpc.StatusCode.FAILED_PRECONDITION, str(error))
+        finally:
+            if self.upstreams.get(source) is upstream:
+                del self.upstreams[source]
+
+    async def SetTimeout(self, request, context):
+        return super().SetTimeout(request, context)
+
+    async def RemoveHead(self, request, context):
+        return super().RemoveHead(request, context)
+
+    async def Stats(self, request, context):
+        return super().Stats(request, context)
+
+    async def Heartbeat(self, request, context):
+        return super().Heartbeat(request, context)
+
+    async def Attach(self, request, context):
+        # the copy is read with blocking calls, so it runs next to the loop, which keeps serving the writes meanwhile
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self.attach, request)
+        except ValueError as error:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(error))
+
+    async def Transfer(self, request, context):
+        snapshot, dirty, clean_seq, last_seq = self.start_transfer(request)
+        page_size = request.page_size if request.page_size > 0 else PAGE_SIZE
+
+        with snapshot:
+            for chunk in transfer_chunks(snapshot, dirty, clean_seq, last_seq, page_size):
+                yield chunk
+
+    async def Commit(self, request_iterator, context):
+        answers = asyncio.Queue()
+        commits = Commits(functools.partial(self.loop.call_soon_threadsafe, answers.put_nowait))
+        receiver = self.loop.create_task(self.receive_commits_async(request_iterator, commits))
+
+        try:
+            while True:
+                answer = await answers.get()
+                if answer is CLOSE:
+                    return
+                if isinstance(answer, Exception):
+                    await context.abort(grpc.StatusCode.FAILED_PRECONDITION, str(answer))
+                yield answer
+        finally:
+            receiver.cancel()
+
+    async def receive_commits_async(self, request_iterator, commits):
+        try:
+            async for request in request_iterator:
+                process, books = self.commit_request(request)
+                with self.metrics.timer('Commit.WriteBatch'):
+                    await self.apply_writes_async(process, books, on_commit=commits.wait())
+            commits.end()
+        except ValueError as error:
+            commits.end(error)
+        except grpc.RpcError:
+            commits.end()
+
+    async def apply_writes_async(self, process, books, timeout=None, on_commit=None):
+        if process.predecessor is None:
+            await self.admit_async(process, len(books), timeout)
+        self.apply_writes(process, books, on_commit=on_commit)
+
+        # the writes are already on their way, waiting for room only keeps a slow successor from piling them up
+        if process.successor is not None:
+            await self.link(self.routes.address(process.successor)).room()
+
+    async def admit_async(self, process, count, timeout):
+        # the head's writes wait for room here, on the loop, which keeps serving the acks that make it
+        deadline = self.loop.time() + timeout if timeout is not None else None
+
+        while self.full(process, count):
+            remaining = deadline - self.loop.time() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                raise self.overloaded(process, count)
+
+            room = self.rooms.setdefault(process.id, asyncio.Event())
+            room.clear()
+            try:
+                await asyncio.wait_for(room.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    def admit(self, process, count, timeout):
+        # apply_writes_async waited for room already, waiting here would block the loop
+        pass
+
+    def made_room(self, process):
+        room = self.rooms.get(process.id)
+        if room is not None:
+            self.loop.call_soon_threadsafe(room.set)
+
+    def forward_writes(self, process_id, books):
+        # sent while the process is still locked, so they leave in the order they were stamped in
+        self.link(self.routes.address(process_id)).send(process_id, books, self.timeout)
+
+    def forward_cleans(self, process_id, seq):
+        self.clean_func(process_id, seq, self.timeout)
+
+    def acknowledge(self, process, seq, position):
+        if position > 0:
+            process.log.when_flushed(position, functools.partial(
+                self.loop.call_soon_threadsafe, self.clean_func, process.predecessor, seq))
+        else:
+            self.clean_func(process.predecessor, seq)
+
+    def write(self, book):
+        asyncio.run_coroutine_threadsafe(self.send_writes_async(self.head(self.shard(book.name)), [book]),
+                                         self.loop).result()
+
+    async def send_writes_async(self, process_id, books):
+        link = self.link(self.routes.address(process_id))
+        link.send(process_id, books)
+        await link.room()
+
+    def clean_func(self, process_id, seq, delay=0):
+        process = self.ids_to_processes.get(process_id)
+        if process is not None:
+            # acks are cumulative, so the ones for our own processes can be applied whenever they are due
+            if delay > 0:
+                self.loop.call_later(delay, self.apply_cleans, process, seq)
+            else:
+                self.apply_cleans(process, seq)
+            return
+
+        node = self.routes.node(process_id)
+        upstream = self.upstreams.get(node)
+
+        if upstream is not None:
+            upstream.send(process_id, seq, delay)
+        else:
+            # the predecessor's node sent its writes without a stream, so the ack goes back on its own
+            self.loop.create_task(self.send_cleans_async(node, process_id, seq, delay))
+
+    async def send_cleans_async(self, node, process_id, seq, delay):
+        await asyncio.sleep(delay)
+
+        address = config.IDS_TO_IPS[node]
+        channel = self.aio_channels.get(node)
+        if channel is None:
+            channel = grpc.aio.insecure_channel(address, options=CHANNEL_OPTIONS)
+            self.aio_channels[node] = channel
+
+        request = shop_pb2.CleanBatchRequest(process_id=process_id, seq=seq)
+        self.metrics.sent(address, [request])
+
+        try:
+            await shop_pb2_grpc.DistributedBookstoreStub(channel).CleanBatch(request)
+        except grpc.RpcError as error:
+            print(f'Sending a clean ack to {process_id} failed: {error.code()}')
+
+    def queue_depth(self):
+        outgoing = [link.outgoing for link in list(self.links.values())]
+        outgoing += [upstream.outgoing for upstream in list(self.upstreams.values())]
+        delayed = sum(updates.delayed() for updates in outgoing)
+
+        return delayed, 0, sum(len(updates) for updates in outgoing) - delayed
+
+    def prometheus(self):
+        # the queues of the links belong to the event loop, so they are looked at from there
+        return asyncio.run_coroutine_threadsafe(self.prometheus_async(), self.loop).result()
 
-        for node in config.IDS_TO_IPS.values():
-            with grpc.insecure_channel(node) as channel:
-                stub = shop_pb2_grpc.DistributedBookstoreStub(channel)
-                stub.RemoveHead(shop_pb2.RemoveHeadRequest(new_head=new_head))
+    async def prometheus_async(self):
+        return prometheus_text(self.stats())
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.close_links(), self.loop).result()
+        super().close()
+
+    async def close_links(self, timeout=1):
+        # lets the streams send what they still have before their channels go away
+        for link in self.links.values():
+            link.close()
+
+        tasks = [link.task for link in self.links.values()]
+        if len(tasks) > 0:
+            await asyncio.wait(tasks, timeout=timeout)
+
+        for channel in self.aio_channels.values():
+            await channel.close()
+
+
+def books_response(items, cursor):
+    return shop_pb2.ListBooksResponse(books=[shop_pb2.Book(name=book.name, price=book.price)
+                                             for _, book, _ in items if book is not None], cursor=cursor)
+
+
+def query_response(books):
+    return shop_pb2.QueryResponse(books=[shop_pb2.Book(name=book.name, price=book.price) for book in books])
+
+
+def query_limit(limit):
+    return min(limit, PAGE_SIZE) if limit > 0 else PAGE_SIZE
+
+
+def transfer_chunks(snapshot, dirty, clean_seq, last_seq, page_size):
+    cursor = 0
+    while cursor < snapshot.length:
+        items, cursor = snapshot.page(cursor, page_size)
+        yield shop_pb2.TransferChunk(books=[shop_pb2.Book(name=book.name, price=book.price, seq=book.seq)
+                                            for _, book, _ in items if book is not None],
+                                     clean_seq=clean_seq, last_seq=last_seq)
+
+    # the dirty writes go last and at least once, so that the joining process always learns the sequence numbers
+    for i in range(0, max(len(dirty), 1), page_size):
+        yield shop_pb2.TransferChunk(books=[shop_pb2.Book(name=name, price=price, seq=seq)
+                                            for seq, name, price in dirty[i:i + page_size]],
+                                     dirty=True, clean_seq=clean_seq, last_seq=last_seq)
+
+
+def shard_of(name, shards):
+    # every shard owns an equal range of the 32 bit hashes of the book names
+    return zlib.crc32(name.encode()) * shards >> 32
+
+
+def place(processes, ids, shards, placement='spread'):
+    # deals the processes out to the chains: every chain starts on another node, so that the heads, where all writes
+    # of a chain are ordered, are spread over the nodes, and goes on over the next nodes in turn
+    by_node = {}
+    for process_id in processes:
+        by_node.setdefault(ids[process_id].node, []).append(process_id)
+
+    nodes = list(by_node)
+    chains = []
+
+    for shard in range(shards):
+        length = len(processes) // shards + (1 if shard < len(processes) % shards else 0)
+        chain = []
+        turn = shard
+
+        while len(chain) < length:
+            remaining = by_node[nodes[turn % len(nodes)]]
+            if len(remaining) > 0:
+                chain.append(remaining.pop())
+            turn += 1
+
+        if placement == 'grouped':
+            # the same processes, with those of a node one after another in the order the nodes were first visited
+            order = list(dict.fromkeys(ids[process_id].node for process_id in chain))
+            chain.sort(key=lambda process_id: order.index(ids[process_id].node))
+
+        chains.append(chain)
+
+    return chains
+
+
+def build_chain(chain_nodes, head):
+    # follows the successors from the head, looking every process up by id instead of scanning the whole list
+    by_id = {node.process_id: node for node in chain_nodes}
+    current = by_id.get(head)
+    if current is None:
+        # the head's node did not answer, so we start from the first process whose predecessor is unknown
+        current = next((node for node in chain_nodes if node.predecessor_id not in by_id), None)
+
+    result = []
+
+    while current is not None and len(result) < len(by_id):
+        result.append(current.process_id)
+        current = by_id.get(current.successor_id)
+
+    return result
+
+
+def reject(context, error, code=grpc.StatusCode.RESOURCE_EXHAUSTED):
+    context.set_code(code)
+    context.set_details(str(error))
+
+
+def report(failures):
+    for node, code in failures.items():
+        print(f'Node {node} did not respond: {code}')
+
+
+def show_books(books):
+    for i, book in enumerate(books):
+        print(f'{i + 1}) {book.name} = {round(book.price, 1)} EUR')
+    if len(books) == 0:
+        print('No books found.')
+
+
+def show_stats(responses):
+    # lag is counted against the highest sequence number in the process's chain, which is the head's
+    head_seqs = {}
+    for stats in responses.values():
+        for process in stats.processes:
+            head_seqs[process.shard] = max(head_seqs.get(process.shard, 0), process.last_seq)
+
+    for address, stats in sorted(responses.items(), key=lambda item: item[1].node_id):
+        print(f'Node {stats.node_id} ({address}): {stats.delayed} delayed, {stats.queued} ready to forward, '
+              f'{stats.sending} waiting to be sent')
+        for histogram in stats.latencies:
+            print(f'  {histogram.rpc}: {histogram.count} calls, mean {histogram.sum / histogram.count * 1000:.3f} ms, '
+                  f'p50 <= {quantile(histogram.counts, 0.5) * 1000:g} ms, '
+                  f'p99 <= {quantile(histogram.counts, 0.99) * 1000:g} ms')
+        for process in stats.processes:
+            print(f'  {process.process_id}: {process.dirty} dirty, oldest for {process.oldest_dirty_age:.3f} s, '
+                  f'{head_seqs[process.shard] - process.last_seq} writes behind the head of shard {process.shard}')
+        for peer in stats.peers:
+            print(f'  {peer.bytes_sent} bytes sent to {peer.address}')
+
+        if stats.rejected > 0:
+            print(f'  {stats.rejected} writes rejected by full chains')
+
+        cache = stats.cache
+        lookups = cache.hits + cache.misses + cache.coalesced
+        if lookups > 0:
+            print(f'  read cache: {cache.hits / lookups:.1%} hits, {cache.coalesced} coalesced, {cache.misses} misses, '
+                  f'{cache.invalidations} invalidated, {cache.evictions} evicted, {cache.size} cached')
+
+
+def server_workers():
+    return SERVER_WORKERS + 2 * len(config.IDS_TO_IPS)
 
 
 def serve():
+    if config.MEMBERS_FILE is not None:
+        config.IDS_TO_IPS = load_members(config.MEMBERS_FILE)
+
     node_id = int(input('Enter node id: '))
 
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    node = Node(node_id)
-    shop_pb2_grpc.add_DistributedBookstoreServicer_to_server(node, server)
-    server.add_insecure_port(config.IDS_TO_IPS[node_id])
-    server.start()
+    if config.ASYNC_SERVER:
+        node = AsyncNode(node_id, data_dir=config.DATA_DIR, compact=config.COMPACT_STORES)
+        node.start(config.IDS_TO_IPS[node_id])
+    else:
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=server_workers()))
+        node = Node(node_id, data_dir=config.DATA_DIR, compact=config.COMPACT_STORES)
+        shop_pb2_grpc.add_DistributedBookstoreServicer_to_server(node, server)
+        server.add_insecure_port(config.IDS_TO_IPS[node_id])
+        server.start()
+
+    if config.METRICS_PORT is not None:
+        serve_prometheus(config.METRICS_PORT + node_id, node.prometheus)
+    client = Client(node)
     print("Server started listening.\n")
 
     while True:
@@ -244,27 +1741,31 @@ def serve():
             num_processes = int(command[1])
             node.init_processes(num_processes)
         elif command[0] == 'Create-chain':
-            if node.head is None:
-                node.create_chain()
+            shards = int(command[1]) if len(command) > 1 else 1
+            if len(node.chains) == 0:
+                report(node.create_chain(shards))
             else:
                 command = input('A chain is already created. Creating new chain will destroy all stored data. ' 
                                 'Are you sure you want to create a new chain? yes/no: ')
                 if command == 'yes':
-                    node.create_chain()
+                    report(node.create_chain(shards))
                 elif command == 'no':
                     continue
                 else:
                     print('Wrong command! Please try again.')
         elif command[0] == 'List-chain':
-            chain = node.list_chain()
-            chain[0] += '(Head)'
-            chain[-1] += '(Tail)'
-            print(' -> '.join(chain))
+            chains, failures = node.list_chains()
+            report(failures)
+            for shard, chain in enumerate(chains):
+                chain[0] += '(Head)'
+                chain[-1] += '(Tail)'
+                print((f'Shard {shard}: ' if len(chains) > 1 else '') + ' -> '.join(chain))
         elif command[0] == 'List-books':
-            books = node.list_books()
-            for i, book in enumerate(books):
-                print(f'{i + 1}) {book.name} = {round(book.price, 1)} EUR')
-            if len(books) == 0:
+            count = 0
+            for book in node.iter_books():
+                count += 1
+                print(f'{count}) {book.name} = {round(book.price, 1)} EUR')
+            if count == 0:
                 print('No books yet in the stock.')
         elif command[0] == 'Read-operation':
             command = ' '.join(command[1:])
@@ -274,22 +1775,77 @@ def serve():
                 print(f'{round(book.price, 1)} EUR')
             else:
                 print('Not yet in the stock.')
+        elif command[0] == 'Multi-read':
+            names = ' '.join(command[1:]).split('"')[1::2]
+            for name, book in zip(names, node.multi_read(names)):
+                print(f'{name}: {round(book.price, 1)} EUR' if book is not None else f'{name}: not yet in the stock.')
+        elif command[0] == 'Find-prefix':
+            prefix = ' '.join(command[1:])[1:-1]
+            show_books(node.find_by_prefix(prefix))
+        elif command[0] == 'Find-price':
+            min_price = float(command[1])
+            max_price = float(command[2]) if len(command) > 2 else None
+            show_books(node.find_by_price(min_price, max_price))
         elif command[0] == 'Write-operation':
             command = ' '.join(command[1:])
             command = command.split('"')
             name = command[1]
             price = round(float(command[2][2:-1]), 1)
-            node.write(Book(name, price))
+            # the command waits until the write is clean at the tail, slow chains finish it in the background
+            start = time.perf_counter()
+            try:
+                seq = client.write(Book(name, price)).result(config.RPC_TIMEOUT)
+                print(f'Committed as write {seq} of shard {node.shard(name)} after '
+                      f'{(time.perf_counter() - start) * 1000:.1f} ms')
+            except futures.TimeoutError:
+                print(f'Not clean after {config.RPC_TIMEOUT} s yet, the write goes on in the background.')
+            except grpc.RpcError as error:
+                print(f'The write may not have reached the chain: {error.code()}')
+        elif command[0] == 'Import-books':
+            path = ' '.join(command[1:])
+            try:
+                count, seconds = import_books(client, path)
+                print(f'Imported {count} books in {seconds:.1f} s, {count / max(seconds, 1e-9):.0f} books/s')
+            except (OSError, ValueError, KeyError, IndexError) as error:
+                print(f'Could not import {path}: {error!r}')
+            except grpc.RpcError as error:
+                print(f'The import stopped, the last books may not have reached the chain: {error.code()}')
+        elif command[0] == 'Export-books':
+            path = ' '.join(command[1:])
+            start = time.perf_counter()
+            try:
+                count = export_books(node, path)
+                print(f'Exported {count} books in {time.perf_counter() - start:.1f} s')
+            except (OSError, ValueError) as error:
+                print(f'Could not export to {path}: {error!r}')
         elif command[0] == 'Time-out':
             timeout = int(command[1])
-            node.set_timeout(timeout)
+            report(node.set_timeout(timeout))
         elif command[0] == 'Data-status':
             p = int(command[1]) - 1
             data = node.data_status(p)
             for i, entry in enumerate(data):
                 print(f'{i + 1}) {entry.book.name} -- {"clean" if entry.clean else "dirty"}')
+        elif command[0] == 'Queue-depth':
+            delayed, queued, sending = node.queue_depth()
+            print(f'{delayed} delayed, {queued} ready to forward, {sending} waiting to be sent')
+        elif command[0] == 'Stats':
+            responses, failures = node.cluster_stats()
+            report(failures)
+            show_stats(responses)
         elif command[0] == 'Remove-head':
-            node.remove_head()
+            shard = int(command[1]) if len(command) > 1 else 0
+            report(node.remove_head(shard))
+        elif command[0] == 'Extend-chain':
+            after = command[2] if len(command) > 2 else None
+            try:
+                books, failures = node.extend_chain(command[1], after)
+                report(failures)
+                print(f'{command[1]} joined the chain with {books} books')
+            except ValueError as error:
+                print(f'Could not extend the chain: {error}')
+            except grpc.RpcError as error:
+                print(f'Could not extend the chain: {error.details()}')
         else:
             print('Wrong command! Please try again.')
 
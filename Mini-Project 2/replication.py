@@ -0,0 +1,540 @@
+import config
+import shop_pb2
+import shop_pb2_grpc
+
+import asyncio
+import functools
+import grpc
+import queue
+import threading
+import time
+
+from channels import CHANNEL_OPTIONS
+from collections import deque
+from model.entities import *
+
+CLOSE = object()
+# how often the consumer of a Replicate call that waits for writes checks whether the call is still going
+POLL_INTERVAL = 0.1
+# writes merged into one message at most, which keeps the segments of bulk imports well below gRPC's 4 MB limit
+MAX_MESSAGE_BOOKS = 10000
+
+
+def write_messages(items):
+    # merges consecutive writes for the same process into one message, keeping their order
+    groups = []
+
+    for process_id, books in items:
+        if len(groups) > 0 and groups[-1][0] == process_id and len(groups[-1][1]) + len(books) <= MAX_MESSAGE_BOOKS:
+            groups[-1][1].extend(books)
+        else:
+            groups.append((process_id, list(books)))
+
+    return [shop_pb2.WriteBatchRequest(process_id=process_id, books=[
+        shop_pb2.Book(name=book.name, price=book.price, seq=book.seq) for book in books]) for process_id, books in groups]
+
+
+def clean_messages(items):
+    # clean acks are cumulative, so only the highest one per process is sent
+    seqs = {}
+
+    for process_id, seq in items:
+        seqs[process_id] = max(seq, seqs.get(process_id, 0))
+
+    return [shop_pb2.CleanBatchRequest(process_id=process_id, seq=seq) for process_id, seq in seqs.items()]
+
+
+class OutOfOrder(Exception):
+    # writes that skip sequence numbers a process has not seen, which it must not apply before the missing ones
+    pass
+
+
+def ends(item):
+    # a stream ends at CLOSE, or with an exception that was put in its queue
+    return item is CLOSE or isinstance(item, Exception)
+
+
+def stream(items, messages, max_batch):
+    # turns a queue of updates into a stream of messages, sending whatever piled up meanwhile together
+    while True:
+        batch = [items.get()]
+
+        while not ends(batch[-1]) and len(batch) < max_batch:
+            try:
+                batch.append(items.get_nowait())
+            except queue.Empty:
+                break
+
+        end = batch.pop() if ends(batch[-1]) else None
+
+        yield from messages(batch)
+
+        if isinstance(end, Exception):
+            raise end
+        if end is CLOSE:
+            return
+
+
+class Unacked:
+    # the writes a link sent that its chain has not acknowledged yet, by the process they went to. A link that lost its
+    # stream sends them again before anything else, the processes drop the ones they already have
+    def __init__(self):
+        self.writes = {}
+        self.lock = threading.Lock()
+
+    def add(self, items):
+        with self.lock:
+            for process_id, books in items:
+                self.writes.setdefault(process_id, deque()).extend(books)
+
+    def acknowledge(self, process_id, seq):
+        # acks are cumulative, and the tail acknowledging a write means every process of the chain has it
+        with self.lock:
+            books = self.writes.get(process_id)
+            while books and books[0].seq <= seq:
+                books.popleft()
+
+    def forget(self, process_id):
+        # the process gets its writes from somewhere else now
+        with self.lock:
+            self.writes.pop(process_id, None)
+
+    def items(self):
+        # in pieces no larger than a message, see write_messages
+        with self.lock:
+            writes = [(process_id, list(books)) for process_id, books in self.writes.items()]
+
+        return [(process_id, books[i:i + MAX_MESSAGE_BOOKS])
+                for process_id, books in writes for i in range(0, len(books), MAX_MESSAGE_BOOKS)]
+
+    def clear(self):
+        with self.lock:
+            self.writes.clear()
+
+
+class Requests:
+    # the requests of one Replicate call: they start with the writes that are not acknowledged yet and go on with what
+    # is queued, and every write taken off the queue counts as sent before it leaves. The call's consumer thread can
+    # outlive the call, so once the call ended it takes nothing anymore, and end() waits until a write it is taking
+    # right then is noted
+    def __init__(self, link, resend):
+        self.link = link
+        self.messages = deque(link.messages(resend))
+        self.ended = False
+        self.taking = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while len(self.messages) == 0:
+            with self.taking:
+                if self.ended:
+                    raise StopIteration
+                self.take()
+
+        return self.messages.popleft()
+
+    def take(self):
+        try:
+            batch = [self.link.outgoing.get(timeout=POLL_INTERVAL)]
+        except queue.Empty:
+            return
+
+        while batch[-1] is not CLOSE and len(batch) < self.link.max_batch:
+            try:
+                batch.append(self.link.outgoing.get_nowait())
+            except queue.Empty:
+                break
+
+        if batch[-1] is CLOSE:
+            batch.pop()
+            self.ended = True
+
+        self.link.unacked.add(batch)
+        self.messages.extend(self.link.messages(batch))
+
+    def end(self):
+        self.ended = True
+        with self.taking:
+            pass
+
+
+class ReplicationLink:
+    # a persistent stream to one peer node: writes go downstream, clean acks for our processes come back upstream
+    def __init__(self, node, address, window=1024, max_batch=256, retry_delay=1):
+        self.node = node
+        self.address = address
+        self.max_batch = max_batch
+        self.retry_delay = retry_delay
+        self.outgoing = queue.Queue(maxsize=window)
+        self.unacked = Unacked()
+        self.connected = False
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def send(self, process_id, books):
+        # blocks once the window is full, so a slow successor slows its predecessors down instead of piling up memory
+        if not self.closed:
+            self.outgoing.put((process_id, books))
+
+    def pending(self):
+        return self.outgoing.qsize()
+
+    def messages(self, batch):
+        return self.node.metrics.sent(self.address, write_messages(batch))
+
+    def close(self):
+        self.closed = True
+        self.outgoing.put(CLOSE)
+
+    def drop(self):
+        # the peer failed: what is still queued for it is thrown away, since the processes that took over from it get
+        # the writes they miss from their predecessors' pending writes, and senders blocked on the window go on
+        self.closed = True
+        self.unacked.clear()
+
+        while True:
+            try:
+                self.outgoing.get_nowait()
+            except queue.Empty:
+                pass
+
+            try:
+                self.outgoing.put_nowait(CLOSE)
+                return
+            except queue.Full:
+                continue
+
+    def run(self):
+        while not self.closed:
+            requests = Requests(self, resend(self.node, self.unacked))
+
+            try:
+                with self.node.channels.connect(self.address) as stub:
+                    responses = stub.Replicate(requests, metadata=[('node-id', str(self.node.id))])
+                    self.connected = True
+
+                    for response in responses:
+                        acknowledged(self.node, self.unacked, response)
+            except grpc.RpcError as error:
+                if self.closed:
+                    break
+                print(f'Replication link to {self.address} failed: {error.code()}')
+                time.sleep(self.retry_delay)
+            finally:
+                self.connected = False
+                requests.end()
+
+
+def resend(node, unacked):
+    # acks that came back some other way, like those sent while there was no stream, are counted first
+    for process in list(node.ids_to_processes.values()):
+        if process.successor is not None:
+            unacked.acknowledge(process.successor, process.store.clean_seq)
+
+    return unacked.items()
+
+
+def acknowledged(node, unacked, response):
+    process = node.ids_to_processes[response.process_id]
+    if process.successor is not None:
+        unacked.acknowledge(process.successor, response.seq)
+
+    with node.metrics.timer('Replicate.CleanBatch'):
+        node.apply_cleans(process, response.seq)
+
+
+class UpstreamLink:
+    # the receiving end of a ReplicationLink, which sends clean acks back to the node that opened it
+    def __init__(self, node, source, max_batch=256):
+        self.node = node
+        self.source = source
+        # clients outside the cluster have no address of their own
+        self.address = config.IDS_TO_IPS.get(source, 'Node' + str(source))
+        self.max_batch = max_batch
+        self.outgoing = queue.Queue()
+
+    def send(self, process_id, seq):
+        self.outgoing.put((process_id, seq))
+
+    def messages(self, batch):
+        return self.node.metrics.sent(self.address, clean_messages(batch))
+
+    def serve(self, request_iterator):
+        threading.Thread(target=self.receive, args=[request_iterator], daemon=True).start()
+
+        return stream(self.outgoing, self.messages, self.max_batch)
+
+    def receive(self, request_iterator):
+        try:
+            for request in request_iterator:
+                process = self.node.ids_to_processes[request.process_id]
+                with self.node.metrics.timer('Replicate.WriteBatch'):
+                    self.node.apply_writes(process, [Book(book.name, book.price, book.seq) for book in request.books])
+        except grpc.RpcError:
+            # the stream was cancelled by the other side
+            pass
+        except OutOfOrder as error:
+            # ends the stream with an error, the sender reconnects and starts with the writes we have not acknowledged,
+            # the missing ones among them
+            self.outgoing.put(error)
+        finally:
+            self.outgoing.put(CLOSE)
+
+
+class Outgoing:
+    # the asyncio counterpart of the queues above: updates wait until they are due and leave in the order they came
+    def __init__(self):
+        self.items = deque()
+        self.added = asyncio.Event()
+        self.taken = asyncio.Event()
+
+    def __len__(self):
+        return len(self.items)
+
+    def put(self, item, delay=0):
+        self.items.append((time.monotonic() + delay, item))
+        self.added.set()
+
+    def close(self):
+        self.put(CLOSE)
+
+    def drop(self):
+        self.items.clear()
+        self.taken.set()
+        self.close()
+
+    def delayed(self):
+        now = time.monotonic()
+        return sum(1 for due, _ in self.items if due > now)
+
+    async def room(self, window):
+        while len(self.items) >= window:
+            self.taken.clear()
+            await self.taken.wait()
+
+    async def batch(self, max_batch):
+        while len(self.items) == 0:
+            self.added.clear()
+            await self.added.wait()
+
+        delay = self.items[0][0] - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        now = time.monotonic()
+        batch = []
+        while len(self.items) > 0 and len(batch) < max_batch and self.items[0][0] <= now:
+            batch.append(self.items.popleft()[1])
+            if ends(batch[-1]):
+                break
+
+        self.taken.set()
+        return batch
+
+    def requeue(self, batch):
+        # puts a batch that was taken back in front, it was due already
+        self.items.extendleft((0, item) for item in reversed(batch))
+        self.added.set()
+
+
+async def stream_async(outgoing, messages, max_batch):
+    while True:
+        batch = await outgoing.batch(max_batch)
+
+        end = batch.pop() if len(batch) > 0 and ends(batch[-1]) else None
+
+        for message in messages(batch):
+            yield message
+
+        if isinstance(end, Exception):
+            raise end
+        if end is CLOSE:
+            return
+
+
+class AsyncReplicationLink:
+    # a ReplicationLink that lives on the node's event loop, sending never blocks a thread
+    def __init__(self, node, address, window=4096, max_batch=256, retry_delay=1):
+        self.node = node
+        self.address = address
+        self.window = window
+        self.max_batch = max_batch
+        self.retry_delay = retry_delay
+        self.outgoing = Outgoing()
+        self.unacked = Unacked()
+        self.call = None
+        self.connected = False
+        self.closed = False
+        self.loop = asyncio.get_running_loop()
+        self.task = self.loop.create_task(self.run())
+
+    def send(self, process_id, books, delay=0):
+        # callers keep the order of their writes by sending right after stamping them, and wait for room() after that
+        if not self.closed:
+            self.outgoing.put((process_id, books), delay)
+
+    async def room(self):
+        await self.outgoing.room(self.window)
+
+    def pending(self):
+        return len(self.outgoing)
+
+    def messages(self, batch):
+        return self.node.metrics.sent(self.address, write_messages(batch))
+
+    def close(self):
+        # may be called from any thread
+        self.closed = True
+        self.loop.call_soon_threadsafe(self.outgoing.close)
+
+    def drop(self):
+        self.closed = True
+        self.unacked.clear()
+        self.loop.call_soon_threadsafe(self.outgoing.drop)
+
+    async def requests(self, call):
+        # like Requests: the writes that are not acknowledged yet go first, and a batch the call takes after it ended
+        # goes back to the front of the queue for the next call
+        for message in self.messages(resend(self.node, self.unacked)):
+            yield message
+
+        while True:
+            batch = await self.outgoing.batch(self.max_batch)
+            if self.call is not call:
+                self.outgoing.requeue(batch)
+                return
+
+            closed = len(batch) > 0 and batch[-1] is CLOSE
+            if closed:
+                batch.pop()
+
+            self.unacked.add(batch)
+            for message in self.messages(batch):
+                yield message
+
+            if closed:
+                return
+
+    async def run(self):
+        async with grpc.aio.insecure_channel(self.address, options=CHANNEL_OPTIONS) as channel:
+            stub = shop_pb2_grpc.DistributedBookstoreStub(channel)
+
+            while not self.closed:
+                call = object()
+                self.call = call
+
+                try:
+                    responses = stub.Replicate(self.requests(call), metadata=[('node-id', str(self.node.id))])
+                    self.connected = True
+
+                    async for response in responses:
+                        acknowledged(self.node, self.unacked, response)
+                except grpc.RpcError as error:
+                    if self.closed:
+                        break
+                    print(f'Replication link to {self.address} failed: {error.code()}')
+                    await asyncio.sleep(self.retry_delay)
+                finally:
+                    self.connected = False
+                    self.call = None
+
+
+class AsyncUpstreamLink:
+    def __init__(self, node, source, max_batch=256):
+        self.node = node
+        self.source = source
+        self.address = config.IDS_TO_IPS.get(source, 'Node' + str(source))
+        self.max_batch = max_batch
+        self.outgoing = Outgoing()
+        self.receiver = None
+
+    def send(self, process_id, seq, delay=0):
+        self.outgoing.put((process_id, seq), delay)
+
+    def messages(self, batch):
+        return self.node.metrics.sent(self.address, clean_messages(batch))
+
+    def serve(self, request_iterator):
+        self.receiver = asyncio.get_running_loop().create_task(self.receive(request_iterator))
+
+        return stream_async(self.outgoing, self.messages, self.max_batch)
+
+    async def receive(self, request_iterator):
+        try:
+            async for request in request_iterator:
+                process = self.node.ids_to_processes[request.process_id]
+                # waiting here when our successor is slow stops reading, which slows the sender down in turn
+                with self.node.metrics.timer('Replicate.WriteBatch'):
+                    await self.node.apply_writes_async(process, [Book(book.name, book.price, book.seq)
+                                                                 for book in request.books])
+        except grpc.RpcError:
+            pass
+        except OutOfOrder as error:
+            self.outgoing.put(error)
+        finally:
+            self.outgoing.close()
+
+
+class AsyncLocalLink(AsyncReplicationLink):
+    # an AsyncReplicationLink to our own node: the writes still wait until they are due and leave in order, but are
+    # handed to the process as they are instead of being sent to ourselves over gRPC
+    def __init__(self, node, address, window=4096, max_batch=256):
+        super().__init__(node, address, window, max_batch)
+        self.connected = True
+
+    async def run(self):
+        while True:
+            for item in await self.outgoing.batch(self.max_batch):
+                if item is CLOSE:
+                    return
+
+                process_id, books = item
+                process = self.node.ids_to_processes[process_id]
+                try:
+                    await self.node.apply_writes_async(process, books)
+                except OutOfOrder as error:
+                    # there is no stream to resend from, the process gets what it misses from its predecessor
+                    print(f'Local writes out of order: {error}')
+                    self.node.resend_local(process)
+
+
+class Commits:
+    # the answers of a Commit stream, one for every batch of writes once it is clean, see Node.Commit. The stream
+    # ends when the client stopped writing and every batch it sent is answered
+    def __init__(self, put):
+        self.put = put
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.waiting = 0
+        self.ended = False
+
+    def wait(self):
+        # the callback for the next batch, the head calls it with the sequence number of the batch's last write
+        with self.lock:
+            batch = self.batches
+            self.batches += 1
+            self.waiting += 1
+
+        return functools.partial(self.answer, batch)
+
+    def answer(self, batch, seq):
+        self.put(shop_pb2.CommitResponse(batch=batch, seq=seq))
+
+        with self.lock:
+            self.waiting -= 1
+            done = self.ended and self.waiting == 0
+        if done:
+            self.put(CLOSE)
+
+    def end(self, error=None):
+        # an error ends the stream right away, the batches still waiting are left to the client to find out about
+        with self.lock:
+            self.ended = True
+            done = self.waiting == 0
+        if error is not None:
+            self.put(error)
+        elif done:
+            self.put(CLOSE)
@@ -0,0 +1,45 @@
+import config
+
+from model.entities import node_of
+
+
+def load_members(path):
+    # one node per line, its id and its address, e.g. "12 10.0.0.12:20048", empty lines and lines starting with # are
+    # skipped
+    members = {}
+
+    with open(path) as file:
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+            if len(line) == 0 or line.startswith('#'):
+                continue
+
+            fields = line.split()
+            if len(fields) != 2:
+                raise ValueError(f'{path}:{number}: expected "<node id> <host:port>", got "{line}"')
+            members[int(fields[0])] = fields[1]
+
+    return members
+
+
+class RoutingTable:
+    # the node of every process we know, filled in from the structured ids that come with the chains, so that
+    # forwarding to a process is a dict lookup instead of parsing its id on every hop
+    def __init__(self):
+        self.nodes = {}
+
+    def add(self, process_id, node):
+        self.nodes[process_id] = node
+
+    def node(self, process_id):
+        node = self.nodes.get(process_id)
+
+        if node is None:
+            # a process we have not been told about, like one that is being attached, is looked up once
+            node = node_of(process_id)
+            self.nodes[process_id] = node
+
+        return node
+
+    def address(self, process_id):
+        return config.IDS_TO_IPS[self.node(process_id)]
@@ -0,0 +1,85 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+
+
+class Scheduler:
+    # one delay queue per node drained by a fixed set of workers, instead of a new thread for every delayed call
+    def __init__(self, workers=4):
+        self.heap = []
+        # [delayed calls, due time of the last one] of every key with calls in the heap
+        self.keys = {}
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.queues = [queue.Queue() for _ in range(workers)]
+
+        threading.Thread(target=self.run, daemon=True).start()
+        for tasks in self.queues:
+            threading.Thread(target=self.work, args=[tasks], daemon=True).start()
+
+    def schedule(self, delay, func, args=(), key=None):
+        # calls with the same key run on the same worker in the order they were scheduled in. One with a shorter delay
+        # than the calls before it waits for them, so a write never overtakes the writes before it when the delay shrinks
+        with self.condition:
+            pending = self.keys.get(key)
+            if delay <= 0 and pending is None:
+                self.dispatch(key, func, args)
+                return
+
+            due = time.monotonic() + delay
+            if pending is None:
+                self.keys[key] = [1, due]
+            else:
+                due = max(due, pending[1])
+                pending[0] += 1
+                pending[1] = due
+
+            task = (due, next(self.counter), key, func, args)
+            heapq.heappush(self.heap, task)
+
+            # the dispatcher only needs waking up when the new task is due before everything else
+            if self.heap[0] is task:
+                self.condition.notify()
+
+    def dispatch(self, key, func, args):
+        self.queues[hash(key) % len(self.queues)].put((func, args))
+
+    def delayed(self):
+        return len(self.heap)
+
+    def queued(self):
+        return sum(tasks.qsize() for tasks in self.queues)
+
+    def depth(self):
+        return self.delayed() + self.queued()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while len(self.heap) == 0:
+                    self.condition.wait()
+
+                remaining = self.heap[0][0] - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+
+                _, _, key, func, args = heapq.heappop(self.heap)
+                pending = self.keys[key]
+                pending[0] -= 1
+                if pending[0] == 0:
+                    del self.keys[key]
+
+                # under the lock, so a call scheduled without a delay right now cannot get to the worker first
+                self.dispatch(key, func, args)
+
+    def work(self, tasks):
+        while True:
+            func, args = tasks.get()
+
+            try:
+                func(*args)
+            except Exception as error:
+                print(f'Scheduled call {func.__name__} failed: {error}')
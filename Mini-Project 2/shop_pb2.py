@@ -13,7 +13,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nshop.proto\"\x14\n\x12\x43reateChainRequest\"+\n\x13\x43reateChainResponse\x12\x14\n\x0cprocess_list\x18\x01 \x03(\t\"J\n\x0bLinkRequest\x12\x0c\n\x04head\x18\x01 \x01(\t\x12\x0c\n\x04tail\x18\x02 \x01(\t\x12\x1f\n\x0b\x63hain_nodes\x18\x03 \x03(\x0b\x32\n.ChainNode\"M\n\tChainNode\x12\x12\n\nprocess_id\x18\x01 \x01(\t\x12\x14\n\x0csuccessor_id\x18\x02 \x01(\t\x12\x16\n\x0epredecessor_id\x18\x03 \x01(\t\"\x0e\n\x0cLinkResponse\"\x12\n\x10ListChainRequest\"4\n\x11ListChainResponse\x12\x1f\n\x0b\x63hain_nodes\x18\x01 \x03(\x0b\x32\n.ChainNode\"#\n\x04\x42ook\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\r\n\x05price\x18\x02 \x01(\x01\"\x12\n\x10ListBooksRequest\")\n\x11ListBooksResponse\x12\x14\n\x05\x62ooks\x18\x01 \x03(\x0b\x32\x05.Book\"\x1b\n\x0bReadRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\"#\n\x0cReadResponse\x12\x13\n\x04\x62ook\x18\x01 \x01(\x0b\x32\x05.Book\"?\n\x0cWriteRequest\x12\x12\n\nprocess_id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\r\n\x05price\x18\x03 \x01(\x01\"\x0f\n\rWriteResponse\"7\n\x0c\x43leanRequest\x12\x12\n\nprocess_id\x18\x01 \x01(\t\x12\x13\n\x04\x62ook\x18\x02 \x01(\x0b\x32\x05.Book\"\x0f\n\rCleanResponse\"$\n\x11SetTimeoutRequest\x12\x0f\n\x07timeout\x18\x01 \x01(\x05\"\x14\n\x12SetTimeoutResponse\"%\n\x11RemoveHeadRequest\x12\x10\n\x08new_head\x18\x01 \x01(\t\"\x14\n\x12RemoveHeadResponse2\xd2\x03\n\x14\x44istributedBookstore\x12:\n\x0b\x43reateChain\x12\x13.CreateChainRequest\x1a\x14.CreateChainResponse\"\x00\x12%\n\x04Link\x12\x0c.LinkRequest\x1a\r.LinkResponse\"\x00\x12\x34\n\tListChain\x12\x11.ListChainRequest\x1a\x12.ListChainResponse\"\x00\x12\x34\n\tListBooks\x12\x11.ListBooksRequest\x1a\x12.ListBooksResponse\"\x00\x12%\n\x04Read\x12\x0c.ReadRequest\x1a\r.ReadResponse\"\x00\x12(\n\x05Write\x12\r.WriteRequest\x1a\x0e.WriteResponse\"\x00\x12(\n\x05\x43lean\x12\r.CleanRequest\x1a\x0e.CleanResponse\"\x00\x12\x37\n\nSetTimeout\x12\x12.SetTimeoutRequest\x1a\x13.SetTimeoutResponse\"\x00\x12\x37\n\nRemoveHead\x12\x12.RemoveHeadRequest\x1a\x13.RemoveHeadResponse\"\x00\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nshop.proto\"\x14\n\x12\x43reateChainRequest\"J\n\x13\x43reateChainResponse\x12\x14\n\x0cprocess_list\x18\x01 \x03(\t\x12\x1d\n\tprocesses\x18\x02 \x03(\x0b\x32\n.ProcessId\"(\n\tProcessId\x12\x0c\n\x04node\x18\x01 \x01(\r\x12\r\n\x05index\x18\x02 \x01(\r\"x\n\x0bLinkRequest\x12\x0c\n\x04head\x18\x01 \x01(\t\x12\x0c\n\x04tail\x18\x02 \x01(\t\x12\x1f\n\x0b\x63hain_nodes\x18\x03 \x03(\x0b\x32\n.ChainNode\x12\r\n\x05shard\x18\x04 \x01(\r\x12\x0e\n\x06shards\x18\x05 \x01(\r\x12\r\n\x05\x65poch\x18\x06 \x01(\x04\"\xa8\x01\n\tChainNode\x12\x12\n\nprocess_id\x18\x01 \x01(\t\x12\x14\n\x0csuccessor_id\x18\x02 \x01(\t\x12\x16\n\x0epredecessor_id\x18\x03 \x01(\t\x12\x10\n\x08last_seq\x18\x04 \x01(\x04\x12\x11\n\tclean_seq\x18\x05 \x01(\x04\x12\r\n\x05shard\x18\x06 \x01(\r\x12\x16\n\x02id\x18\x07 \x01(\x0b\x32\n.ProcessId\x12\r\n\x05\x65poch\x18\x08 \x01(\x04\"\x0e\n\x0cLinkResponse\"\x12\n\x10ListChainRequest\"4\n\x11ListChainResponse\x12\x1f\n\x0b\x63hain_nodes\x18\x01 \x03(\x0b\x32\n.ChainNode\"0\n\x04\x42ook\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\r\n\x05price\x18\x02 \x01(\x01\x12\x0b\n\x03seq\x18\x03 \x01(\x04\"!\n\x10ListBooksRequest\x12\r\n\x05shard\x18\x01 \x01(\r\"H\n\x14ListBooksPageRequest\x12\x11\n\tpage_size\x18\x01 \x01(\r\x12\x0e\n\x06\x63ursor\x18\x02 \x01(\x04\x12\r\n\x05shard\x18\x03 \x01(\r\"9\n\x11ListBooksResponse\x12\x14\n\x05\x62ooks\x18\x01 \x03(\x0b\x32\x05.Book\x12\x0e\n\x06\x63ursor\x18\x02 \x01(\x04\"\x1b\n\x0bReadRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\"#\n\x0cReadResponse\x12\x13\n\x04\x62ook\x18\x01 \x01(\x0b\x32\x05.Book\"0\n\x10MultiReadRequest\x12\r\n\x05names\x18\x01 \x03(\t\x12\r\n\x05shard\x18\x02 \x01(\r\")\n\x11MultiReadResponse\x12\x14\n\x05\x62ooks\x18\x01 \x03(\x0b\x32\x05.Book\"[\n\rPrefixRequest\x12\x0e\n\x06prefix\x18\x01 \x01(\t\x12\r\n\x05limit\x18\x02 \x01(\r\x12\r\n\x05shard\x18\x03 \x01(\r\x12\x12\n\x05\x61\x66ter\x18\x04 \x01(\tH\x00\x88\x01\x01\x42\x08\n\x06_after\"\x80\x01\n\x11PriceRangeRequest\x12\x11\n\tmin_price\x18\x01 \x01(\x01\x12\x16\n\tmax_price\x18\x02 \x01(\x01H\x00\x88\x01\x01\x12\r\n\x05limit\x18\x03 \x01(\r\x12\r\n\x05shard\x18\x04 \x01(\r\x12\x14\n\x05\x61\x66ter\x18\x05 \x01(\x0b\x32\x05.BookB\x0c\n\n_max_price\"%\n\rQueryResponse\x12\x14\n\x05\x62ooks\x18\x01 \x03(\x0b\x32\x05.Book\".\n\x0eVersionRequest\x12\r\n\x05names\x18\x01 \x03(\t\x12\r\n\x05shard\x18\x02 \x01(\r\"#\n\x0fVersionResponse\x12\x10\n\x08versions\x18\x01 \x03(\x04\"L\n\x0cWriteRequest\x12\x12\n\nprocess_id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\r\n\x05price\x18\x03 \x01(\x01\x12\x0b\n\x03seq\x18\x04 \x01(\x04\"\x0f\n\rWriteResponse\"5\n\x0c\x43leanRequest\x12\x12\n\nprocess_id\x18\x01 \x01(\t\x12\x0b\n\x03seq\x18\x03 \x01(\x04J\x04\x08\x02\x10\x03\"\x0f\n\rCleanResponse\"=\n\x11WriteBatchRequest\x12\x12\n\nprocess_id\x18\x01 \x01(\t\x12\x14\n\x05\x62ooks\x18\x02 \x03(\x0b\x32\x05.Book\"\x14\n\x12WriteBatchResponse\":\n\x11\x43leanBatchRequest\x12\x12\n\nprocess_id\x18\x01 \x01(\t\x12\x0b\n\x03seq\x18\x03 \x01(\x04J\x04\x08\x02\x10\x03\"\x14\n\x12\x43leanBatchResponse\"$\n\x11SetTimeoutRequest\x12\x0f\n\x07timeout\x18\x01 \x01(\x05\"\x14\n\x12SetTimeoutResponse\"C\n\x11RemoveHeadRequest\x12\x10\n\x08new_head\x18\x01 \x01(\t\x12\r\n\x05shard\x18\x02 \x01(\r\x12\r\n\x05\x65poch\x18\x03 \x01(\x04\"\x14\n\x12RemoveHeadResponse\"\x0e\n\x0cStatsRequest\"D\n\tHistogram\x12\x0b\n\x03rpc\x18\x01 \x01(\t\x12\x0e\n\x06\x63ounts\x18\x02 \x03(\x04\x12\r\n\x05\x63ount\x18\x03 \x01(\x04\x12\x0b\n\x03sum\x18\x04 \x01(\x01\"\x7f\n\x0cProcessStats\x12\x12\n\nprocess_id\x18\x01 \x01(\t\x12\r\n\x05\x64irty\x18\x02 \x01(\x04\x12\x18\n\x10oldest_dirty_age\x18\x03 \x01(\x01\x12\x10\n\x08last_seq\x18\x04 \x01(\x04\x12\x11\n\tclean_seq\x18\x05 \x01(\x04\x12\r\n\x05shard\x18\x06 \x01(\r\"0\n\tPeerStats\x12\x0f\n\x07\x61\x64\x64ress\x18\x01 \x01(\t\x12\x12\n\nbytes_sent\x18\x02 \x01(\x04\"\xdc\x01\n\rStatsResponse\x12\x0f\n\x07node_id\x18\x01 \x01(\x05\x12\x1d\n\tlatencies\x18\x02 \x03(\x0b\x32\n.Histogram\x12 \n\tprocesses\x18\x03 \x03(\x0b\x32\r.ProcessStats\x12\x0f\n\x07\x64\x65layed\x18\x04 \x01(\x04\x12\x0e\n\x06queued\x18\x05 \x01(\x04\x12\x0f\n\x07sending\x18\x06 \x01(\x04\x12\x19\n\x05peers\x18\x07 \x03(\x0b\x32\n.PeerStats\x12\x1a\n\x05\x63\x61\x63he\x18\x08 \x01(\x0b\x32\x0b.CacheStats\x12\x10\n\x08rejected\x18\t \x01(\x04\"u\n\nCacheStats\x12\x0c\n\x04hits\x18\x01 \x01(\x04\x12\x0e\n\x06misses\x18\x02 \x01(\x04\x12\x11\n\tcoalesced\x18\x03 \x01(\x04\x12\x15\n\rinvalidations\x18\x04 \x01(\x04\x12\x11\n\tevictions\x18\x05 \x01(\x04\x12\x0c\n\x04size\x18\x06 \x01(\x04\"\"\n\x10HeartbeatRequest\x12\x0e\n\x06\x65pochs\x18\x01 \x03(\x04\"1\n\x11HeartbeatResponse\x12\x1c\n\x06\x63hains\x18\x01 \x03(\x0b\x32\x0c.LinkRequest\"2\n\rAttachRequest\x12\x12\n\nprocess_id\x18\x01 \x01(\t\x12\r\n\x05\x61\x66ter\x18\x02 \x01(\t\"1\n\x0e\x41ttachResponse\x12\r\n\x05\x62ooks\x18\x01 \x01(\x04\x12\x10\n\x08last_seq\x18\x02 \x01(\x04\"H\n\x0fTransferRequest\x12\x12\n\nprocess_id\x18\x01 \x01(\t\x12\x0e\n\x06joiner\x18\x02 \x01(\t\x12\x11\n\tpage_size\x18\x03 \x01(\r\"Y\n\rTransferChunk\x12\x14\n\x05\x62ooks\x18\x01 \x03(\x0b\x32\x05.Book\x12\r\n\x05\x64irty\x18\x02 \x01(\x08\x12\x11\n\tclean_seq\x18\x03 \x01(\x04\x12\x10\n\x08last_seq\x18\x04 \x01(\x04\",\n\x0e\x43ommitResponse\x12\r\n\x05\x62\x61tch\x18\x01 \x01(\x04\x12\x0b\n\x03seq\x18\x02 \x01(\x04\x32\x82\t\n\x14\x44istributedBookstore\x12:\n\x0b\x43reateChain\x12\x13.CreateChainRequest\x1a\x14.CreateChainResponse\"\x00\x12%\n\x04Link\x12\x0c.LinkRequest\x1a\r.LinkResponse\"\x00\x12\x34\n\tListChain\x12\x11.ListChainRequest\x1a\x12.ListChainResponse\"\x00\x12\x34\n\tListBooks\x12\x11.ListBooksRequest\x1a\x12.ListBooksResponse\"\x00\x12@\n\x0fListBooksStream\x12\x15.ListBooksPageRequest\x1a\x12.ListBooksResponse\"\x00\x30\x01\x12%\n\x04Read\x12\x0c.ReadRequest\x1a\r.ReadResponse\"\x00\x12\x34\n\tMultiRead\x12\x11.MultiReadRequest\x1a\x12.MultiReadResponse\"\x00\x12\x30\n\x0c\x46indByPrefix\x12\x0e.PrefixRequest\x1a\x0e.QueryResponse\"\x00\x12\x33\n\x0b\x46indByPrice\x12\x12.PriceRangeRequest\x1a\x0e.QueryResponse\"\x00\x12.\n\x07Version\x12\x0f.VersionRequest\x1a\x10.VersionResponse\"\x00\x12(\n\x05Write\x12\r.WriteRequest\x1a\x0e.WriteResponse\"\x00\x12(\n\x05\x43lean\x12\r.CleanRequest\x1a\x0e.CleanResponse\"\x00\x12\x37\n\nWriteBatch\x12\x12.WriteBatchRequest\x1a\x13.WriteBatchResponse\"\x00\x12\x37\n\nCleanBatch\x12\x12.CleanBatchRequest\x1a\x13.CleanBatchResponse\"\x00\x12\x39\n\tReplicate\x12\x12.WriteBatchRequest\x1a\x12.CleanBatchRequest\"\x00(\x01\x30\x01\x12\x37\n\nSetTimeout\x12\x12.SetTimeoutRequest\x1a\x13.SetTimeoutResponse\"\x00\x12\x37\n\nRemoveHead\x12\x12.RemoveHeadRequest\x1a\x13.RemoveHeadResponse\"\x00\x12(\n\x05Stats\x12\r.StatsRequest\x1a\x0e.StatsResponse\"\x00\x12\x34\n\tHeartbeat\x12\x11.HeartbeatRequest\x1a\x12.HeartbeatResponse\"\x00\x12+\n\x06\x41ttach\x12\x0e.AttachRequest\x1a\x0f.AttachResponse\"\x00\x12\x30\n\x08Transfer\x12\x10.TransferRequest\x1a\x0e.TransferChunk\"\x00\x30\x01\x12\x33\n\x06\x43ommit\x12\x12.WriteBatchRequest\x1a\x0f.CommitResponse\"\x00(\x01\x30\x01\x62\x06proto3')
 
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'shop_pb2', globals())
@@ -23,43 +23,95 @@ if _descriptor._USE_C_DESCRIPTORS == False:
   _CREATECHAINREQUEST._serialized_start=14
   _CREATECHAINREQUEST._serialized_end=34
   _CREATECHAINRESPONSE._serialized_start=36
-  _CREATECHAINRESPONSE._serialized_end=79
-  _LINKREQUEST._serialized_start=81
-  _LINKREQUEST._serialized_end=155
-  _CHAINNODE._serialized_start=157
-  _CHAINNODE._serialized_end=234
-  _LINKRESPONSE._serialized_start=236
-  _LINKRESPONSE._serialized_end=250
-  _LISTCHAINREQUEST._serialized_start=252
-  _LISTCHAINREQUEST._serialized_end=270
-  _LISTCHAINRESPONSE._serialized_start=272
-  _LISTCHAINRESPONSE._serialized_end=324
-  _BOOK._serialized_start=326
-  _BOOK._serialized_end=361
-  _LISTBOOKSREQUEST._serialized_start=363
-  _LISTBOOKSREQUEST._serialized_end=381
-  _LISTBOOKSRESPONSE._serialized_start=383
-  _LISTBOOKSRESPONSE._serialized_end=424
-  _READREQUEST._serialized_start=426
-  _READREQUEST._serialized_end=453
-  _READRESPONSE._serialized_start=455
-  _READRESPONSE._serialized_end=490
-  _WRITEREQUEST._serialized_start=492
-  _WRITEREQUEST._serialized_end=555
-  _WRITERESPONSE._serialized_start=557
-  _WRITERESPONSE._serialized_end=572
-  _CLEANREQUEST._serialized_start=574
-  _CLEANREQUEST._serialized_end=629
-  _CLEANRESPONSE._serialized_start=631
-  _CLEANRESPONSE._serialized_end=646
-  _SETTIMEOUTREQUEST._serialized_start=648
-  _SETTIMEOUTREQUEST._serialized_end=684
-  _SETTIMEOUTRESPONSE._serialized_start=686
-  _SETTIMEOUTRESPONSE._serialized_end=706
-  _REMOVEHEADREQUEST._serialized_start=708
-  _REMOVEHEADREQUEST._serialized_end=745
-  _REMOVEHEADRESPONSE._serialized_start=747
-  _REMOVEHEADRESPONSE._serialized_end=767
-  _DISTRIBUTEDBOOKSTORE._serialized_start=770
-  _DISTRIBUTEDBOOKSTORE._serialized_end=1236
+  _CREATECHAINRESPONSE._serialized_end=110
+  _PROCESSID._serialized_start=112
+  _PROCESSID._serialized_end=152
+  _LINKREQUEST._serialized_start=154
+  _LINKREQUEST._serialized_end=274
+  _CHAINNODE._serialized_start=277
+  _CHAINNODE._serialized_end=445
+  _LINKRESPONSE._serialized_start=447
+  _LINKRESPONSE._serialized_end=461
+  _LISTCHAINREQUEST._serialized_start=463
+  _LISTCHAINREQUEST._serialized_end=481
+  _LISTCHAINRESPONSE._serialized_start=483
+  _LISTCHAINRESPONSE._serialized_end=535
+  _BOOK._serialized_start=537
+  _BOOK._serialized_end=585
+  _LISTBOOKSREQUEST._serialized_start=587
+  _LISTBOOKSREQUEST._serialized_end=620
+  _LISTBOOKSPAGEREQUEST._serialized_start=622
+  _LISTBOOKSPAGEREQUEST._serialized_end=694
+  _LISTBOOKSRESPONSE._serialized_start=696
+  _LISTBOOKSRESPONSE._serialized_end=753
+  _READREQUEST._serialized_start=755
+  _READREQUEST._serialized_end=782
+  _READRESPONSE._serialized_start=784
+  _READRESPONSE._serialized_end=819
+  _MULTIREADREQUEST._serialized_start=821
+  _MULTIREADREQUEST._serialized_end=869
+  _MULTIREADRESPONSE._serialized_start=871
+  _MULTIREADRESPONSE._serialized_end=912
+  _PREFIXREQUEST._serialized_start=914
+  _PREFIXREQUEST._serialized_end=1005
+  _PRICERANGEREQUEST._serialized_start=1008
+  _PRICERANGEREQUEST._serialized_end=1136
+  _QUERYRESPONSE._serialized_start=1138
+  _QUERYRESPONSE._serialized_end=1175
+  _VERSIONREQUEST._serialized_start=1177
+  _VERSIONREQUEST._serialized_end=1223
+  _VERSIONRESPONSE._serialized_start=1225
+  _VERSIONRESPONSE._serialized_end=1260
+  _WRITEREQUEST._serialized_start=1262
+  _WRITEREQUEST._serialized_end=1338
+  _WRITERESPONSE._serialized_start=1340
+  _WRITERESPONSE._serialized_end=1355
+  _CLEANREQUEST._serialized_start=1357
+  _CLEANREQUEST._serialized_end=1410
+  _CLEANRESPONSE._serialized_start=1412
+  _CLEANRESPONSE._serialized_end=1427
+  _WRITEBATCHREQUEST._serialized_start=1429
+  _WRITEBATCHREQUEST._serialized_end=1490
+  _WRITEBATCHRESPONSE._serialized_start=1492
+  _WRITEBATCHRESPONSE._serialized_end=1512
+  _CLEANBATCHREQUEST._serialized_start=1514
+  _CLEANBATCHREQUEST._serialized_end=1572
+  _CLEANBATCHRESPONSE._serialized_start=1574
+  _CLEANBATCHRESPONSE._serialized_end=1594
+  _SETTIMEOUTREQUEST._serialized_start=1596
+  _SETTIMEOUTREQUEST._serialized_end=1632
+  _SETTIMEOUTRESPONSE._serialized_start=1634
+  _SETTIMEOUTRESPONSE._serialized_end=1654
+  _REMOVEHEADREQUEST._serialized_start=1656
+  _REMOVEHEADREQUEST._serialized_end=1723
+  _REMOVEHEADRESPONSE._serialized_start=1725
+  _REMOVEHEADRESPONSE._serialized_end=1745
+  _STATSREQUEST._serialized_start=1747
+  _STATSREQUEST._serialized_end=1761
+  _HISTOGRAM._serialized_start=1763
+  _HISTOGRAM._serialized_end=1831
+  _PROCESSSTATS._serialized_start=1833
+  _PROCESSSTATS._serialized_end=1960
+  _PEERSTATS._serialized_start=1962
+  _PEERSTATS._serialized_end=2010
+  _STATSRESPONSE._serialized_start=2013
+  _STATSRESPONSE._serialized_end=2233
+  _CACHESTATS._serialized_start=2235
+  _CACHESTATS._serialized_end=2352
+  _HEARTBEATREQUEST._serialized_start=2354
+  _HEARTBEATREQUEST._serialized_end=2388
+  _HEARTBEATRESPONSE._serialized_start=2390
+  _HEARTBEATRESPONSE._serialized_end=2439
+  _ATTACHREQUEST._serialized_start=2441
+  _ATTACHREQUEST._serialized_end=2491
+  _ATTACHRESPONSE._serialized_start=2493
+  _ATTACHRESPONSE._serialized_end=2542
+  _TRANSFERREQUEST._serialized_start=2544
+  _TRANSFERREQUEST._serialized_end=2616
+  _TRANSFERCHUNK._serialized_start=2618
+  _TRANSFERCHUNK._serialized_end=2707
+  _COMMITRESPONSE._serialized_start=2709
+  _COMMITRESPONSE._serialized_end=2753
+  _DISTRIBUTEDBOOKSTORE._serialized_start=2756
+  _DISTRIBUTEDBOOKSTORE._serialized_end=3910
 # @@protoc_insertion_point(module_scope)
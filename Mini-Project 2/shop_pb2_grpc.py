@@ -34,11 +34,21 @@ class DistributedBookstoreStub(object):
                 request_serializer=shop__pb2.ListBooksRequest.SerializeToString,
                 response_deserializer=shop__pb2.ListBooksResponse.FromString,
                 )
+        self.ListBooksStream = channel.unary_stream(
+                '/DistributedBookstore/ListBooksStream',
+                request_serializer=shop__pb2.ListBooksPageRequest.SerializeToString,
+                response_deserializer=shop__pb2.ListBooksResponse.FromString,
+                )
         self.Read = channel.unary_unary(
                 '/DistributedBookstore/Read',
                 request_serializer=shop__pb2.ReadRequest.SerializeToString,
                 response_deserializer=shop__pb2.ReadResponse.FromString,
                 )
+        self.Version = channel.unary_unary(
+                '/DistributedBookstore/Version',
+                request_serializer=shop__pb2.VersionRequest.SerializeToString,
+                response_deserializer=shop__pb2.VersionResponse.FromString,
+                )
         self.Write = channel.unary_unary(
                 '/DistributedBookstore/Write',
                 request_serializer=shop__pb2.WriteRequest.SerializeToString,
@@ -49,6 +59,21 @@ class DistributedBookstoreStub(object):
                 request_serializer=shop__pb2.CleanRequest.SerializeToString,
                 response_deserializer=shop__pb2.CleanResponse.FromString,
                 )
+        self.WriteBatch = channel.unary_unary(
+                '/DistributedBookstore/WriteBatch',
+                request_serializer=shop__pb2.WriteBatchRequest.SerializeToString,
+                response_deserializer=shop__pb2.WriteBatchResponse.FromString,
+                )
+        self.CleanBatch = channel.unary_unary(
+                '/DistributedBookstore/CleanBatch',
+                request_serializer=shop__pb2.CleanBatchRequest.SerializeToString,
+                response_deserializer=shop__pb2.CleanBatchResponse.FromString,
+                )
+        self.Replicate = channel.stream_stream(
+                '/DistributedBookstore/Replicate',
+                request_serializer=shop__pb2.WriteBatchRequest.SerializeToString,
+                response_deserializer=shop__pb2.CleanBatchRequest.FromString,
+                )
         self.SetTimeout = channel.unary_unary(
                 '/DistributedBookstore/SetTimeout',
                 request_serializer=shop__pb2.SetTimeoutRequest.SerializeToString,
@@ -59,6 +84,46 @@ class DistributedBookstoreStub(object):
                 request_serializer=shop__pb2.RemoveHeadRequest.SerializeToString,
                 response_deserializer=shop__pb2.RemoveHeadResponse.FromString,
                 )
+        self.Stats = channel.unary_unary(
+                '/DistributedBookstore/Stats',
+                request_serializer=shop__pb2.StatsRequest.SerializeToString,
+                response_deserializer=shop__pb2.StatsResponse.FromString,
+                )
+        self.Heartbeat = channel.unary_unary(
+                '/DistributedBookstore/Heartbeat',
+                request_serializer=shop__pb2.HeartbeatRequest.SerializeToString,
+                response_deserializer=shop__pb2.HeartbeatResponse.FromString,
+                )
+        self.Attach = channel.unary_unary(
+                '/DistributedBookstore/Attach',
+                request_serializer=shop__pb2.AttachRequest.SerializeToString,
+                response_deserializer=shop__pb2.AttachResponse.FromString,
+                )
+        self.Transfer = channel.unary_stream(
+                '/DistributedBookstore/Transfer',
+                request_serializer=shop__pb2.TransferRequest.SerializeToString,
+                response_deserializer=shop__pb2.TransferChunk.FromString,
+                )
+        self.Commit = channel.stream_stream(
+                '/DistributedBookstore/Commit',
+                request_serializer=shop__pb2.WriteBatchRequest.SerializeToString,
+                response_deserializer=shop__pb2.CommitResponse.FromString,
+                )
+        self.MultiRead = channel.unary_unary(
+                '/DistributedBookstore/MultiRead',
+                request_serializer=shop__pb2.MultiReadRequest.SerializeToString,
+                response_deserializer=shop__pb2.MultiReadResponse.FromString,
+                )
+        self.FindByPrefix = channel.unary_unary(
+                '/DistributedBookstore/FindByPrefix',
+                request_serializer=shop__pb2.PrefixRequest.SerializeToString,
+                response_deserializer=shop__pb2.QueryResponse.FromString,
+                )
+        self.FindByPrice = channel.unary_unary(
+                '/DistributedBookstore/FindByPrice',
+                request_serializer=shop__pb2.PriceRangeRequest.SerializeToString,
+                response_deserializer=shop__pb2.QueryResponse.FromString,
+                )
 
 
 class DistributedBookstoreServicer(object):
@@ -88,12 +153,24 @@ class DistributedBookstoreServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ListBooksStream(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def Read(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def Version(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def Write(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -106,6 +183,24 @@ class DistributedBookstoreServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def WriteBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def CleanBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Replicate(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def SetTimeout(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -118,6 +213,54 @@ class DistributedBookstoreServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def Stats(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Heartbeat(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Attach(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Transfer(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Commit(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def MultiRead(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def FindByPrefix(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def FindByPrice(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_DistributedBookstoreServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -141,11 +284,21 @@ def add_DistributedBookstoreServicer_to_server(servicer, server):
                     request_deserializer=shop__pb2.ListBooksRequest.FromString,
                     response_serializer=shop__pb2.ListBooksResponse.SerializeToString,
             ),
+            'ListBooksStream': grpc.unary_stream_rpc_method_handler(
+                    servicer.ListBooksStream,
+                    request_deserializer=shop__pb2.ListBooksPageRequest.FromString,
+                    response_serializer=shop__pb2.ListBooksResponse.SerializeToString,
+            ),
             'Read': grpc.unary_unary_rpc_method_handler(
                     servicer.Read,
                     request_deserializer=shop__pb2.ReadRequest.FromString,
                     response_serializer=shop__pb2.ReadResponse.SerializeToString,
             ),
+            'Version': grpc.unary_unary_rpc_method_handler(
+                    servicer.Version,
+                    request_deserializer=shop__pb2.VersionRequest.FromString,
+                    response_serializer=shop__pb2.VersionResponse.SerializeToString,
+            ),
             'Write': grpc.unary_unary_rpc_method_handler(
                     servicer.Write,
                     request_deserializer=shop__pb2.WriteRequest.FromString,
@@ -156,6 +309,21 @@ def add_DistributedBookstoreServicer_to_server(servicer, server):
                     request_deserializer=shop__pb2.CleanRequest.FromString,
                     response_serializer=shop__pb2.CleanResponse.SerializeToString,
             ),
+            'WriteBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.WriteBatch,
+                    request_deserializer=shop__pb2.WriteBatchRequest.FromString,
+                    response_serializer=shop__pb2.WriteBatchResponse.SerializeToString,
+            ),
+            'CleanBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.CleanBatch,
+                    request_deserializer=shop__pb2.CleanBatchRequest.FromString,
+                    response_serializer=shop__pb2.CleanBatchResponse.SerializeToString,
+            ),
+            'Replicate': grpc.stream_stream_rpc_method_handler(
+                    servicer.Replicate,
+                    request_deserializer=shop__pb2.WriteBatchRequest.FromString,
+                    response_serializer=shop__pb2.CleanBatchRequest.SerializeToString,
+            ),
             'SetTimeout': grpc.unary_unary_rpc_method_handler(
                     servicer.SetTimeout,
                     request_deserializer=shop__pb2.SetTimeoutRequest.FromString,
@@ -166,6 +334,46 @@ def add_DistributedBookstoreServicer_to_server(servicer, server):
                     request_deserializer=shop__pb2.RemoveHeadRequest.FromString,
                     response_serializer=shop__pb2.RemoveHeadResponse.SerializeToString,
             ),
+            'Stats': grpc.unary_unary_rpc_method_handler(
+                    servicer.Stats,
+                    request_deserializer=shop__pb2.StatsRequest.FromString,
+                    response_serializer=shop__pb2.StatsResponse.SerializeToString,
+            ),
+            'Heartbeat': grpc.unary_unary_rpc_method_handler(
+                    servicer.Heartbeat,
+                    request_deserializer=shop__pb2.HeartbeatRequest.FromString,
+                    response_serializer=shop__pb2.HeartbeatResponse.SerializeToString,
+            ),
+            'Attach': grpc.unary_unary_rpc_method_handler(
+                    servicer.Attach,
+                    request_deserializer=shop__pb2.AttachRequest.FromString,
+                    response_serializer=shop__pb2.AttachResponse.SerializeToString,
+            ),
+            'Transfer': grpc.unary_stream_rpc_method_handler(
+                    servicer.Transfer,
+                    request_deserializer=shop__pb2.TransferRequest.FromString,
+                    response_serializer=shop__pb2.TransferChunk.SerializeToString,
+            ),
+            'Commit': grpc.stream_stream_rpc_method_handler(
+                    servicer.Commit,
+                    request_deserializer=shop__pb2.WriteBatchRequest.FromString,
+                    response_serializer=shop__pb2.CommitResponse.SerializeToString,
+            ),
+            'MultiRead': grpc.unary_unary_rpc_method_handler(
+                    servicer.MultiRead,
+                    request_deserializer=shop__pb2.MultiReadRequest.FromString,
+                    response_serializer=shop__pb2.MultiReadResponse.SerializeToString,
+            ),
+            'FindByPrefix': grpc.unary_unary_rpc_method_handler(
+                    servicer.FindByPrefix,
+                    request_deserializer=shop__pb2.PrefixRequest.FromString,
+                    response_serializer=shop__pb2.QueryResponse.SerializeToString,
+            ),
+            'FindByPrice': grpc.unary_unary_rpc_method_handler(
+                    servicer.FindByPrice,
+                    request_deserializer=shop__pb2.PriceRangeRequest.FromString,
+                    response_serializer=shop__pb2.QueryResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'DistributedBookstore', rpc_method_handlers)
@@ -244,6 +452,23 @@ class DistributedBookstore(object):
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
 
+    @staticmethod
+    def ListBooksStream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/DistributedBookstore/ListBooksStream',
+            shop__pb2.ListBooksPageRequest.SerializeToString,
+            shop__pb2.ListBooksResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
     @staticmethod
     def Read(request,
             target,
@@ -261,6 +486,23 @@ class DistributedBookstore(object):
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
 
+    @staticmethod
+    def Version(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/DistributedBookstore/Version',
+            shop__pb2.VersionRequest.SerializeToString,
+            shop__pb2.VersionResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
     @staticmethod
     def Write(request,
             target,
@@ -295,6 +537,57 @@ class DistributedBookstore(object):
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
 
+    @staticmethod
+    def WriteBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/DistributedBookstore/WriteBatch',
+            shop__pb2.WriteBatchRequest.SerializeToString,
+            shop__pb2.WriteBatchResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def CleanBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/DistributedBookstore/CleanBatch',
+            shop__pb2.CleanBatchRequest.SerializeToString,
+            shop__pb2.CleanBatchResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def Replicate(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(request_iterator, target, '/DistributedBookstore/Replicate',
+            shop__pb2.WriteBatchRequest.SerializeToString,
+            shop__pb2.CleanBatchRequest.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
     @staticmethod
     def SetTimeout(request,
             target,
@@ -328,3 +621,139 @@ class DistributedBookstore(object):
             shop__pb2.RemoveHeadResponse.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def Stats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/DistributedBookstore/Stats',
+            shop__pb2.StatsRequest.SerializeToString,
+            shop__pb2.StatsResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def Heartbeat(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/DistributedBookstore/Heartbeat',
+            shop__pb2.HeartbeatRequest.SerializeToString,
+            shop__pb2.HeartbeatResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def Attach(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/DistributedBookstore/Attach',
+            shop__pb2.AttachRequest.SerializeToString,
+            shop__pb2.AttachResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def Transfer(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/DistributedBookstore/Transfer',
+            shop__pb2.TransferRequest.SerializeToString,
+            shop__pb2.TransferChunk.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def Commit(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(request_iterator, target, '/DistributedBookstore/Commit',
+            shop__pb2.WriteBatchRequest.SerializeToString,
+            shop__pb2.CommitResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def MultiRead(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/DistributedBookstore/MultiRead',
+            shop__pb2.MultiReadRequest.SerializeToString,
+            shop__pb2.MultiReadResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def FindByPrefix(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/DistributedBookstore/FindByPrefix',
+            shop__pb2.PrefixRequest.SerializeToString,
+            shop__pb2.QueryResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def FindByPrice(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/DistributedBookstore/FindByPrice',
+            shop__pb2.PriceRangeRequest.SerializeToString,
+            shop__pb2.QueryResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
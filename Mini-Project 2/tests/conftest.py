@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the modules are flat next to the tests' folder, the way node.py runs them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,62 @@
+import threading
+import time
+
+import grpc
+
+from batching import Batcher
+
+
+def wait(predicate, timeout=5):
+    end = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.01)
+
+    return True
+
+
+class Failing(grpc.RpcError):
+    def code(self):
+        return grpc.StatusCode.UNAVAILABLE
+
+
+def test_batcher_retries_failed_batches_in_order():
+    sent = []
+    failures = [2]
+    lock = threading.Lock()
+
+    def send(target, batch):
+        with lock:
+            if len(sent) == 1 and failures[0] > 0:
+                failures[0] -= 1
+                raise Failing()
+            sent.append(list(batch))
+
+    batcher = Batcher(send, max_size=2, retry_delay=0.01)
+    for i in range(6):
+        batcher.add('Node2-ps1', [i])
+
+    assert wait(lambda: sum(map(len, sent)) == 6)
+    assert [item for batch in sent for item in batch] == list(range(6))
+    assert failures == [0]
+
+
+def test_batcher_stops_retrying_dropped_targets():
+    attempts = []
+
+    def send(target, batch):
+        attempts.append(batch)
+        raise Failing()
+
+    batcher = Batcher(send, retry_delay=0.01)
+    batcher.add('Node2-ps1', [1])
+    assert wait(lambda: len(attempts) > 0)
+
+    batcher.keep(set())
+    time.sleep(0.05)
+    count = len(attempts)
+    time.sleep(0.05)
+
+    assert len(attempts) == count
+    assert batcher.pending() == 0
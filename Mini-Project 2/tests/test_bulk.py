@@ -0,0 +1,37 @@
+import pytest
+
+from bulk import read_books
+
+
+def books(path):
+    return [(book.name, book.price) for book in read_books(str(path))]
+
+
+def test_csv_with_a_header(tmp_path):
+    path = tmp_path / 'books.csv'
+    path.write_text('name,price\nDune,9.5\n\n"Pride, and Prejudice",3\n')
+
+    assert books(path) == [('Dune', 9.5), ('Pride, and Prejudice', 3.0)]
+
+
+def test_csv_without_a_header(tmp_path):
+    path = tmp_path / 'books.CSV'
+    path.write_text('Dune,9.5\nname,1\n')
+
+    # only a first row can be the header
+    assert books(path) == [('Dune', 9.5), ('name', 1.0)]
+
+
+def test_jsonl(tmp_path):
+    path = tmp_path / 'books.jsonl'
+    path.write_text('{"name": "Dune", "price": 9.5}\n\n{"name": "Emma", "price": "4"}\n')
+
+    assert books(path) == [('Dune', 9.5), ('Emma', 4.0)]
+
+
+def test_other_files_are_refused(tmp_path):
+    path = tmp_path / 'books.txt'
+    path.write_text('Dune,9.5\n')
+
+    with pytest.raises(ValueError):
+        books(path)
@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from cache import ReadCache
+
+
+def test_a_new_token_loads_the_value_again():
+    cache = ReadCache()
+    loads = []
+
+    def load(key):
+        loads.append(key)
+        return len(loads)
+
+    assert cache.get('a', 1, load) == 1
+    assert cache.get('a', 1, load) == 1
+    assert cache.get('a', 2, load) == 2
+    assert cache.lookup('a', 2) == 2
+    assert loads == ['a', 'a']
+
+    hits, misses, coalesced, invalidations, evictions, size = cache.stats()
+    assert (hits, misses, invalidations, size) == (2, 2, 1, 1)
+
+
+def test_misses_for_the_same_token_share_one_load():
+    cache = ReadCache()
+    loading = threading.Event()
+    release = threading.Event()
+    loads = []
+
+    def load(key):
+        loads.append(key)
+        loading.set()
+        release.wait()
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('a', 1, load))) for _ in range(5)]
+    threads[0].start()
+    loading.wait()
+    for thread in threads[1:]:
+        thread.start()
+    while cache.stats()[2] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert loads == ['a']
+    assert results == ['value'] * 5
+    assert cache.stats()[1:3] == (1, 4)
+
+
+def test_a_failed_load_fails_the_waiting_callers_and_is_not_cached():
+    cache = ReadCache()
+
+    def load(key):
+        raise KeyError(key)
+
+    with pytest.raises(KeyError):
+        cache.get('a', 1, load)
+
+    assert cache.get('a', 1, lambda key: 'loaded') == 'loaded'
+
+
+def test_the_least_recently_used_entries_are_evicted():
+    cache = ReadCache(capacity=2)
+    cache.put('a', 1, 'a')
+    cache.put('b', 1, 'b')
+    cache.lookup('a', 1)
+    cache.put('c', 1, 'c')
+
+    assert cache.lookup('b', 1) is None
+    assert cache.lookup('a', 1) == 'a' and cache.lookup('c', 1) == 'c'
+    assert len(cache) == 2
@@ -0,0 +1,227 @@
+import time
+
+import config
+import grpc
+import pytest
+import shop_pb2
+import shop_pb2_grpc
+
+from concurrent import futures
+
+from model.entities import *
+from node import Node
+from replication import OutOfOrder
+
+
+def wait(predicate, timeout=5):
+    end = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.01)
+
+    return True
+
+
+def link(node, chain, epoch=1):
+    node.Link(shop_pb2.LinkRequest(head=chain[0], tail=chain[-1], shards=1, epoch=epoch, chain_nodes=[
+        shop_pb2.ChainNode(process_id=process_id, successor_id=chain[i + 1] if i < len(chain) - 1 else '',
+                           predecessor_id=chain[i - 1] if i > 0 else '',
+                           id=shop_pb2.ProcessId(node=1, index=parse_process_id(process_id)[1]))
+        for i, process_id in enumerate(chain)]), None)
+
+
+@pytest.fixture
+def chain():
+    # a chain of two processes on one node, writes and acks between them are handed over in memory
+    node = Node(1, streaming=False)
+    node.init_processes(2)
+    head, tail = node.ids_to_processes.values()
+    link(node, [head.id, tail.id])
+
+    yield node, head, tail
+    node.close()
+
+
+def price(process, name):
+    return process.store.read(name, process.store.version(name)).price
+
+
+def test_writes_get_clean_at_the_head(chain):
+    node, head, tail = chain
+    node.apply_writes(head, [Book('a', 1), Book('b', 2)])
+
+    assert wait(lambda: head.store.clean_seq == 2)
+    assert tail.store.last_seq == 2
+    assert (price(tail, 'a'), price(tail, 'b')) == (1, 2)
+
+
+def test_writes_stay_in_order_when_the_timeout_shrinks(chain):
+    node, head, tail = chain
+    node.timeout = 0.2
+    node.apply_writes(head, [Book('a', 1)])
+    node.timeout = 0
+    node.apply_writes(head, [Book('b', 2)])
+
+    assert wait(lambda: head.store.clean_seq == 2)
+    assert tail.store.last_seq == 2
+
+
+def test_a_write_lost_in_memory_is_resent(chain):
+    node, head, tail = chain
+    forward_writes = node.forward_writes
+    lost = []
+    node.forward_writes = lambda process_id, books: lost.append(books)
+    node.apply_writes(head, [Book('a', 1)])
+    node.forward_writes = forward_writes
+
+    # the next write shows the tail the gap, and it gets the lost write from the head
+    node.apply_writes(head, [Book('b', 2)])
+
+    assert wait(lambda: head.store.clean_seq == 2)
+    assert len(lost) == 1
+    assert (price(tail, 'a'), price(tail, 'b')) == (1, 2)
+
+
+def test_a_write_past_a_gap_is_refused(chain):
+    node, head, tail = chain
+    node.apply_writes(tail, [Book('a', 1, 1)])
+
+    with pytest.raises(OutOfOrder):
+        node.apply_writes(tail, [Book('c', 3, 3)])
+    with pytest.raises(OutOfOrder):
+        node.apply_writes(tail, [Book('b', 2, 2), Book('d', 4, 4)])
+
+    # nothing after the missing write was applied, not even the writes before it in the same message
+    assert tail.store.last_seq == 1
+    assert tail.store.get('c') is None and tail.store.get('b') is None
+
+    node.apply_writes(tail, [Book('b', 2, 2), Book('c', 3, 3)])
+    assert tail.store.last_seq == 3
+
+
+def test_resent_writes_are_applied_once_and_acked_again(chain):
+    node, head, tail = chain
+    node.apply_writes(head, [Book('a', 1), Book('a', 2)])
+    assert wait(lambda: head.store.clean_seq == 2)
+
+    acks = []
+    node.clean_func = lambda process_id, seq: acks.append((process_id, seq))
+    node.apply_writes(tail, [Book('a', 1, 1), Book('a', 2, 2), Book('b', 3, 3)])
+
+    assert tail.store.last_seq == 3
+    assert price(tail, 'a') == 2
+    assert wait(lambda: (head.id, 2) in acks and (head.id, 3) in acks)
+
+
+def test_a_process_left_out_of_the_chain_is_unlinked(chain):
+    node, head, tail = chain
+    node.apply_writes(head, [Book('a', 1)])
+    assert wait(lambda: head.store.clean_seq == 1)
+
+    # a newer chain without the tail, the older one is ignored afterwards
+    link(node, [head.id], epoch=2)
+    link(node, [head.id, tail.id], epoch=1)
+
+    assert node.chains == [[head.id]]
+    assert node.epochs == [2]
+    assert head.successor is None and tail.predecessor is None
+    assert node.replica(0) is head
+
+    node.apply_writes(tail, [Book('b', 2, 2)])
+    assert tail.store.last_seq == 1
+
+
+def test_only_the_tail_keeps_indexes(chain):
+    node, head, tail = chain
+    node.apply_writes(head, [Book('a', 1)])
+    assert wait(lambda: head.store.clean_seq == 1)
+
+    assert head.store.indexes is None and tail.store.indexes is not None
+    assert [book.name for book in tail.store.find_prefix('')] == ['a']
+
+    # the head becomes the tail once the chain goes on without the old one
+    link(node, [head.id], epoch=2)
+
+    assert tail.store.indexes is None and head.store.indexes is not None
+    assert [book.name for book in head.store.find_prefix('')] == ['a']
+
+
+@pytest.fixture
+def served(chain, monkeypatch):
+    node, head, tail = chain
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    shop_pb2_grpc.add_DistributedBookstoreServicer_to_server(node, server)
+    port = server.add_insecure_port('localhost:0')
+    server.start()
+    # the node asks its own tail for what it cannot answer locally
+    monkeypatch.setattr(config, 'IDS_TO_IPS', {1: f'localhost:{port}'})
+    channel = grpc.insecure_channel(f'localhost:{port}')
+
+    yield node, head, tail, shop_pb2_grpc.DistributedBookstoreStub(channel)
+    channel.close()
+    server.stop(0)
+
+
+def test_a_full_chain_rejects_writes_that_find_no_room_in_time(served):
+    node, head, tail, stub = served
+    # the writes reach the tail late, so they stay in flight meanwhile
+    node.timeout = 0.5
+    node.max_in_flight = 2
+    node.admission_timeout = 0.1
+
+    for name in ['a', 'b']:
+        stub.Write(shop_pb2.WriteRequest(process_id=head.id, name=name, price=1))
+    start = time.monotonic()
+    with pytest.raises(grpc.RpcError) as error:
+        stub.Write(shop_pb2.WriteRequest(process_id=head.id, name='c', price=1))
+
+    assert error.value.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+    assert time.monotonic() - start >= 0.1
+    assert node.rejected == 1
+    assert head.store.get('c') is None
+
+
+def test_a_write_waits_for_room_in_a_full_chain(served):
+    node, head, tail, stub = served
+    node.timeout = 0.3
+    node.max_in_flight = 2
+    node.admission_timeout = 5
+
+    start = time.monotonic()
+    for name in ['a', 'b', 'c']:
+        stub.Write(shop_pb2.WriteRequest(process_id=head.id, name=name, price=1))
+
+    # the third write was let in once the acks for the first ones came back
+    assert time.monotonic() - start >= 0.3
+    assert node.rejected == 0
+    assert wait(lambda: head.store.clean_seq == 3)
+
+
+def test_multi_read_answers_in_the_order_of_the_names(served):
+    node, head, tail, stub = served
+    node.apply_writes(head, [Book('a', 1), Book('b', 2)])
+    assert wait(lambda: head.store.clean_seq == 2)
+
+    # a dirty write of a at the head, the tail still has the committed one
+    node.timeout = 5
+    node.apply_writes(head, [Book('a', 10)])
+
+    books = node.multi_read(['b', 'a', 'missing', 'a'])
+
+    assert [(book.name, book.price) if book is not None else None for book in books] == [
+        ('b', 2), ('a', 1), None, ('a', 1)]
+
+
+def test_attaching_after_a_process_in_no_chain_is_refused(served):
+    node, head, tail, stub = served
+    node.init_processes(1)
+    joiner = node.ids_to_processes['Node1-ps3']
+
+    with pytest.raises(grpc.RpcError) as error:
+        stub.Attach(shop_pb2.AttachRequest(process_id=joiner.id, after='Node9-ps1'))
+    assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+    assert not joiner.joining
+
+    with pytest.raises(ValueError):
+        node.extend_chain(joiner.id, 'Node9-ps1')
@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from model import persistence
+from model.entities import *
+
+
+@pytest.fixture(params=[Store, CompactStore])
+def store_class(request):
+    return request.param
+
+
+def contents(store):
+    with store.snapshot() as snapshot:
+        items, _ = snapshot.page(0, snapshot.length)
+
+    return ([(name, book.price if book is not None else None) for name, book, _ in items], store.dirty(),
+            store.last_seq, store.clean_seq)
+
+
+def open_process(directory, store_class):
+    process = Process(1, 1, store_class)
+    process.directory = str(directory)
+    process.store, process.log = persistence.open_store(process.directory, store_class)
+
+    return process
+
+
+def write(process, book):
+    process.store.add(book)
+    process.log.wait(process.log.write(book))
+
+
+def clean(process, seq):
+    process.store.clean_up_to(seq)
+    process.log.wait(process.log.clean(seq))
+
+
+def test_replays_the_log(tmp_path, store_class):
+    process = open_process(tmp_path, store_class)
+    write(process, Book('a', 1, 1))
+    write(process, Book('b', 2, 2))
+    clean(process, 1)
+    expected = contents(process.store)
+    process.log.close()
+
+    reopened = open_process(tmp_path, store_class)
+    assert contents(reopened.store) == expected
+    reopened.log.close()
+
+
+def test_replays_the_log_after_a_checkpoint(tmp_path, store_class):
+    random.seed(2)
+    process = open_process(tmp_path, store_class)
+    seq = 0
+
+    for round in range(3):
+        for _ in range(200):
+            seq += 1
+            write(process, Book(f'book {random.randrange(50)}', float(random.randrange(100)), seq))
+            if random.random() < 0.2:
+                clean(process, seq - random.randrange(3))
+        # writes and acks after the checkpoint only are in the new log, and writes that were dirty at the checkpoint
+        # are in the snapshot
+        persistence.checkpoint(process)
+
+    for _ in range(50):
+        seq += 1
+        write(process, Book(f'book {random.randrange(50)}', float(random.randrange(100)), seq))
+    clean(process, seq - 10)
+    expected = contents(process.store)
+    process.log.close()
+
+    reopened = open_process(tmp_path, store_class)
+    assert contents(reopened.store) == expected
+    reopened.log.close()
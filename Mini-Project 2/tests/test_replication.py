@@ -0,0 +1,30 @@
+from model.entities import *
+from replication import Unacked
+
+
+def sent(unacked):
+    return [(process_id, [book.seq for book in books]) for process_id, books in unacked.items()]
+
+
+def test_unacked_writes_are_resent_until_acknowledged():
+    unacked = Unacked()
+    unacked.add([('Node2-ps1', [Book('a', 1, 1), Book('b', 2, 2)]), ('Node3-ps1', [Book('c', 3, 1)])])
+    unacked.add([('Node2-ps1', [Book('d', 4, 3)])])
+
+    unacked.acknowledge('Node2-ps1', 2)
+
+    assert sent(unacked) == [('Node2-ps1', [3]), ('Node3-ps1', [1])]
+
+    unacked.acknowledge('Node2-ps1', 3)
+    unacked.clear()
+
+    assert sent(unacked) == []
+
+
+def test_forgotten_processes_get_no_resend():
+    unacked = Unacked()
+    unacked.add([('Node2-ps1', [Book('a', 1, 1)]), ('Node3-ps1', [Book('b', 2, 1)])])
+
+    unacked.forget('Node3-ps1')
+
+    assert sent(unacked) == [('Node2-ps1', [1])]
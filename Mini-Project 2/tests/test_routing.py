@@ -0,0 +1,36 @@
+import config
+import pytest
+
+from model.entities import *
+from routing import RoutingTable, load_members
+
+
+def test_process_ids_with_long_node_ids_are_parsed():
+    assert parse_process_id('Node1-ps2') == (1, 2)
+    assert parse_process_id(process_name(123, 45)) == (123, 45)
+    assert node_of('Node10-ps1') == 10
+
+
+def test_members_are_read_from_the_file(tmp_path):
+    path = tmp_path / 'members'
+    path.write_text('# id address\n1 localhost:20048\n\n  12 10.0.0.12:20048  \n')
+
+    assert load_members(str(path)) == {1: 'localhost:20048', 12: '10.0.0.12:20048'}
+
+
+def test_a_malformed_member_line_names_its_place(tmp_path):
+    path = tmp_path / 'members'
+    path.write_text('1 localhost:20048\n2\n')
+
+    with pytest.raises(ValueError, match=':2:'):
+        load_members(str(path))
+
+
+def test_routes_go_to_the_node_given_with_the_chain(monkeypatch):
+    monkeypatch.setattr(config, 'IDS_TO_IPS', {1: 'localhost:1', 12: 'localhost:12'})
+    routes = RoutingTable()
+    routes.add('Node1-ps1', 12)
+
+    assert routes.address('Node1-ps1') == 'localhost:12'
+    assert routes.address('Node12-ps3') == 'localhost:12'
+    assert routes.node('Node1-ps2') == 1
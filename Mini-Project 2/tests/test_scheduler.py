@@ -0,0 +1,46 @@
+import threading
+import time
+
+from scheduler import Scheduler
+
+
+def run_all(scheduler, calls, timeout=5):
+    # schedules (delay, key, value) in order and returns the values in the order they ran
+    ran = []
+    done = threading.Semaphore(0)
+
+    def call(value):
+        ran.append(value)
+        done.release()
+
+    for delay, key, value in calls:
+        scheduler.schedule(delay, call, args=[value], key=key)
+    for _ in calls:
+        assert done.acquire(timeout=timeout)
+
+    return ran
+
+
+def test_calls_with_a_key_keep_their_order_when_the_delay_shrinks():
+    scheduler = Scheduler()
+    calls = [(0.2, 'a', 1), (0, 'a', 2), (0.1, 'a', 3), (0.3, 'a', 4), (0, 'a', 5)]
+
+    assert run_all(scheduler, calls) == [1, 2, 3, 4, 5]
+    assert scheduler.depth() == 0
+
+
+def test_calls_with_other_keys_do_not_wait():
+    scheduler = Scheduler()
+
+    ran = run_all(scheduler, [(0.2, 'a', 1), (0, 'b', 2), (0.05, 'c', 3)])
+
+    assert ran == [2, 3, 1]
+
+
+def test_calls_are_delayed():
+    scheduler = Scheduler()
+    start = time.monotonic()
+
+    run_all(scheduler, [(0.1, 'a', 1)])
+
+    assert time.monotonic() - start >= 0.1
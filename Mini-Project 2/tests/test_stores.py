@@ -0,0 +1,125 @@
+import random
+
+import pytest
+
+from model.entities import *
+
+
+@pytest.fixture(params=[Store, CompactStore])
+def store(request):
+    return request.param()
+
+
+def committed(store):
+    with store.snapshot() as snapshot:
+        items, _ = snapshot.page(0, snapshot.length)
+
+    return {name: (book.price, book.seq) for name, book, _ in items if book is not None}
+
+
+def test_clean_up_to_commits_versions_up_to_seq(store):
+    store.add(Book('a', 1, 1))
+    store.add(Book('b', 2, 2))
+    store.add(Book('a', 3, 3))
+
+    store.clean_up_to(2)
+
+    assert store.clean_seq == 2
+    assert committed(store) == {'a': (1, 1), 'b': (2, 2)}
+    assert store.dirty() == [(3, 'a', 3)]
+
+    store.clean_up_to(3)
+
+    assert committed(store) == {'a': (3, 3), 'b': (2, 2)}
+    assert store.dirty() == []
+    assert store.dirty_count() == 0
+    assert store.oldest_dirty() is None
+
+
+def test_clean_up_to_ignores_old_acks(store):
+    for seq in range(1, 4):
+        store.add(Book('a', seq, seq))
+    store.clean_up_to(3)
+    store.clean_up_to(1)
+
+    assert store.clean_seq == 3
+    assert committed(store) == {'a': (3, 3)}
+
+
+def test_read_returns_the_version_asked_for(store):
+    store.add(Book('a', 1, 1))
+    store.clean_up_to(1)
+    store.add(Book('a', 2, 2))
+
+    assert store.version('a') == 1
+    assert store.read('a', 1).price == 1
+    assert store.read('a', 2).price == 2
+
+
+def test_snapshot_keeps_committed_versions(store):
+    store.add(Book('a', 1, 1))
+    store.add(Book('b', 2, 2))
+    store.clean_up_to(2)
+
+    with store.snapshot() as snapshot:
+        # a dirty write to a clean book, a commit and a new book all come after the snapshot was taken
+        store.add(Book('a', 10, 3))
+        store.clean_up_to(3)
+        store.add(Book('b', 20, 4))
+        store.add(Book('c', 30, 5))
+        items, end = snapshot.page(0, snapshot.length)
+
+    assert end == 2
+    assert [(name, book.price) for name, book, _ in items] == [('a', 1), ('b', 2)]
+    assert store.snapshots == ()
+
+
+def test_indexes_match_the_committed_books(store):
+    random.seed(1)
+    store.index_books()
+    seq = 0
+
+    for _ in range(2000):
+        seq += 1
+        store.add(Book(f'book {random.randrange(300)}', float(random.randrange(50)), seq))
+        if random.random() < 0.3:
+            store.clean_up_to(seq - random.randrange(5))
+
+    books = committed(store)
+    by_name = sorted(books)
+    by_price = sorted((price, name) for name, (price, _) in books.items())
+
+    assert [book.name for book in store.find_prefix('book 1')] == [name for name in by_name
+                                                                   if name.startswith('book 1')]
+    assert [(book.price, book.name) for book in store.find_price(10, 20)] == [key for key in by_price
+                                                                             if 10 <= key[0] < 20]
+
+    # indexes built from the store from scratch, like a new tail does, hold the same books
+    maintained = store.find_price(0)
+    store.index_books()
+    assert [(book.name, book.price) for book in store.find_price(0)] == [(book.name, book.price)
+                                                                         for book in maintained]
+
+
+def test_queries_page_through_the_indexes(store):
+    for seq in range(1, 21):
+        store.add(Book(f'book {seq:02}', float(seq % 4), seq))
+    store.clean_up_to(20)
+
+    first = store.find_prefix('book', limit=8)
+    rest = store.find_prefix('book', after=first[-1].name)
+    assert [book.name for book in first + rest] == [f'book {seq:02}' for seq in range(1, 21)]
+
+    first = store.find_price(1, 3, limit=3)
+    rest = store.find_price(1, 3, after=(first[-1].price, first[-1].name))
+    assert len(first + rest) == 10
+    assert all(1 <= book.price < 3 for book in first + rest)
+
+
+def test_indexes_are_built_on_the_first_query(store):
+    store.add(Book('a', 1, 1))
+    store.clean_up_to(1)
+
+    assert store.indexes is None
+    assert [book.name for book in store.find_prefix('a')] == ['a']
+    assert store.indexes is not None